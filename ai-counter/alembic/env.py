@@ -21,7 +21,7 @@ if config.config_file_name is not None:
 
 # Import all models so Alembic can detect them
 from app.database import Base
-from app.models import Bill, Meter, Property, Reading, Tariff, User  # noqa: F401
+from app.models import Bill, Meter, Property, Reading, RecognitionCacheEntry, RecognitionJob, Tariff, User  # noqa: F401
 
 target_metadata = Base.metadata
 
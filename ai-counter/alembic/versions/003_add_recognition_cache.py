@@ -0,0 +1,37 @@
+"""add recognition cache
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "003"
+down_revision: Union[str, None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recognition_cache",
+        sa.Column("key", sa.String(128), primary_key=True),
+        sa.Column("phash", sa.BigInteger, nullable=True),
+        sa.Column("utility_type", sa.String(20), nullable=False),
+        sa.Column("digit_count", sa.Integer, nullable=False),
+        sa.Column("prompt_version", sa.String(20), nullable=False),
+        sa.Column("digits", sa.String(20), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_recognition_cache_created_at", "recognition_cache", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_recognition_cache_created_at", table_name="recognition_cache")
+    op.drop_table("recognition_cache")
@@ -0,0 +1,45 @@
+"""add recognition jobs
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "004"
+down_revision: Union[str, None] = "003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recognition_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("meter_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("meters.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("image", sa.LargeBinary, nullable=True),
+        sa.Column("content_type", sa.String(50), nullable=True),
+        sa.Column("result", sa.String(20), nullable=True),
+        sa.Column("reading_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("readings.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("error_status", sa.Integer, nullable=True),
+        sa.Column("error", postgresql.JSONB, nullable=True),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("locked_until", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_recognition_jobs_user_id", "recognition_jobs", ["user_id"])
+    op.create_index("ix_recognition_jobs_status", "recognition_jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_table("recognition_jobs")
@@ -0,0 +1,52 @@
+"""add scan quotas
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "006"
+down_revision: Union[str, None] = "005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scan_quotas",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("used", sa.Integer, nullable=False, server_default="0"),
+    )
+    # Seed today's counters from what the old COUNT-based check saw
+    op.execute(
+        """
+        INSERT INTO scan_quotas (user_id, day, used)
+        SELECT user_id, (now() AT TIME ZONE 'UTC')::date, count(*)
+        FROM (
+            SELECT p.user_id
+            FROM readings r
+            JOIN meters m ON m.id = r.meter_id
+            JOIN properties p ON p.id = m.property_id
+            WHERE r.created_at >= date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+            UNION ALL
+            SELECT user_id
+            FROM recognition_jobs
+            WHERE status IN ('pending', 'running')
+              AND created_at >= date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+        ) scans
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("scan_quotas")
@@ -0,0 +1,45 @@
+"""add keyset pagination indexes
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so large tables keep taking writes during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_readings_meter_recorded_id",
+            "readings",
+            ["meter_id", sa.text("recorded_at DESC"), "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_bills_meter_period_id",
+            "bills",
+            ["meter_id", sa.text("period_end DESC"), "id"],
+            postgresql_concurrently=True,
+        )
+        # The new indexes cover every query the old (meter_id, <date>) ones served
+        op.drop_index("ix_readings_meter_recorded", table_name="readings", postgresql_concurrently=True)
+        op.drop_index("ix_bills_meter_period", table_name="bills", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.create_index("ix_readings_meter_recorded", "readings", ["meter_id", "recorded_at"])
+    op.create_index("ix_bills_meter_period", "bills", ["meter_id", "period_end"])
+    op.drop_index("ix_bills_meter_period_id", table_name="bills")
+    op.drop_index("ix_readings_meter_recorded_id", table_name="readings")
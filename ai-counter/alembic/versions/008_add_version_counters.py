@@ -0,0 +1,29 @@
+"""add version counters for etags
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "008"
+down_revision: Union[str, None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default: no table rewrite on Postgres 11+
+    op.add_column("meters", sa.Column("version", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("users", sa.Column("version", sa.Integer, nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "version")
+    op.drop_column("meters", "version")
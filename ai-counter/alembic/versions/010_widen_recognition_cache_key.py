@@ -0,0 +1,30 @@
+"""widen recognition cache key
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "010"
+down_revision: Union[str, None] = "009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keys carry the meter id since entries are scoped per meter; the structured
+    # prompt version pushes electricity keys past 128 characters
+    op.alter_column("recognition_cache", "key", type_=sa.String(255), existing_type=sa.String(128))
+
+
+def downgrade() -> None:
+    # Cache entries only: drop the ones that no longer fit
+    op.execute("DELETE FROM recognition_cache WHERE length(key) > 128")
+    op.alter_column("recognition_cache", "key", type_=sa.String(128), existing_type=sa.String(255))
@@ -0,0 +1,87 @@
+"""Per-process caches that let authenticated requests skip the database.
+
+get_current_user used to verify the JWT and load the user row on every
+request. Verified tokens are now remembered by digest until they expire,
+and the user fields handlers need are kept as a Principal for
+PRINCIPAL_CACHE_TTL_SECONDS. Changes to a user must call invalidate_user();
+other worker processes notice within the TTL.
+"""
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000"))
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated user as handlers see it: no session, no lazy loads."""
+
+    id: uuid.UUID
+    email: str
+    name: str
+
+
+class TTLCache:
+    """LRU whose entries carry their own absolute expiry (time.time())."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principals = TTLCache(PRINCIPAL_CACHE_SIZE)
+verified_tokens = TTLCache(TOKEN_CACHE_SIZE)
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def cache_principal(principal: Principal) -> None:
+    if PRINCIPAL_CACHE_TTL_SECONDS > 0:
+        principals.put(principal.id, principal, time.time() + PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: uuid.UUID) -> None:
+    """Forget a user's cached principal after it was changed or deleted."""
+    principals.pop(user_id)
+
+
+def stats() -> dict:
+    return {"principals": principals.stats(), "verified_tokens": verified_tokens.stats()}
@@ -0,0 +1,137 @@
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+BREAKER_WINDOW_SECONDS = float(os.environ.get("BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATE = float(os.environ.get("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.environ.get("BREAKER_SLOW_CALL_SECONDS", "8"))
+BREAKER_SLOW_CALL_RATE = float(os.environ.get("BREAKER_SLOW_CALL_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.environ.get("BREAKER_OPEN_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker.
+
+    Closed: calls go through and their outcome is recorded. Once the last
+    window_seconds hold at least min_calls and the failure or slow-call rate
+    crosses its threshold, the breaker opens and calls fail fast. After
+    open_seconds a single probe call is let through (half-open); its outcome
+    closes or re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = BREAKER_WINDOW_SECONDS,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate: float = BREAKER_SLOW_CALL_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self.reset()
+
+    def reset(self) -> None:
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._calls: deque[tuple[float, bool, bool]] = deque()
+        self.transitions = {OPEN: 0, HALF_OPEN: 0, CLOSED: 0}
+        self.rejected = 0
+
+    def _transition(self, state: str) -> None:
+        logger.warning("Circuit breaker %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        self.transitions[state] += 1
+        if state == OPEN:
+            self._opened_at = self._clock()
+            self._calls.clear()
+        self._probing = False
+
+    def _trim(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be rejected, without taking a probe slot."""
+        if self.state == OPEN:
+            return self._clock() - self._opened_at < self.open_seconds
+        return self.state == HALF_OPEN and self._probing
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; take the probe slot when half-open."""
+        if self.state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, ok: bool, latency: float) -> None:
+        """Record the outcome of a call that allow() let through."""
+        slow = latency >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED if ok and not slow else OPEN)
+            return
+        if self.state != CLOSED:
+            return
+
+        now = self._clock()
+        self._calls.append((now, ok, slow))
+        self._trim(now)
+        total = len(self._calls)
+        if total < self.min_calls:
+            return
+        failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+        slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+        if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+            self._transition(OPEN)
+
+    def release(self) -> None:
+        """Give back a probe slot whose call ended without an outcome (e.g. cancelled)."""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until the next probe is allowed, for Retry-After headers."""
+        if self.state != OPEN:
+            return 1
+        return max(1, round(self.open_seconds - (self._clock() - self._opened_at)))
+
+    def stats(self) -> dict:
+        now = self._clock()
+        self._trim(now)
+        total = len(self._calls)
+        return {
+            "state": self.state,
+            "window_calls": total,
+            "window_failure_rate": round(sum(1 for c in self._calls if not c[1]) / total, 3) if total else 0.0,
+            "window_slow_rate": round(sum(1 for c in self._calls if c[2]) / total, 3) if total else 0.0,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+        }
+
+
+vision_breaker = CircuitBreaker("vision")
@@ -18,6 +18,12 @@ JWT_SECRET = os.environ["JWT_SECRET"]
 JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
 JWT_EXPIRY_MINUTES = int(os.environ.get("JWT_EXPIRY_MINUTES", "10080"))  # 7 days
 
+# bcrypt cost for new hashes; logins rehash passwords stored at another cost
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+# "process" (default) or "thread" pool for bcrypt, bounded to PASSWORD_HASH_WORKERS
+PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "process")
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+
 GOOGLE_CLIENT_ID = os.environ["GOOGLE_CLIENT_ID"]
 
 APPLE_BUNDLE_ID = os.environ.get("APPLE_BUNDLE_ID", "")
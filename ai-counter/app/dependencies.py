@@ -1,14 +1,16 @@
+import time
 import uuid
 from typing import AsyncGenerator
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from app.auth_cache import Principal, cache_principal, principals, token_digest, verified_tokens
 from app.database import async_session
 from app.models.user import User
-from app.services.auth import decode_access_token
+from app.services.auth import decode_access_token_claims
 
 security = HTTPBearer()
 
@@ -18,22 +20,47 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db),
-) -> User:
-    user_id = decode_access_token(credentials.credentials)
-    if user_id is None:
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Session factory for handlers that open their own short-lived sessions."""
+    return async_session
+
+
+def verify_token(token: str) -> uuid.UUID:
+    """User id from a bearer token; repeat tokens skip signature verification until they expire."""
+    digest = token_digest(token)
+    uid = verified_tokens.get(digest)
+    if uid is not None:
+        return uid
+
+    claims = decode_access_token_claims(token)
+    if claims is None or claims.get("sub") is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
 
     try:
-        uid = uuid.UUID(user_id)
+        uid = uuid.UUID(claims["sub"])
     except ValueError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
-    result = await db.execute(select(User).where(User.id == uid))
-    user = result.scalar_one_or_none()
-    if user is None:
+    verified_tokens.put(digest, uid, claims.get("exp", time.time()))
+    return uid
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db),
+) -> Principal:
+    uid = verify_token(credentials.credentials)
+
+    # The session only checks out a connection if the principal is not cached
+    principal = principals.get(uid)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(select(User.id, User.email, User.name).where(User.id == uid))
+    row = result.one_or_none()
+    if row is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
-    return user
+    principal = Principal(id=row.id, email=row.email, name=row.name)
+    cache_principal(principal)
+    return principal
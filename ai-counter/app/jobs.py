@@ -0,0 +1,260 @@
+"""Background recognition jobs for the 202 Accepted /recognize flow.
+
+Jobs live in Postgres, so a restarted worker picks up whatever was pending
+or whose lease ran out. Each process runs JOB_WORKERS coroutines pulling job
+ids from a bounded queue; the number of in-flight vision calls is bounded by
+the worker count, not by how many HTTP clients are waiting.
+"""
+import asyncio
+import logging
+import os
+import uuid
+import weakref
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Row, and_, or_, select, update
+
+from app.circuit_breaker import vision_breaker
+from app.database import async_session
+from app.etags import bump_meters
+from app.models.meter import Meter
+from app.models.reading import Reading
+from app.models.recognition_job import RecognitionJob
+from app.services import quota
+from app.services.recognition import BackendUnavailable, RecognitionFailed, recognize_meter_image
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "1000"))
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "60"))
+JOB_POLL_SECONDS = int(os.environ.get("JOB_POLL_SECONDS", "15"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+
+TERMINAL_STATUSES = ("done", "failed")
+
+_queue: asyncio.Queue | None = None
+_queued: set[uuid.UUID] = set()
+_tasks: list[asyncio.Task] = []
+# Held weakly: a job nobody is waiting on any more drops out by itself
+_waiters: weakref.WeakValueDictionary[uuid.UUID, asyncio.Event] = weakref.WeakValueDictionary()
+
+
+def job_payload(job) -> dict:
+    """Response body for a job, from a RecognitionJob or a status_query() row."""
+    payload = {"job_id": str(job.id), "status": job.status}
+    if job.status == "done":
+        payload["result"] = job.result
+        payload["reading_id"] = str(job.reading_id) if job.reading_id else None
+    elif job.status == "failed":
+        payload["error_status"] = job.error_status
+        payload.update(job.error or {})
+    return payload
+
+
+def enqueue(job_id: uuid.UUID) -> bool:
+    """Queue a job in this process; False leaves it to the sweeper."""
+    if _queue is None or job_id in _queued:
+        return False
+    try:
+        _queue.put_nowait(job_id)
+    except asyncio.QueueFull:
+        return False
+    _queued.add(job_id)
+    return True
+
+
+async def wait_for_update(job_id: uuid.UUID, timeout: float) -> None:
+    """Wait until this process finishes the job, or for timeout seconds."""
+    event = _waiters.setdefault(job_id, asyncio.Event())
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+def _notify(job_id: uuid.UUID) -> None:
+    event = _waiters.pop(job_id, None)
+    if event is not None:
+        event.set()
+
+
+def status_query(job_id: uuid.UUID, user_id: uuid.UUID):
+    """The columns job_payload reads; polls never load the uploaded image."""
+    return select(
+        RecognitionJob.id,
+        RecognitionJob.status,
+        RecognitionJob.result,
+        RecognitionJob.reading_id,
+        RecognitionJob.error_status,
+        RecognitionJob.error,
+    ).where(RecognitionJob.id == job_id, RecognitionJob.user_id == user_id)
+
+
+async def get_job(job_id: uuid.UUID, user_id: uuid.UUID) -> Row | None:
+    async with async_session() as db:
+        result = await db.execute(status_query(job_id, user_id))
+        return result.one_or_none()
+
+
+def _claimable(now: datetime):
+    return or_(
+        RecognitionJob.status == "pending",
+        and_(RecognitionJob.status == "running", RecognitionJob.locked_until < now),
+    )
+
+
+async def _finish(job_id: uuid.UUID, refund: quota.Reservation | None = None, **values) -> None:
+    async with async_session() as db:
+        await db.execute(
+            update(RecognitionJob)
+            .where(RecognitionJob.id == job_id)
+            .values(image=None, locked_until=None, **values)
+        )
+        await db.commit()
+        if refund is not None:
+            await quota.refund(db, refund)
+
+
+async def _release(job_id: uuid.UUID) -> None:
+    """Hand a claimed job back as pending without spending one of its attempts."""
+    async with async_session() as db:
+        await db.execute(
+            update(RecognitionJob)
+            .where(RecognitionJob.id == job_id)
+            .values(status="pending", locked_until=None, attempts=RecognitionJob.attempts - 1)
+        )
+        await db.commit()
+
+
+async def process_job(job_id: uuid.UUID) -> None:
+    # Leave the job pending while the vision backend is down; the sweeper retries it
+    if vision_breaker.is_open:
+        return
+
+    now = datetime.now(timezone.utc)
+
+    # Claim with a lease; another worker may have taken it already
+    async with async_session() as db:
+        result = await db.execute(
+            update(RecognitionJob)
+            .where(RecognitionJob.id == job_id, _claimable(now), RecognitionJob.attempts < JOB_MAX_ATTEMPTS)
+            .values(
+                status="running",
+                attempts=RecognitionJob.attempts + 1,
+                locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS),
+            )
+            .returning(
+                RecognitionJob.image,
+                RecognitionJob.content_type,
+                RecognitionJob.meter_id,
+                RecognitionJob.user_id,
+                RecognitionJob.created_at,
+            )
+        )
+        claimed = result.one_or_none()
+        await db.commit()
+        if claimed is None:
+            return
+        meter = await db.get(Meter, claimed.meter_id)
+
+    # A failed job gives back the scan reserved when it was queued
+    reservation = quota.Reservation(claimed.user_id, claimed.created_at.astimezone(timezone.utc).date(), 1)
+
+    if meter is None or claimed.image is None:
+        await _finish(job_id, reservation, status="failed", error_status=404, error={"error": "Meter not found"})
+        _notify(job_id)
+        return
+
+    # No session is held while the vision call runs
+    try:
+        digits = await recognize_meter_image(claimed.image, claimed.content_type, meter)
+    except BackendUnavailable:
+        await _release(job_id)
+        return
+    except RecognitionFailed as e:
+        await _finish(job_id, reservation, status="failed", error_status=e.status_code, error=e.content)
+        _notify(job_id)
+        return
+
+    async with async_session() as db:
+        reading = Reading(meter_id=meter.id, value=int(digits), recorded_at=now)
+        db.add(reading)
+        await db.flush()
+        await bump_meters(db, meter.id)
+        await db.execute(
+            update(RecognitionJob)
+            .where(RecognitionJob.id == job_id)
+            .values(status="done", result=digits, reading_id=reading.id, image=None, locked_until=None)
+        )
+        await db.commit()
+    _notify(job_id)
+
+
+async def _worker() -> None:
+    while True:
+        job_id = await _queue.get()
+        _queued.discard(job_id)
+        try:
+            await process_job(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Lease expiry hands the job back to the sweeper
+            logger.exception("Recognition job %s crashed", job_id)
+        finally:
+            _queue.task_done()
+
+
+async def _sweep() -> None:
+    now = datetime.now(timezone.utc)
+    async with async_session() as db:
+        result = await db.execute(
+            update(RecognitionJob)
+            .where(_claimable(now), RecognitionJob.attempts >= JOB_MAX_ATTEMPTS)
+            .values(status="failed", error_status=500, error={"error": "Recognition failed"}, image=None)
+            .returning(RecognitionJob.user_id, RecognitionJob.created_at)
+        )
+        failed = Counter((row.user_id, row.created_at.astimezone(timezone.utc).date()) for row in result)
+        await db.commit()
+        for (user_id, day), count in failed.items():
+            await quota.refund(db, quota.Reservation(user_id, day, count))
+        result = await db.execute(
+            select(RecognitionJob.id)
+            .where(_claimable(now))
+            .order_by(RecognitionJob.created_at)
+            .limit(JOB_QUEUE_SIZE)
+        )
+        job_ids = result.scalars().all()
+    for job_id in job_ids:
+        enqueue(job_id)
+
+
+async def _sweeper() -> None:
+    """Re-queue pending jobs and jobs whose worker died (expired lease)."""
+    while True:
+        try:
+            await _sweep()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Recognition job sweep failed")
+        await asyncio.sleep(JOB_POLL_SECONDS)
+
+
+async def start_workers() -> None:
+    global _queue
+    _queue = asyncio.Queue(maxsize=JOB_QUEUE_SIZE)
+    _tasks.extend(asyncio.create_task(_worker()) for _ in range(JOB_WORKERS))
+    _tasks.append(asyncio.create_task(_sweeper()))
+
+
+async def stop_workers() -> None:
+    global _queue
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    _queued.clear()
+    _queue = None
@@ -0,0 +1,326 @@
+"""In-process, CPU-only digit reader, a candidate tier ahead of GPT-4o.
+
+Only images that are already little more than the digit window can be read:
+there is no step that finds the window in a full photo, and the app uploads
+the whole frame. Anything that does not segment into exactly ``digit_count``
+glyphs comes back with zero confidence. The drum matcher only recognizes
+faces close to DRUM_FONT, and slanted LCDs are still misread with high
+confidence, so the reader is not in app.recognizer.LOCAL_RECOGNIZERS; it is
+measured offline with benchmarks/bench_local_ocr.py --held-out until it
+meets the accuracy bar.
+"""
+import io
+import logging
+from typing import NamedTuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CELL_HEIGHT = 32
+CELL_WIDTH = 20
+WORK_HEIGHT = 160
+# Glyphs narrower than this (w/h) are padded back to a full cell, so "1" keeps its shape
+NARROW_ASPECT = 0.45
+# Largest slant (horizontal shift per row of height) corrected before segmenting
+MAX_SHEAR = 0.3
+SHEAR_STEPS = 13
+# Score margin between best and runner-up that counts as fully confident
+TEMPLATE_MARGIN = 0.15
+SEGMENT_MARGIN = 0.1
+
+# 5x7 bitmap digits, the same face the drum templates are rendered from
+DRUM_FONT = {
+    "0": ["01110", "10001", "10011", "10101", "11001", "10001", "01110"],
+    "1": ["00100", "01100", "00100", "00100", "00100", "00100", "01110"],
+    "2": ["01110", "10001", "00001", "00010", "00100", "01000", "11111"],
+    "3": ["11111", "00010", "00100", "00010", "00001", "10001", "01110"],
+    "4": ["00010", "00110", "01010", "10010", "11111", "00010", "00010"],
+    "5": ["11111", "10000", "11110", "00001", "00001", "10001", "01110"],
+    "6": ["00110", "01000", "10000", "11110", "10001", "10001", "01110"],
+    "7": ["11111", "00001", "00010", "00100", "01000", "01000", "01000"],
+    "8": ["01110", "10001", "10001", "01110", "10001", "10001", "01110"],
+    "9": ["01110", "10001", "10001", "01111", "00001", "00010", "01100"],
+}
+
+# Segment boxes as (y0, y1, x0, x1) fractions of a digit cell
+SEGMENT_BOXES = {
+    "a": (0.00, 0.14, 0.25, 0.75),
+    "b": (0.18, 0.42, 0.82, 1.00),
+    "c": (0.58, 0.82, 0.82, 1.00),
+    "d": (0.86, 1.00, 0.25, 0.75),
+    "e": (0.58, 0.82, 0.00, 0.18),
+    "f": (0.18, 0.42, 0.00, 0.18),
+    "g": (0.43, 0.57, 0.25, 0.75),
+}
+SEGMENTS = "abcdefg"
+SEVEN_SEGMENT_DIGITS = {
+    "0": "abcdef",
+    "1": "bc",
+    "2": "abdeg",
+    "3": "abcdg",
+    "4": "bcfg",
+    "5": "acdfg",
+    "6": "acdefg",
+    "7": "abc",
+    "8": "abcdefg",
+    "9": "abcdfg",
+}
+
+
+class LocalReading(NamedTuple):
+    digits: str
+    confidences: list[float]
+    engine: str
+
+    @property
+    def confidence(self) -> float:
+        return min(self.confidences, default=0.0)
+
+
+def _resize(a, height: int, width: int):
+    """Bilinear resize of a 2-D float array."""
+    src_h, src_w = a.shape
+    ys = np.clip((np.arange(height) + 0.5) * src_h / height - 0.5, 0, src_h - 1)
+    xs = np.clip((np.arange(width) + 0.5) * src_w / width - 0.5, 0, src_w - 1)
+    y0 = np.floor(ys).astype(int)
+    x0 = np.floor(xs).astype(int)
+    y1 = np.minimum(y0 + 1, src_h - 1)
+    x1 = np.minimum(x0 + 1, src_w - 1)
+    wy = (ys - y0)[:, None]
+    wx = (xs - x0)[None, :]
+    top = a[y0][:, x0] * (1 - wx) + a[y0][:, x1] * wx
+    bottom = a[y1][:, x0] * (1 - wx) + a[y1][:, x1] * wx
+    return top * (1 - wy) + bottom * wy
+
+
+def _otsu(gray) -> float:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(float)
+    total = hist.sum()
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * np.arange(256))
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return float(np.argmax(between))
+
+
+def ink_masks(gray):
+    """Candidate ink masks, minority class as ink so light-on-dark drums work too.
+
+    Besides the global Otsu split, each side is split again: drum windows have
+    three levels (bezel, drum, digit) and the digits are only one of them.
+    """
+    t0 = _otsu(gray)
+    thresholds = [t0]
+    for part in (gray[gray > t0], gray[gray <= t0]):
+        if part.size:
+            thresholds.append(_otsu(part))
+    masks = []
+    for t in thresholds:
+        mask = gray > t
+        masks.append(~mask if mask.mean() > 0.5 else mask)
+    return masks
+
+
+def _runs(profile) -> list[tuple[int, int]]:
+    runs = []
+    start = None
+    for i, on in enumerate(profile):
+        if on and start is None:
+            start = i
+        elif not on and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(profile)))
+    return runs
+
+
+def estimate_shear(mask) -> float:
+    """Slant of italic LCD faces and off-axis shots: the shear that makes the column profile sharpest."""
+    ys, xs = np.nonzero(mask)
+    if not xs.size:
+        return 0.0
+    offsets = ys - (mask.shape[0] - 1) / 2
+    best, best_score = 0.0, -1.0
+    for shear in np.linspace(-MAX_SHEAR, MAX_SHEAR, SHEAR_STEPS):
+        cols = xs - np.round(shear * offsets).astype(int)
+        # Upright strokes pile into few columns, which maximizes the sum of squares
+        score = float((np.bincount(cols - cols.min()).astype(float) ** 2).sum())
+        if score > best_score:
+            best, best_score = float(shear), score
+    return best
+
+
+def deslant(mask, shear: float):
+    """Shift each row so strokes slanted by ``shear`` stand upright."""
+    if not shear:
+        return mask
+    height = mask.shape[0]
+    pad = int(np.ceil(abs(shear) * height / 2))
+    padded = np.pad(mask, ((0, 0), (pad, pad)))
+    shifts = np.round(shear * (np.arange(height) - (height - 1) / 2)).astype(int)
+    columns = (np.arange(padded.shape[1])[None, :] + shifts[:, None]) % padded.shape[1]
+    return np.take_along_axis(padded, columns, axis=1)
+
+
+def segment(mask, digit_count: int) -> list | None:
+    """Split an ink mask into ``digit_count`` glyph masks, or None if it does not fit."""
+    rows = _runs(mask.mean(axis=1) > 0.02)
+    if not rows:
+        return None
+    top, bottom = max(rows, key=lambda r: r[1] - r[0])
+    height = bottom - top
+    # Only images that are mostly the digit window are read locally
+    if height < 0.4 * mask.shape[0]:
+        return None
+
+    band = mask[top:bottom]
+    runs = [r for r in _runs(band.sum(axis=0) > 0.05 * height) if r[1] - r[0] >= 0.05 * height]
+    # Merge runs split by thin gaps inside a glyph
+    while len(runs) > digit_count:
+        gaps = [runs[i + 1][0] - runs[i][1] for i in range(len(runs) - 1)]
+        i = gaps.index(min(gaps))
+        if gaps[i] > 0.15 * height:
+            return None
+        runs[i : i + 2] = [(runs[i][0], runs[i + 1][1])]
+    if len(runs) != digit_count:
+        return None
+
+    glyphs = []
+    for x0, x1 in runs:
+        glyph = band[:, x0:x1]
+        ink_rows = np.flatnonzero(glyph.any(axis=1))
+        glyph = glyph[ink_rows[0] : ink_rows[-1] + 1]
+        if glyph.shape[0] < 0.6 * height:
+            return None
+        glyphs.append(glyph)
+    return glyphs
+
+
+def normalize_glyph(glyph, align: str = "center"):
+    """Pad narrow glyphs to a full cell and resize to CELL_HEIGHT x CELL_WIDTH."""
+    glyph = glyph.astype(float)
+    height, width = glyph.shape
+    if width < NARROW_ASPECT * height:
+        full = int(round(height * CELL_WIDTH / CELL_HEIGHT))
+        pad = full - width
+        left = pad if align == "right" else pad // 2
+        glyph = np.pad(glyph, ((0, 0), (left, pad - left)))
+    return _resize(glyph, CELL_HEIGHT, CELL_WIDTH)
+
+
+def _confidence(best: float, runner_up: float, margin: float) -> float:
+    return float(max(0.0, min(1.0, best)) * max(0.0, min(1.0, (best - runner_up) / margin)))
+
+
+class DrumTemplateMatcher:
+    """Normalized cross-correlation against rendered drum digit templates."""
+
+    name = "drum-template"
+
+    def __init__(self, font: dict[str, list[str]] = DRUM_FONT):
+        self.labels = sorted(font)
+        templates = []
+        for label in self.labels:
+            bitmap = np.array([[c == "1" for c in row] for row in font[label]])
+            cols = np.flatnonzero(bitmap.any(axis=0))
+            bitmap = bitmap[:, cols[0] : cols[-1] + 1]
+            # Upsample before normalizing so padding matches real glyph proportions
+            bitmap = np.kron(bitmap, np.ones((8, 8), dtype=bool))
+            templates.append(self._standardize(normalize_glyph(bitmap)))
+        self.templates = np.stack(templates)
+
+    @staticmethod
+    def _standardize(cell):
+        cell = cell - cell.mean()
+        norm = np.linalg.norm(cell)
+        return cell / norm if norm else cell
+
+    def read_glyph(self, glyph) -> tuple[str, float]:
+        cell = self._standardize(normalize_glyph(glyph))
+        scores = np.tensordot(self.templates, cell, axes=2)
+        order = np.argsort(scores)[::-1]
+        return self.labels[order[0]], _confidence(scores[order[0]], scores[order[1]], TEMPLATE_MARGIN)
+
+
+class SevenSegmentDecoder:
+    """Samples the seven segment boxes of each LCD cell and picks the closest digit."""
+
+    name = "seven-segment"
+
+    def __init__(self):
+        self.labels = sorted(SEVEN_SEGMENT_DIGITS)
+        self.patterns = np.array(
+            [[float(s in SEVEN_SEGMENT_DIGITS[label]) for s in SEGMENTS] for label in self.labels]
+        )
+
+    def segment_levels(self, cell):
+        levels = []
+        for s in SEGMENTS:
+            y0, y1, x0, x1 = SEGMENT_BOXES[s]
+            box = cell[int(y0 * CELL_HEIGHT) : int(y1 * CELL_HEIGHT), int(x0 * CELL_WIDTH) : int(x1 * CELL_WIDTH)]
+            # Strongest bar across the box, so segment thickness does not matter
+            axis = 1 if s in "adg" else 0
+            levels.append(box.mean(axis=axis).max())
+        return np.array(levels)
+
+    def read_glyph(self, glyph) -> tuple[str, float]:
+        levels = self.segment_levels(normalize_glyph(glyph, align="right"))
+        scores = 1.0 - np.abs(self.patterns - levels).mean(axis=1)
+        order = np.argsort(scores)[::-1]
+        return self.labels[order[0]], _confidence(scores[order[0]], scores[order[1]], SEGMENT_MARGIN)
+
+
+_ENGINES: dict = {}
+
+
+def get_engine(utility_type: str):
+    """Drum template matcher for gas/water, seven-segment decoder for electricity LCDs."""
+    if utility_type not in _ENGINES:
+        _ENGINES[utility_type] = SevenSegmentDecoder() if utility_type == "electricity" else DrumTemplateMatcher()
+    return _ENGINES[utility_type]
+
+
+def load_gray(image_data: bytes):
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(image_data)) as img:
+        img.draft("L", (img.width * WORK_HEIGHT // max(img.height, 1), WORK_HEIGHT))
+        img = ImageOps.exif_transpose(img).convert("L")
+        if img.height > WORK_HEIGHT:
+            img = img.resize((max(1, img.width * WORK_HEIGHT // img.height), WORK_HEIGHT))
+        return np.asarray(img)
+
+
+def read_digits(gray, utility_type: str, digit_count: int) -> LocalReading:
+    """Read ``digit_count`` digits from a grayscale array with per-digit confidences."""
+    engine = get_engine(utility_type)
+    best = LocalReading("", [0.0] * digit_count, engine.name)
+    masks = ink_masks(gray)
+    shear = estimate_shear(masks[0])
+    for mask in masks:
+        glyphs = segment(deslant(mask, shear), digit_count)
+        if glyphs is None:
+            continue
+        digits, confidences = [], []
+        for glyph in glyphs:
+            digit, confidence = engine.read_glyph(glyph)
+            digits.append(digit)
+            confidences.append(round(confidence, 3))
+        reading = LocalReading("".join(digits), confidences, engine.name)
+        if reading.confidence > best.confidence or not best.digits:
+            best = reading
+    return best
+
+
+def recognize_local(image_data: bytes, utility_type: str, digit_count: int) -> LocalReading | None:
+    """Decode the image and read it locally; None when decoding fails."""
+    try:
+        gray = load_gray(image_data)
+    except Exception:
+        logger.debug("Local OCR could not decode image", exc_info=True)
+        return None
+    return read_digits(gray, utility_type, digit_count)
@@ -1,34 +1,49 @@
+import math
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from slowapi import Limiter
-from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
 
+from app.auth_cache import stats as auth_cache_stats
+from app.circuit_breaker import vision_breaker
 from app.database import engine
-from app.routers import auth, bills, meters, readings, tariffs
+from app.etags import ETAG_HEADER
+from app.jobs import start_workers, stop_workers
+from app.pagination import NEXT_CURSOR_HEADER
+from app.preprocess import shutdown_executor
+from app.rate_limit import RateLimitExceeded, limiter
+from app.recognition_cache import recognition_cache
+from app.recognizer import close_client, init_client
+from app.recognizer import stats as recognizer_stats
+from app.routers import auth, bills, dashboard, meters, readings, tariffs
+from app.services import jwks, ownership
+from app.services.auth import shutdown_hash_executor
+from app.single_flight import stats as single_flight_stats
 
 
 def _rate_limit_handler(request: Request, exc: RateLimitExceeded):
     return JSONResponse(
         status_code=429,
         content={"detail": "Too many requests. Please try again later."},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
     )
 
 
-limiter = Limiter(key_func=get_remote_address)
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    init_client()
+    await start_workers()
     yield
+    await stop_workers()
+    await close_client()
+    await jwks.close_http_client()
+    shutdown_executor()
+    shutdown_hash_executor()
     await engine.dispose()
 
 
 app = FastAPI(title="AI Counter", version="2.0", lifespan=lifespan)
-app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_handler)
 
 # CORS
@@ -37,7 +52,8 @@ app.add_middleware(
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
-    allow_headers=["Authorization", "Content-Type"],
+    allow_headers=["Authorization", "Content-Type", "Idempotency-Key", "If-None-Match"],
+    expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER],
 )
 
 # Include routers
@@ -46,8 +62,23 @@ app.include_router(readings.router)
 app.include_router(meters.router)
 app.include_router(tariffs.router)
 app.include_router(bills.router)
+app.include_router(dashboard.router)
 
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "recognition_cache": recognition_cache.stats(),
+        "recognizer": recognizer_stats(),
+        "vision_breaker": vision_breaker.stats(),
+        "deduplication": single_flight_stats(),
+        "auth_cache": auth_cache_stats(),
+        "meter_ownership": ownership.stats(),
+        "rate_limit": limiter.stats(),
+        "jwks": {"google": jwks.google_keys.stats(), "apple": jwks.apple_keys.stats()},
+    }
@@ -4,5 +4,9 @@ from app.models.meter import Meter
 from app.models.reading import Reading
 from app.models.tariff import Tariff
 from app.models.bill import Bill
+from app.models.recognition_cache import RecognitionCacheEntry
+from app.models.recognition_job import RecognitionJob
+from app.models.rate_limit_bucket import RateLimitBucket
+from app.models.scan_quota import ScanQuota
 
-__all__ = ["User", "Property", "Meter", "Reading", "Tariff", "Bill"]
+__all__ = ["User", "Property", "Meter", "Reading", "Tariff", "Bill", "RecognitionCacheEntry", "RecognitionJob", "RateLimitBucket", "ScanQuota"]
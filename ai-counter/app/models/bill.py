@@ -1,7 +1,7 @@
 import uuid
 from datetime import date, datetime, timezone
 
-from sqlalchemy import Date, ForeignKey, Numeric, String, func
+from sqlalchemy import Date, ForeignKey, Index, Numeric, String, func
 from sqlalchemy.dialects.postgresql import TIMESTAMP, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -23,6 +23,9 @@ class Bill(Base):
     period_end: Mapped[date] = mapped_column(Date, nullable=False)
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
 
+    # Keyset pagination: newest first per meter, id breaks ties
+    __table_args__ = (Index("ix_bills_meter_period_id", "meter_id", period_end.desc(), "id"),)
+
     meter = relationship("Meter", back_populates="bills")
     reading_from = relationship("Reading", foreign_keys=[reading_from_id])
     reading_to = relationship("Reading", foreign_keys=[reading_to_id])
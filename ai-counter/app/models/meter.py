@@ -16,6 +16,8 @@ class Meter(Base):
     utility_type: Mapped[str] = mapped_column(String(20), nullable=False)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     digit_count: Mapped[int] = mapped_column(Integer, default=5)
+    # Bumped with every change to the meter's readings, bills or tariffs (app.etags)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
 
     __table_args__ = (
@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Integer, String, func
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class RecognitionCacheEntry(Base):
+    __tablename__ = "recognition_cache"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    phash: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    utility_type: Mapped[str] = mapped_column(String(20), nullable=False)
+    digit_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(20), nullable=False)
+    digits: Mapped[str] = mapped_column(String(20), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now(), index=True)
@@ -0,0 +1,52 @@
+"""The private openai SDK helpers app.recognizer relies on, in one place.
+
+The SDK serializes every request body in memory, so recognition posts its
+completions through the pooled HTTP client itself. To fail and retry like
+an SDK call it borrows three private client methods: whether a response is
+retried, how long to back off, and which typed APIStatusError it raises.
+Nothing else in the app touches SDK internals. They were checked against
+VERIFIED_VERSION, the release requirements.txt pins; on any other release,
+or with one of them gone, importing this module fails instead of letting a
+changed internal misbehave at request time. tests/test_openai_compat.py
+pins their behaviour; re-run it before bumping VERIFIED_VERSION.
+"""
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+VERIFIED_VERSION = "1.59.7"
+_HELPERS = ("_should_retry", "_calculate_retry_timeout", "_make_status_error_from_response")
+
+
+def check(version: str = openai.__version__) -> None:
+    """Raise RuntimeError unless the SDK is the verified release and has every helper."""
+    if version != VERIFIED_VERSION:
+        raise RuntimeError(
+            f"app.openai_compat was verified against openai {VERIFIED_VERSION}, not {version}; "
+            "check the private helpers it uses still behave the same, then bump VERIFIED_VERSION"
+        )
+    missing = [name for name in _HELPERS if not callable(getattr(AsyncOpenAI, name, None))]
+    if missing:
+        raise RuntimeError(f"openai {version} no longer has {', '.join(missing)}")
+
+
+check()
+
+from openai._models import FinalRequestOptions  # noqa: E402
+
+_COMPLETIONS = FinalRequestOptions(method="post", url="/chat/completions")
+
+
+def should_retry(client: AsyncOpenAI, response: httpx.Response) -> bool:
+    """Whether the SDK would retry this failed response."""
+    return client._should_retry(response)
+
+
+def retry_delay(client: AsyncOpenAI, remaining: int, headers: httpx.Headers | None) -> float:
+    """Seconds to wait before the next attempt, honouring Retry-After."""
+    return client._calculate_retry_timeout(remaining, _COMPLETIONS, headers)
+
+
+def status_error(client: AsyncOpenAI, response: httpx.Response) -> openai.APIStatusError:
+    """The typed SDK error (RateLimitError, BadRequestError, ...) for a read error response."""
+    return client._make_status_error_from_response(response)
@@ -0,0 +1,57 @@
+"""Keyset pagination for newest-first lists (readings, bills).
+
+A page is ordered by (sort column DESC, id ASC), the order of the composite
+(meter_id, <sort> DESC, id) indexes, and the next page starts strictly after
+the last row of this one. The position travels as an opaque cursor, returned
+in the X-Next-Cursor header so list bodies keep their shape; offset paging
+stays available for older clients.
+"""
+import base64
+import json
+import uuid
+from datetime import date, datetime
+from typing import Any
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: date | datetime, row_id: uuid.UUID) -> str:
+    payload = json.dumps([sort_value.isoformat(), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_type: type[date] | type[datetime]) -> tuple[Any, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return sort_type.fromisoformat(sort_value), uuid.UUID(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(statement: Select, sort_column, id_column, limit: int, offset: int, cursor: str | None) -> Select:
+    """Order newest first and select one page (plus one row to tell whether more follow)."""
+    if cursor is not None:
+        if offset:
+            raise HTTPException(status_code=400, detail="Use either cursor or offset, not both")
+        sort_value, row_id = decode_cursor(cursor, sort_column.type.python_type)
+        statement = statement.where(
+            or_(sort_column < sort_value, and_(sort_column == sort_value, id_column > row_id))
+        )
+    statement = statement.order_by(sort_column.desc(), id_column).limit(limit + 1)
+    if offset:
+        statement = statement.offset(offset)
+    return statement
+
+
+def page_rows(rows: list, limit: int, sort_attr: str, response: Response) -> list:
+    """Trim the look-ahead row and set X-Next-Cursor when there is a next page."""
+    if len(rows) <= limit:
+        return rows
+    rows = rows[:limit]
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_attr), last.id)
+    return rows
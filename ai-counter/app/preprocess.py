@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import io
+import logging
+import math
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.validation import _detect_format, get_image_dimensions
+
+logger = logging.getLogger(__name__)
+
+PREPROCESS_WORKERS = int(os.environ.get("PREPROCESS_WORKERS", "2"))
+VISION_MAX_TILES = int(os.environ.get("VISION_MAX_TILES", "4"))
+PREPROCESS_JPEG_QUALITY = int(os.environ.get("PREPROCESS_JPEG_QUALITY", "85"))
+HEIF_WORKERS = int(os.environ.get("HEIF_WORKERS", "2"))
+HEIF_CACHE_SIZE = int(os.environ.get("HEIF_CACHE_SIZE", "64"))
+
+# GPT-4o vision geometry: "high" fits the image in 2048x2048, scales the
+# shortest side to 768 and bills 170 tokens per 512px tile on top of 85.
+TILE_SIZE = 512
+HIGH_MAX_SIDE = 2048
+HIGH_SHORT_SIDE = 768
+BASE_TOKENS = 85
+TILE_TOKENS = 170
+
+# Drum meters keep colour: the prompts tell the model to skip red drums
+GRAYSCALE_UTILITIES = {"electricity"}
+
+# Pillow releases the GIL while decoding, resizing and encoding, so threads
+# are enough to keep this work off the event loop.
+_executor: ThreadPoolExecutor | None = None
+# HEIF transcodes get processes, so a libheif crash on a malformed upload
+# takes down a pool worker rather than the API process.
+_process_executor: ProcessPoolExecutor | None = None
+# JPEG transcodes of HEIF uploads by (sha256, utility_type), most recent last
+_transcoded: OrderedDict[tuple[str, str], tuple[bytes, str]] = OrderedDict()
+
+
+class UnsupportedImage(Exception):
+    """The upload is in a format the vision model cannot take and could not be converted."""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS, thread_name_prefix="preprocess")
+    return _executor
+
+
+def _get_process_executor() -> ProcessPoolExecutor:
+    global _process_executor
+    if _process_executor is None:
+        # spawn: forking a process that runs an event loop and thread pools is unsafe
+        _process_executor = ProcessPoolExecutor(
+            max_workers=HEIF_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_executor
+
+
+def shutdown_executor() -> None:
+    global _executor, _process_executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    if _process_executor is not None:
+        _process_executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+    _process_executor = None
+
+
+async def run_in_worker(func, *args):
+    """Run a CPU-bound image function on the preprocessing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), func, *args)
+
+
+async def run_in_process(func, *args):
+    """Run a picklable CPU-bound function on the HEIF process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_process_executor(), func, *args)
+
+
+def _register_heif_opener() -> bool:
+    """Teach Pillow to open HEIC/HEIF; False when pillow-heif is not installed."""
+    try:
+        from pillow_heif import register_heif_opener
+    except ImportError:
+        return False
+    register_heif_opener()
+    return True
+
+
+def count_tiles(width: int, height: int) -> int:
+    """Number of 512px tiles the vision model bills at detail=high."""
+    scale = min(1.0, HIGH_MAX_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, HIGH_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    return math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+def vision_tokens(width: int, height: int, detail: str) -> int:
+    if detail == "low":
+        return BASE_TOKENS
+    return BASE_TOKENS + TILE_TOKENS * count_tiles(width, height)
+
+
+def choose_detail(dimensions: tuple[int, int] | None) -> str:
+    """Small frames fit in a single low-detail pass; anything larger needs tiles."""
+    if dimensions is not None and max(dimensions) <= TILE_SIZE:
+        return "low"
+    return "high"
+
+
+def target_size(width: int, height: int, detail: str, max_tiles: int = VISION_MAX_TILES) -> tuple[int, int]:
+    """Smallest frame the model would not upscale again, capped at max_tiles."""
+    if detail == "low":
+        scale = min(1.0, TILE_SIZE / max(width, height))
+    else:
+        scale = min(1.0, HIGH_MAX_SIDE / max(width, height))
+        scale *= min(1.0, HIGH_SHORT_SIDE / (min(width, height) * scale))
+        best = 0.0
+        for cols in range(1, max_tiles + 1):
+            rows = max_tiles // cols
+            best = max(best, min(cols * TILE_SIZE / width, rows * TILE_SIZE / height))
+        scale = min(scale, best)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def preprocess_image(data: bytes, utility_type: str = "gas") -> tuple[bytes, str]:
+    """EXIF-rotate, optionally grayscale and downscale an upload for the vision model.
+
+    Returns (image bytes, detail). Falls back to the original bytes when
+    Pillow is missing or the image cannot be decoded, except for HEIF, which
+    raises UnsupportedImage since the model would not accept it anyway.
+    """
+    try:
+        dimensions = get_image_dimensions(data, "")
+    except Exception:
+        dimensions = None
+    detail = choose_detail(dimensions)
+    heif = _detect_format(data) == "heif"
+
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        if heif:
+            raise UnsupportedImage("HEIC images need Pillow and pillow-heif")
+        return data, detail
+    if heif and not _register_heif_opener():
+        raise UnsupportedImage("HEIC images need pillow-heif")
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            size = target_size(width, height, detail)
+            # Let the JPEG decoder do most of the downscale for free
+            img.draft("RGB", size)
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("L" if utility_type in GRAYSCALE_UTILITIES else "RGB")
+            size = target_size(img.width, img.height, detail)
+            if size != img.size:
+                img = img.resize(size, Image.Resampling.LANCZOS)
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=PREPROCESS_JPEG_QUALITY, optimize=True)
+    except Exception:
+        if heif:
+            raise UnsupportedImage("Could not decode HEIC image")
+        logger.warning("Image preprocessing failed, sending original upload", exc_info=True)
+        return data, detail
+
+    processed = buf.getvalue()
+    logger.info("Preprocessed image: %d -> %d bytes, %dx%d, detail=%s", len(data), len(processed), *size, detail)
+    return processed, detail
+
+
+async def preprocess(data: bytes, utility_type: str = "gas") -> tuple[bytes, str]:
+    if _detect_format(data) != "heif":
+        return await run_in_worker(preprocess_image, data, utility_type)
+
+    # HEIF: transcode to JPEG in a separate process, once per distinct upload
+    key = (hashlib.sha256(data).hexdigest(), utility_type)
+    cached = _transcoded.get(key)
+    if cached is not None:
+        _transcoded.move_to_end(key)
+        return cached
+    result = await run_in_process(preprocess_image, bytes(data), utility_type)
+    _transcoded[key] = result
+    while len(_transcoded) > HEIF_CACHE_SIZE:
+        _transcoded.popitem(last=False)
+    return result
@@ -0,0 +1,314 @@
+"""Token-bucket rate limiting shared by all workers.
+
+Routes declare a limit as a dependency:
+
+    @router.post("/login", dependencies=[Depends(limiter.limit("10/minute"))])
+
+"10/minute" is a bucket of 10 tokens refilled at 10 per minute, one bucket
+per route and client. Clients are keyed by user id when the request carries
+a valid bearer token and by remote address otherwise.
+
+With RATE_LIMIT_BACKEND=postgres (the default) the buckets live in the
+rate_limit_buckets table and are changed by one atomic upsert, so the limit
+holds across uvicorn workers and replicas. A process does not go to the
+table for every request: it takes a lease of several tokens at once (up to a
+fifth of the capacity, at most RATE_LIMIT_LEASE_SIZE) and grants requests
+from it locally until it runs out. Leased tokens are already gone from the
+shared bucket, and a lease expires once the bucket could have refilled it,
+so leftover tokens are never spent on top of a bucket that has since
+refilled; as the shared bucket runs low the leases shrink to a single token,
+so no worker hoards the last ones. Each process also keeps a local copy of
+its own buckets: a process never sees fewer tokens used than the shared
+bucket, so a local "no" is final and over-limit clients are turned away
+without touching the database. A shared "no" also holds locally until its
+Retry-After, since other workers can only use tokens up, not add any.
+If the database is unreachable the local buckets keep enforcing the limit
+per process. RATE_LIMIT_BACKEND=memory keeps everything in process, for
+tests and single-worker runs.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+from sqlalchemy import Float, Integer, String, bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import engine
+from app.dependencies import verify_token
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.environ.get("RATELIMIT_ENABLED", "true").lower() not in ("0", "false", "no")
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "postgres")
+RATE_LIMIT_LOCAL_KEYS = int(os.environ.get("RATE_LIMIT_LOCAL_KEYS", "10000"))
+RATE_LIMIT_LEASE_SIZE = int(os.environ.get("RATE_LIMIT_LEASE_SIZE", "10"))
+# Buckets idle this long are full again and can be deleted
+RATE_LIMIT_PURGE_SECONDS = int(os.environ.get("RATE_LIMIT_PURGE_SECONDS", "3600"))
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+# A lease takes at most 1/_LEASE_SHARE of a bucket, so several workers can hold one
+_LEASE_SHARE = 5
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+
+
+def parse_rate(rate: str) -> tuple[int, float]:
+    """'10/minute' -> (capacity 10, refill 10/60 tokens per second)."""
+    count, _, period = rate.partition("/")
+    seconds = _PERIODS[period.strip().rstrip("s")]
+    capacity = int(count)
+    return capacity, capacity / seconds
+
+
+class TokenBuckets:
+    """In-process token buckets, least recently used evicted beyond maxsize."""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_LOCAL_KEYS, clock=time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, capacity: int, refill: float) -> tuple[bool, float]:
+        """Take one token; (allowed, seconds until one is available if not)."""
+        granted, tokens = self.take_many(key, capacity, refill, 1)
+        return granted > 0, 0.0 if granted else (1 - tokens) / refill
+
+    def take_many(self, key: str, capacity: int, refill: float, count: int) -> tuple[int, float]:
+        """Take up to count whole tokens; (tokens taken, tokens left)."""
+        now = self._clock()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        granted = min(count, int(tokens))
+        tokens -= granted
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return granted, tokens
+
+    def give_back(self, key: str, capacity: int) -> None:
+        """Return a token taken for a request that was not let through after all."""
+        if key in self._buckets:
+            tokens, updated = self._buckets[key]
+            self._buckets[key] = (min(capacity, tokens + 1), updated)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class MemoryBackend:
+    shared = False
+
+    def __init__(self):
+        self.buckets = TokenBuckets()
+
+    async def take(self, key: str, capacity: int, refill: float, count: int = 1) -> tuple[int, float]:
+        return self.buckets.take_many(key, capacity, refill, count)
+
+    def clear(self) -> None:
+        self.buckets.clear()
+
+
+# Refill and take up to :count whole tokens in one statement. The UPDATE only
+# happens when at least one is available and records how many it took in
+# granted; when none is, the second branch reports the refilled level from
+# the statement's snapshot so the caller can compute Retry-After.
+_LEVEL = "LEAST(:capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at)::float8 * :refill)"
+_TAKE = text(
+    f"""
+    WITH taken AS (
+        INSERT INTO rate_limit_buckets AS b (key, tokens, granted, updated_at)
+        VALUES (:key, :capacity - LEAST(:count, :capacity), LEAST(:count, :capacity), now())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = {_LEVEL} - LEAST(:count, FLOOR({_LEVEL})),
+            granted = LEAST(:count, FLOOR({_LEVEL})),
+            updated_at = now()
+        WHERE {_LEVEL} >= 1
+        RETURNING b.granted, b.tokens
+    )
+    SELECT granted, tokens FROM taken
+    UNION ALL
+    SELECT 0, {_LEVEL}
+    FROM rate_limit_buckets AS b
+    WHERE key = :key AND NOT EXISTS (SELECT 1 FROM taken)
+    """
+).bindparams(
+    bindparam("key", type_=String),
+    bindparam("capacity", type_=Float),
+    bindparam("refill", type_=Float),
+    bindparam("count", type_=Integer),
+)
+_PURGE = text("DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => :seconds)")
+
+
+class PostgresBackend:
+    shared = True
+
+    def __init__(self, bind=None):
+        # Autocommit: a check is a single round trip, no BEGIN/COMMIT around it
+        self._engine = (bind or engine).execution_options(isolation_level="AUTOCOMMIT")
+        self._purged_at = time.monotonic()
+        self._purge: asyncio.Task | None = None
+
+    async def take(self, key: str, capacity: int, refill: float, count: int = 1) -> tuple[int, float]:
+        params = {"key": key, "capacity": capacity, "refill": refill, "count": count}
+        async with self._engine.connect() as conn:
+            row = (await conn.execute(_TAKE, params)).one()
+        self._maybe_purge()
+        return int(row.granted), row.tokens
+
+    def _maybe_purge(self) -> None:
+        if time.monotonic() - self._purged_at < RATE_LIMIT_PURGE_SECONDS:
+            return
+        self._purged_at = time.monotonic()
+        self._purge = asyncio.ensure_future(self._delete_idle())
+
+    async def _delete_idle(self) -> None:
+        try:
+            async with self._engine.connect() as conn:
+                await conn.execute(_PURGE, {"seconds": RATE_LIMIT_PURGE_SECONDS})
+        except SQLAlchemyError as e:
+            logger.warning("Rate limit bucket purge failed: %s", e)
+
+    def clear(self) -> None:
+        pass
+
+
+def client_key(request: Request) -> str:
+    """User id for authenticated requests, remote address otherwise."""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{verify_token(token)}"
+        except HTTPException:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimiter:
+    def __init__(self, backend, enabled: bool = RATE_LIMIT_ENABLED, clock=time.monotonic):
+        self.enabled = enabled
+        self.backend = backend
+        self._clock = clock
+        self.local = TokenBuckets(clock=clock)
+        self._blocked: OrderedDict[str, float] = OrderedDict()
+        # key -> (leased tokens not yet granted, lease size, shared tokens left after it, granted at)
+        self._leases: OrderedDict[str, tuple[int, int, float, float]] = OrderedDict()
+        self._stats = {
+            "checks": 0,
+            "local_rejections": 0,
+            "lease_grants": 0,
+            "backend_checks": 0,
+            "rejections": 0,
+            "backend_errors": 0,
+        }
+
+    async def check(self, key: str, capacity: int, refill: float) -> None:
+        """Take a token for key or raise RateLimitExceeded."""
+        self._stats["checks"] += 1
+        if not self.backend.shared:
+            granted, tokens = await self.backend.take(key, capacity, refill)
+            allowed, retry_after = granted > 0, (1 - tokens) / refill
+        else:
+            allowed, retry_after = self._check_local(key, capacity, refill)
+            if allowed and self._use_lease(key, refill):
+                self._stats["lease_grants"] += 1
+            elif allowed:
+                self._stats["backend_checks"] += 1
+                try:
+                    granted, tokens = await self.backend.take(
+                        key, capacity, refill, self._lease_size(key, capacity, refill)
+                    )
+                    allowed, retry_after = granted > 0, max(0.0, (1 - tokens) / refill)
+                    if granted:
+                        self._store_lease(key, granted, tokens)
+                except (SQLAlchemyError, OSError) as e:
+                    self._stats["backend_errors"] += 1
+                    logger.warning("Rate limit backend unavailable, using per-process limit: %s", e)
+                if not allowed:
+                    # Keep the local bucket an upper bound of the shared one
+                    self.local.give_back(key, capacity)
+                    self._block(key, retry_after)
+            else:
+                self._stats["local_rejections"] += 1
+        if not allowed:
+            self._stats["rejections"] += 1
+            raise RateLimitExceeded(retry_after)
+
+    def _check_local(self, key: str, capacity: int, refill: float) -> tuple[bool, float]:
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None:
+            remaining = blocked_until - self._clock()
+            if remaining > 0:
+                return False, remaining
+            del self._blocked[key]
+        return self.local.take(key, capacity, refill)
+
+    def _use_lease(self, key: str, refill: float) -> bool:
+        held, size, shared_left, granted_at = self._leases.get(key, (0, 0, 0.0, 0.0))
+        if not held:
+            return False
+        if self._clock() - granted_at >= size / refill:
+            # The shared bucket has refilled what this lease took by now
+            self._leases[key] = (0, size, shared_left, granted_at)
+            return False
+        self._leases[key] = (held - 1, size, shared_left, granted_at)
+        return True
+
+    def _lease_size(self, key: str, capacity: int, refill: float) -> int:
+        size = min(RATE_LIMIT_LEASE_SIZE, capacity // _LEASE_SHARE)
+        if key in self._leases:
+            _, _, shared_left, granted_at = self._leases[key]
+            # Near the limit, lease at most half of what the shared bucket has
+            # refilled to since the last lease, were no other worker using it
+            shared_left = min(capacity, shared_left + (self._clock() - granted_at) * refill)
+            size = min(size, int(shared_left // 2))
+        return max(1, size)
+
+    def _store_lease(self, key: str, size: int, shared_left: float) -> None:
+        # One token of the lease goes to the request that took it
+        self._leases[key] = (size - 1, size, shared_left, self._clock())
+        self._leases.move_to_end(key)
+        while len(self._leases) > RATE_LIMIT_LOCAL_KEYS:
+            self._leases.popitem(last=False)
+
+    def _block(self, key: str, retry_after: float) -> None:
+        self._blocked[key] = self._clock() + retry_after
+        self._blocked.move_to_end(key)
+        while len(self._blocked) > RATE_LIMIT_LOCAL_KEYS:
+            self._blocked.popitem(last=False)
+
+    def limit(self, rate: str):
+        """Dependency enforcing rate per route and client."""
+        capacity, refill = parse_rate(rate)
+
+        async def dependency(request: Request) -> None:
+            if not self.enabled:
+                return
+            route = request.scope.get("route")
+            scope = f"{request.method} {route.path if route else request.url.path}"
+            await self.check(f"{scope}|{client_key(request)}", capacity, refill)
+
+        return dependency
+
+    def reset(self) -> None:
+        self.local.clear()
+        self._blocked.clear()
+        self._leases.clear()
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        return {"backend": type(self.backend).__name__, **self._stats}
+
+
+limiter = RateLimiter(PostgresBackend() if RATE_LIMIT_BACKEND == "postgres" else MemoryBackend())
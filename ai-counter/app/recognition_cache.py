@@ -0,0 +1,209 @@
+import hashlib
+import io
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import async_session
+from app.models.recognition_cache import RecognitionCacheEntry
+from app.preprocess import run_in_worker
+from app.recognizer import PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+RECOGNITION_CACHE_SIZE = int(os.environ.get("RECOGNITION_CACHE_SIZE", "1024"))
+RECOGNITION_CACHE_TTL_SECONDS = int(os.environ.get("RECOGNITION_CACHE_TTL_SECONDS", "3600"))
+RECOGNITION_CACHE_DB = os.environ.get("RECOGNITION_CACHE_DB", "").lower() in ("1", "true", "yes")
+# Perceptual mode also matches re-encoded / slightly re-cropped copies of a frame.
+# Keep the TTL short with it on: two photos of a meter minutes apart can hash alike.
+RECOGNITION_CACHE_PERCEPTUAL = os.environ.get("RECOGNITION_CACHE_PERCEPTUAL", "").lower() in ("1", "true", "yes")
+RECOGNITION_CACHE_MAX_DISTANCE = int(os.environ.get("RECOGNITION_CACHE_MAX_DISTANCE", "6"))
+
+
+def _dhash(data: bytes) -> int | None:
+    """64-bit difference hash of the image, or None if it cannot be decoded."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("L", (64, 64))
+            small = img.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+            pixels = small.tobytes()
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    # Signed so it fits a Postgres BIGINT
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _distance(a: int, b: int) -> int:
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+
+class Fingerprint:
+    """Content hash of an upload, plus its perceptual hash in perceptual mode."""
+
+    __slots__ = ("digest", "phash")
+
+    def __init__(self, digest: str, phash: int | None = None):
+        self.digest = digest
+        self.phash = phash
+
+
+class RecognitionCache:
+    """Two-tier cache of parsed recognition results.
+
+    Entries are keyed on (image hash, meter, utility_type, digit_count, prompt
+    version). The meter scopes every entry to one user's meter, so a near
+    duplicate in perceptual mode never answers with another meter's reading.
+    The in-memory tier is an LRU with TTL; the optional Postgres tier survives
+    restarts and is looked up by exact key only.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = RECOGNITION_CACHE_SIZE,
+        ttl: float = RECOGNITION_CACHE_TTL_SECONDS,
+        use_db: bool = RECOGNITION_CACHE_DB,
+        perceptual: bool = RECOGNITION_CACHE_PERCEPTUAL,
+        max_distance: int = RECOGNITION_CACHE_MAX_DISTANCE,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.use_db = use_db
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self._entries: OrderedDict[str, tuple[float, str, int | None]] = OrderedDict()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def fingerprint(self, image_data: bytes) -> Fingerprint:
+        if self.perceptual:
+            phash = await run_in_worker(_dhash, image_data)
+            if phash is not None:
+                return Fingerprint(f"p{phash & 0xFFFFFFFFFFFFFFFF:016x}", phash)
+        return Fingerprint(hashlib.sha256(image_data).hexdigest())
+
+    @staticmethod
+    def _key(fp: Fingerprint, meter_id: uuid.UUID, utility_type: str, digit_count: int) -> str:
+        return f"{PROMPT_VERSION}:{utility_type}:{digit_count}:{meter_id}:{fp.digest}"
+
+    def _get_memory(self, key: str, fp: Fingerprint) -> str | None:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, digits, _ = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return digits
+            del self._entries[key]
+
+        if fp.phash is None:
+            return None
+
+        # Near-duplicate scan: same meter and shape (the key prefix), phash within max_distance
+        prefix = key.rsplit(":", 1)[0] + ":"
+        for other_key, (expires_at, digits, phash) in reversed(self._entries.items()):
+            if phash is None or expires_at <= now or not other_key.startswith(prefix):
+                continue
+            if _distance(phash, fp.phash) <= self.max_distance:
+                self._entries.move_to_end(other_key)
+                return digits
+        return None
+
+    def _put_memory(self, key: str, digits: str, phash: int | None) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, digits, phash)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, fp: Fingerprint, meter_id: uuid.UUID, utility_type: str, digit_count: int) -> str | None:
+        """Return cached digits for this image of the meter, or None on a miss."""
+        key = self._key(fp, meter_id, utility_type, digit_count)
+        digits = self._get_memory(key, fp)
+        if digits is not None:
+            self.hits += 1
+            return digits
+
+        if self.use_db:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+            try:
+                async with async_session() as db:
+                    result = await db.execute(
+                        select(RecognitionCacheEntry.digits).where(
+                            RecognitionCacheEntry.key == key, RecognitionCacheEntry.created_at >= cutoff
+                        )
+                    )
+                    digits = result.scalar_one_or_none()
+            except Exception:
+                logger.exception("Recognition cache lookup failed")
+                digits = None
+            if digits is not None:
+                self._put_memory(key, digits, fp.phash)
+                self.hits += 1
+                self.db_hits += 1
+                return digits
+
+        self.misses += 1
+        return None
+
+    async def put(self, fp: Fingerprint, meter_id: uuid.UUID, utility_type: str, digit_count: int, digits: str) -> None:
+        """Store a parsed result. The DB tier uses its own short-lived session."""
+        key = self._key(fp, meter_id, utility_type, digit_count)
+        self._put_memory(key, digits, fp.phash)
+
+        if not self.use_db:
+            return
+        try:
+            async with async_session() as db:
+                await db.execute(
+                    insert(RecognitionCacheEntry)
+                    .values(
+                        key=key,
+                        phash=fp.phash,
+                        utility_type=utility_type,
+                        digit_count=digit_count,
+                        prompt_version=PROMPT_VERSION,
+                        digits=digits,
+                    )
+                    .on_conflict_do_update(
+                        index_elements=[RecognitionCacheEntry.key],
+                        set_={"digits": digits, "created_at": datetime.now(timezone.utc)},
+                    )
+                )
+                await db.commit()
+        except Exception:
+            logger.exception("Recognition cache store failed")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+recognition_cache = RecognitionCache()
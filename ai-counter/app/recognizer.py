@@ -1,12 +1,73 @@
+import asyncio
 import base64
+import json
 import logging
+import math
 import os
+import re
+import time
+from collections import deque
+from typing import AsyncIterator
 
-from openai import OpenAI
+import httpx
+import openai
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionChunk
+
+from app import openai_compat
+from app.preprocess import run_in_worker
+from app.validation import normalize_digits
 
 logger = logging.getLogger(__name__)
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", "10"))
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.environ.get("OPENAI_MAX_KEEPALIVE", "10"))
+
+# "cot" keeps the describe-then-JSON prompts; "structured" asks for schema-constrained
+# JSON only, optionally streamed and cut off once the object is complete.
+RECOGNITION_MODE = os.environ.get("RECOGNITION_MODE", "cot")
+RECOGNITION_STREAM = os.environ.get("RECOGNITION_STREAM", "").lower() in ("1", "true", "yes")
+COT_MAX_TOKENS = 300
+STRUCTURED_MAX_TOKENS = 64
+
+LOCAL_OCR_MIN_CONFIDENCE = float(os.environ.get("LOCAL_OCR_MIN_CONFIDENCE", "0.8"))
+
+# Tiers tried in order before GPT-4o. Each takes (image_data, utility_type,
+# digit_count) and returns an app.local_ocr.LocalReading or None; a read whose
+# weakest digit is below LOCAL_OCR_MIN_CONFIDENCE escalates to the next tier.
+# Empty for now: app.local_ocr cannot find the digit window in a whole photo
+# and misreads unseen faces, so it stays out until it meets the accuracy bar.
+LOCAL_RECOGNIZERS = []
+
+# Hedging: if a vision call is slower than HEDGE_PERCENTILE of recent calls,
+# fire an identical second one; the first valid answer wins. At most
+# HEDGE_MAX_RATIO of calls may hedge.
+HEDGE_ENABLED = os.environ.get("RECOGNITION_HEDGE", "").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "0.9"))
+HEDGE_MAX_RATIO = float(os.environ.get("HEDGE_MAX_RATIO", "0.1"))
+HEDGE_MIN_SAMPLES = 20
+
+# Image bytes base64-encoded per body chunk (a multiple of 3, so chunks join cleanly)
+B64_CHUNK_SIZE = 48 * 1024
+IMAGE_PLACEHOLDER = "__IMAGE_BASE64__"
+
+_latencies: deque[float] = deque(maxlen=200)
+
+_stats = {
+    "local_reads": 0,
+    "escalations": 0,
+    "vision_calls": 0,
+    "vision_requests": 0,
+    "hedges": 0,
+    "hedge_wins": 0,
+}
+
+# Process-wide client and concurrency cap, created in the app lifespan
+_client: AsyncOpenAI | None = None
+_http_client: httpx.AsyncClient | None = None
+_semaphore: asyncio.Semaphore | None = None
 
 GAS_SYSTEM_PROMPT = (
     "You are a precision gas meter digit reader.\n\n"
@@ -113,6 +174,9 @@ WATER_USER_PROMPT = (
     "Step 2: Return the JSON with your reading."
 )
 
+# Bump whenever the prompts change; it keys cached recognition results
+PROMPT_VERSION = f"v1-{RECOGNITION_MODE}"
+
 _PROMPTS = {
     "gas": (GAS_SYSTEM_PROMPT, GAS_USER_PROMPT),
     "electricity": (ELECTRICITY_SYSTEM_PROMPT, ELECTRICITY_USER_PROMPT),
@@ -120,6 +184,51 @@ _PROMPTS = {
 }
 
 
+def _structured_prompts(system_prompt: str, user_prompt: str) -> tuple[str, str]:
+    """Same instructions without the describe-each-drum step; the schema fixes the output."""
+    system_prompt = system_prompt.split("RESPONSE FORMAT:")[0] + "Respond with the JSON object only."
+    user_prompt = user_prompt.split("\n\nStep 1:")[0] + "\n\nReturn only the JSON reading."
+    return system_prompt, user_prompt
+
+
+_STRUCTURED_PROMPTS = {utility: _structured_prompts(*prompts) for utility, prompts in _PROMPTS.items()}
+
+
+def _reading_schema(digit_count: int) -> dict:
+    positions = [f"pos{i}" for i in range(1, digit_count + 1)]
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "meter_reading",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {p: {"type": "integer", "enum": list(range(10))} for p in positions},
+                "required": positions,
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def _parse_response(raw_text: str, digit_count: int = 5) -> str:
+    """Extract digits from GPT-4o response (JSON or chain-of-thought)."""
+    match = re.search(r'\{[^}]+\}', raw_text)
+    if match:
+        try:
+            data = json.loads(match.group())
+            values = [data.get(f"pos{i}") for i in range(1, digit_count + 1)]
+            if all(v is not None and isinstance(v, int) and 0 <= v <= 9 for v in values):
+                return "".join(str(v) for v in values)
+        except (json.JSONDecodeError, TypeError):
+            pass
+    return normalize_digits(raw_text)
+
+
+def _default_digit_count(utility_type: str) -> int:
+    return 6 if utility_type == "electricity" else 5
+
+
 def _detect_media_type(data: bytes) -> str:
     if data[:2] == b'\xff\xd8':
         return "image/jpeg"
@@ -128,20 +237,87 @@ def _detect_media_type(data: bytes) -> str:
     return "image/jpeg"
 
 
-def recognize_digits(image_data: bytes, content_type: str, utility_type: str = "gas") -> str:
-    """Send image to GPT-4o Vision API and return raw response text."""
-    b64 = base64.b64encode(image_data).decode("utf-8")
-    media_type = _detect_media_type(image_data)
+def init_client() -> AsyncOpenAI:
+    """Create the shared AsyncOpenAI client with a pooled keep-alive HTTP client."""
+    global _client, _http_client, _semaphore
+    if _client is None:
+        _http_client = http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONCURRENCY,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=5.0),
+        )
+        _client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client, timeout=OPENAI_TIMEOUT_SECONDS)
+        _semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client and its connection pool."""
+    global _client, _http_client, _semaphore
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _http_client = None
+    _semaphore = None
+
 
-    system_prompt, user_prompt = _PROMPTS.get(utility_type, _PROMPTS["gas"])
+def stats() -> dict:
+    return dict(_stats)
 
-    logger.info("Sending image to GPT-4o: %d bytes, type=%s, utility=%s", len(image_data), media_type, utility_type)
 
-    client = OpenAI(api_key=OPENAI_API_KEY)
+def _as_json(reading) -> str:
+    """Render a local read in the same JSON shape the prompts ask GPT-4o for."""
+    return json.dumps({f"pos{i}": int(d) for i, d in enumerate(reading.digits, start=1)})
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
+
+async def recognize_locally(image_data: bytes, utility_type: str = "gas", digit_count: int | None = None) -> str | None:
+    """Raw response text from the first confident local tier, or None to escalate to GPT-4o."""
+    if not LOCAL_RECOGNIZERS:
+        return None
+    digit_count = digit_count or _default_digit_count(utility_type)
+    for recognizer in LOCAL_RECOGNIZERS:
+        reading = await run_in_worker(recognizer, image_data, utility_type, digit_count)
+        if reading is None:
+            continue
+        if len(reading.digits) == digit_count and reading.confidence >= LOCAL_OCR_MIN_CONFIDENCE:
+            logger.info("Local %s read %s, confidences=%s", reading.engine, reading.digits, reading.confidences)
+            _stats["local_reads"] += 1
+            return _as_json(reading)
+        logger.info("Local %s read too uncertain (%s), escalating", reading.engine, reading.confidences)
+    _stats["escalations"] += 1
+    return None
+
+
+async def recognize_digits(
+    image_data: bytes,
+    content_type: str,
+    utility_type: str = "gas",
+    detail: str = "high",
+    digit_count: int | None = None,
+) -> str:
+    """Read the meter via GPT-4o Vision API; return raw response text."""
+    digit_count = digit_count or _default_digit_count(utility_type)
+    return await _recognize_with_vision(image_data, utility_type, detail, digit_count)
+
+
+def _build_request(
+    image_data: bytes, utility_type: str, detail: str, digit_count: int, mode: str
+) -> dict:
+    """Chat completion parameters in the given recognition mode.
+
+    The image URL holds a placeholder; _request_body streams the base64
+    image into its place when the request is sent.
+    """
+    media_type = _detect_media_type(image_data)
+    prompts = _STRUCTURED_PROMPTS if mode == "structured" else _PROMPTS
+    system_prompt, user_prompt = prompts.get(utility_type, prompts["gas"])
+
+    request = {
+        "model": "gpt-4o",
+        "messages": [
             {"role": "system", "content": system_prompt},
             {
                 "role": "user",
@@ -150,17 +326,237 @@ def recognize_digits(image_data: bytes, content_type: str, utility_type: str = "
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:{media_type};base64,{b64}",
-                            "detail": "high",
+                            "url": f"data:{media_type};base64,{IMAGE_PLACEHOLDER}",
+                            "detail": detail,
                         },
                     },
                 ],
             },
         ],
-        max_tokens=300,
-        temperature=0,
+        "max_tokens": COT_MAX_TOKENS,
+        "temperature": 0,
+    }
+    if mode == "structured":
+        request["response_format"] = _reading_schema(digit_count)
+        request["max_tokens"] = STRUCTURED_MAX_TOKENS
+    return request
+
+
+def _request_body(request: dict, image_data: bytes) -> tuple[int, AsyncIterator[bytes]]:
+    """(Content-Length, body chunks) with the image base64-encoded in place of the placeholder.
+
+    The image is encoded B64_CHUNK_SIZE bytes at a time from a memoryview, so
+    the full base64 string, data URL and serialized JSON never exist at once.
+    """
+    head, tail = json.dumps(request).encode().split(IMAGE_PLACEHOLDER.encode())
+    view = memoryview(image_data)
+    length = len(head) + 4 * ((len(view) + 2) // 3) + len(tail)
+
+    async def chunks() -> AsyncIterator[bytes]:
+        yield head
+        for i in range(0, len(view), B64_CHUNK_SIZE):
+            yield base64.b64encode(view[i : i + B64_CHUNK_SIZE])
+        yield tail
+
+    return length, chunks()
+
+
+class _SSEStream:
+    """Chat completion chunks from a streamed (text/event-stream) response."""
+
+    def __init__(self, response: httpx.Response):
+        self.response = response
+
+    async def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        async for line in self.response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                return
+            yield ChatCompletionChunk.model_validate(json.loads(data))
+
+    async def close(self) -> None:
+        await self.response.aclose()
+
+
+async def _post_completion(request: dict, image_data: bytes, stream: bool) -> tuple[str, int]:
+    """POST a chat completion with a streamed body; return (content, output tokens).
+
+    Goes through the shared pooled HTTP client directly, since the SDK always
+    serializes the whole body in memory, but keeps the SDK's behaviour around
+    the request: failures raise the same openai exceptions, and the same
+    connection errors and statuses are retried with the client's max_retries
+    and backoff (through app.openai_compat, the one place that uses SDK
+    internals). Streamed replies count content chunks read before the JSON
+    closed as their output tokens.
+    """
+    client = init_client()
+    body = {**request, "stream": True} if stream else request
+    remaining = client.max_retries
+    while True:
+        # A fresh body stream per attempt; a consumed one cannot be replayed
+        length, chunks = _request_body(body, image_data)
+        http_request = _http_client.build_request(
+            "POST",
+            f"{str(client.base_url).rstrip('/')}/chat/completions",
+            content=chunks,
+            headers={
+                "Authorization": f"Bearer {client.api_key}",
+                "Content-Type": "application/json",
+                "Content-Length": str(length),
+            },
+        )
+        try:
+            response = await _http_client.send(http_request, stream=True)
+        except httpx.TimeoutException as e:
+            if not remaining:
+                raise openai.APITimeoutError(request=http_request) from e
+            headers = None
+        except httpx.TransportError as e:
+            if not remaining:
+                raise openai.APIConnectionError(request=http_request) from e
+            headers = None
+        else:
+            if response.status_code < 400:
+                break
+            await response.aread()
+            await response.aclose()
+            if not remaining or not openai_compat.should_retry(client, response):
+                raise openai_compat.status_error(client, response)
+            headers = response.headers
+        logger.info("Vision request failed, %d retries left", remaining)
+        await asyncio.sleep(openai_compat.retry_delay(client, remaining, headers))
+        remaining -= 1
+
+    if stream:
+        return await _read_stream(_SSEStream(response))
+    try:
+        payload = json.loads(await response.aread())
+    finally:
+        await response.aclose()
+    usage = payload.get("usage") or {}
+    return payload["choices"][0]["message"]["content"] or "", usage.get("completion_tokens", 0)
+
+
+def _json_complete(text: str) -> bool:
+    """True once the first top-level JSON object in text has been closed."""
+    depth = 0
+    for ch in text:
+        if ch == "{":
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                return True
+    return False
+
+
+async def _read_stream(stream) -> tuple[str, int]:
+    """Collect streamed content until the JSON object closes; return (text, chunks read)."""
+    parts = []
+    chunks = 0
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            chunks += 1
+            if "}" in delta and _json_complete("".join(parts)):
+                break
+    finally:
+        await stream.close()
+    return "".join(parts), chunks
+
+
+async def _vision_call(request: dict, image_data: bytes, stream: bool) -> str:
+    """One chat completion request; records its latency for the hedging percentile."""
+    init_client()
+    _stats["vision_requests"] += 1
+
+    async with _semaphore:
+        start = time.monotonic()
+        raw, _ = await _post_completion(request, image_data, stream)
+        _latencies.append(time.monotonic() - start)
+    return raw
+
+
+def _hedge_delay() -> float | None:
+    """Latency at HEDGE_PERCENTILE of recent calls, or None while warming up."""
+    if len(_latencies) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(_latencies)
+    return ordered[min(len(ordered) - 1, math.ceil(HEDGE_PERCENTILE * len(ordered)) - 1)]
+
+
+def _hedge_allowed() -> bool:
+    return _stats["hedges"] + 1 <= HEDGE_MAX_RATIO * max(1, _stats["vision_calls"])
+
+
+async def _hedged_call(request: dict, image_data: bytes, stream: bool, digit_count: int) -> str:
+    """Race a second identical request against a slow first one; the first valid reply wins."""
+    first = asyncio.create_task(_vision_call(request, image_data, stream))
+    tasks = {first}
+    try:
+        delay = _hedge_delay()
+        if delay is not None:
+            await asyncio.wait(tasks, timeout=delay)
+        if first.done() or delay is None or not _hedge_allowed():
+            return await first
+
+        _stats["hedges"] += 1
+        second = asyncio.create_task(_vision_call(request, image_data, stream))
+        tasks.add(second)
+        logger.info("Vision call slower than p%d (%.2fs), hedging", HEDGE_PERCENTILE * 100, delay)
+
+        pending = set(tasks)
+        fallback = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    fallback = fallback or task
+                    continue
+                if len(_parse_response(task.result(), digit_count)) >= digit_count:
+                    if task is second:
+                        _stats["hedge_wins"] += 1
+                    return task.result()
+                fallback = task
+        # Neither reply parsed: surface the last one like an unhedged call would
+        return fallback.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _recognize_with_vision(
+    image_data: bytes,
+    utility_type: str,
+    detail: str,
+    digit_count: int,
+    mode: str | None = None,
+    stream: bool | None = None,
+    hedge: bool | None = None,
+) -> str:
+    """Send image to GPT-4o Vision API and return raw response text."""
+    mode = mode or RECOGNITION_MODE
+    stream = RECOGNITION_STREAM if stream is None else stream
+    hedge = HEDGE_ENABLED if hedge is None else hedge
+    request = _build_request(image_data, utility_type, detail, digit_count, mode)
+
+    logger.info(
+        "Sending image to GPT-4o: %d bytes, utility=%s, detail=%s, mode=%s, stream=%s",
+        len(image_data), utility_type, detail, mode, stream,
     )
 
-    raw = response.choices[0].message.content or ""
+    _stats["vision_calls"] += 1
+    if hedge:
+        raw = await _hedged_call(request, image_data, stream, digit_count)
+    else:
+        raw = await _vision_call(request, image_data, stream)
+
     logger.info("GPT-4o raw response: %s", raw)
     return raw
@@ -1,58 +1,60 @@
-import uuid
-
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from sqlalchemy import select
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.auth_cache import Principal, invalidate_user
 from app.dependencies import get_current_user, get_db
-
-limiter = Limiter(key_func=get_remote_address)
-from app.models.meter import Meter
-from app.models.property import Property
 from app.models.user import User
+from app.rate_limit import limiter
 from app.schemas.auth import AppleAuthRequest, AuthResponse, GoogleAuthRequest, LoginRequest, RegisterRequest, UserResponse
-from app.services.auth import create_access_token, hash_password, verify_apple_token, verify_password
+from app.services.accounts import provision_user
+from app.services.auth import (
+    create_access_token,
+    hash_password,
+    needs_rehash,
+    verify_apple_token,
+    verify_google_token,
+    verify_password,
+)
+from app.services.ownership import invalidate_meters
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-async def _create_default_property_and_meter(db: AsyncSession, user_id: uuid.UUID) -> None:
-    """Create a default property and gas meter for a new user."""
-    prop = Property(user_id=user_id, name="My Home")
-    db.add(prop)
-    await db.flush()
-
-    gas_meter = Meter(property_id=prop.id, utility_type="gas", name="Gas Meter")
-    db.add(gas_meter)
-
-    electricity_meter = Meter(property_id=prop.id, utility_type="electricity", name="Electricity Meter", digit_count=6)
-    db.add(electricity_meter)
-
-    water_meter = Meter(property_id=prop.id, utility_type="water", name="Water Meter")
-    db.add(water_meter)
-
-
-@router.post("/register", response_model=AuthResponse, status_code=status.HTTP_201_CREATED)
-@limiter.limit("10/minute")
+async def _provision_social(db: AsyncSession, provider_column: str, provider_id: str, email: str, name: str):
+    """Create or email-link the account for a provider id in one statement."""
+    try:
+        provisioned = await provision_user(
+            db, link_on_email=provider_column, email=email, name=name, **{provider_column: provider_id}
+        )
+    except IntegrityError:
+        # A concurrent login with the same provider id got there first
+        result = await db.execute(select(User).where(getattr(User, provider_column) == provider_id))
+        user = result.scalar_one_or_none()
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
+        return user
+    if not provisioned.created:
+        invalidate_user(provisioned.user.id)
+    return provisioned.user
+
+
+@router.post(
+    "/register",
+    response_model=AuthResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limiter.limit("10/minute"))],
+)
 async def register(request: Request, body: RegisterRequest, db: AsyncSession = Depends(get_db)):
-    # Check if email already exists
-    result = await db.execute(select(User).where(User.email == body.email))
-    if result.scalar_one_or_none():
+    # The unique constraint on email replaces an exists-check round trip
+    try:
+        provisioned = await provision_user(
+            db, email=body.email, password_hash=await hash_password(body.password), name=body.name
+        )
+    except IntegrityError:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
-
-    user = User(
-        email=body.email,
-        password_hash=hash_password(body.password),
-        name=body.name,
-    )
-    db.add(user)
-    await db.flush()
-
-    await _create_default_property_and_meter(db, user.id)
-    await db.commit()
-    await db.refresh(user)
+    user = provisioned.user
 
     token = create_access_token(str(user.id))
     return AuthResponse(
@@ -61,15 +63,19 @@ async def register(request: Request, body: RegisterRequest, db: AsyncSession = D
     )
 
 
-@router.post("/login", response_model=AuthResponse)
-@limiter.limit("10/minute")
+@router.post("/login", response_model=AuthResponse, dependencies=[Depends(limiter.limit("10/minute"))])
 async def login(request: Request, body: LoginRequest, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.email == body.email))
     user = result.scalar_one_or_none()
 
-    if not user or not user.password_hash or not verify_password(body.password, user.password_hash):
+    if not user or not user.password_hash or not await verify_password(body.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
+    # Move the stored hash to the configured cost while the plaintext is at hand
+    if needs_rehash(user.password_hash):
+        user.password_hash = await hash_password(body.password)
+        await db.commit()
+
     token = create_access_token(str(user.id))
     return AuthResponse(
         access_token=token,
@@ -77,18 +83,13 @@ async def login(request: Request, body: LoginRequest, db: AsyncSession = Depends
     )
 
 
-@router.post("/google", response_model=AuthResponse)
-@limiter.limit("10/minute")
+@router.post("/google", response_model=AuthResponse, dependencies=[Depends(limiter.limit("10/minute"))])
 async def google_auth(request: Request, body: GoogleAuthRequest, db: AsyncSession = Depends(get_db)):
     # Verify Google ID token
-    from google.auth.transport.requests import Request
-    from google.oauth2 import id_token
-
     from app.config import GOOGLE_CLIENT_ID
 
-    try:
-        idinfo = id_token.verify_oauth2_token(body.google_id_token, Request(), GOOGLE_CLIENT_ID)
-    except ValueError:
+    idinfo = await verify_google_token(body.google_id_token, GOOGLE_CLIENT_ID)
+    if not idinfo:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Google token")
 
     google_id = idinfo["sub"]
@@ -100,19 +101,8 @@ async def google_auth(request: Request, body: GoogleAuthRequest, db: AsyncSessio
     user = result.scalar_one_or_none()
 
     if not user:
-        # Check if email exists (link accounts)
-        result = await db.execute(select(User).where(User.email == email))
-        user = result.scalar_one_or_none()
-        if user:
-            user.google_id = google_id
-        else:
-            user = User(email=email, google_id=google_id, name=name)
-            db.add(user)
-            await db.flush()
-            await _create_default_property_and_meter(db, user.id)
-
-        await db.commit()
-        await db.refresh(user)
+        # New account, or link to the existing one with this email
+        user = await _provision_social(db, "google_id", google_id, email=email, name=name)
 
     token = create_access_token(str(user.id))
     return AuthResponse(
@@ -121,8 +111,7 @@ async def google_auth(request: Request, body: GoogleAuthRequest, db: AsyncSessio
     )
 
 
-@router.post("/apple", response_model=AuthResponse)
-@limiter.limit("10/minute")
+@router.post("/apple", response_model=AuthResponse, dependencies=[Depends(limiter.limit("10/minute"))])
 async def apple_auth(request: Request, body: AppleAuthRequest, db: AsyncSession = Depends(get_db)):
     from app.config import APPLE_BUNDLE_ID
 
@@ -139,20 +128,8 @@ async def apple_auth(request: Request, body: AppleAuthRequest, db: AsyncSession
     user = result.scalar_one_or_none()
 
     if not user:
-        # Check if email exists (link accounts)
-        if email:
-            result = await db.execute(select(User).where(User.email == email))
-            user = result.scalar_one_or_none()
-        if user:
-            user.apple_id = apple_id
-        else:
-            user = User(email=email or f"{apple_id}@apple.private", apple_id=apple_id, name=name)
-            db.add(user)
-            await db.flush()
-            await _create_default_property_and_meter(db, user.id)
-
-        await db.commit()
-        await db.refresh(user)
+        # New account, or link to the existing one with this email
+        user = await _provision_social(db, "apple_id", apple_id, email=email or f"{apple_id}@apple.private", name=name)
 
     token = create_access_token(str(user.id))
     return AuthResponse(
@@ -161,13 +138,15 @@ async def apple_auth(request: Request, body: AppleAuthRequest, db: AsyncSession
     )
 
 
-@router.delete("/account", status_code=status.HTTP_200_OK)
-@limiter.limit("3/minute")
+@router.delete("/account", status_code=status.HTTP_200_OK, dependencies=[Depends(limiter.limit("3/minute"))])
 async def delete_account(
     request: Request,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    await db.delete(user)
+    # Properties, meters, readings etc. go with it via ON DELETE CASCADE
+    await db.execute(delete(User).where(User.id == user.id))
     await db.commit()
+    invalidate_user(user.id)
+    invalidate_meters(user.id)
     return {"detail": "Account deleted"}
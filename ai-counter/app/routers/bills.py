@@ -1,85 +1,75 @@
 import uuid
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import Float, cast, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.auth_cache import Principal
 from app.dependencies import get_current_user, get_db
-
-limiter = Limiter(key_func=get_remote_address)
+from app.etags import ETAG_HEADER, bump_meters, make_etag, meter_version, not_modified
 from app.models.bill import Bill
 from app.models.meter import Meter
 from app.models.property import Property
 from app.models.reading import Reading
-from app.models.user import User
+from app.pagination import page_rows, paginate
+from app.rate_limit import limiter
+from app.responses import rows_response
 from app.schemas.bill import BillCreate, BillResponse
 from app.services.billing import calculate_cost
+from app.services.ownership import OwnedMeter, get_owned_meter, owned_meter
 
 router = APIRouter(prefix="/bills", tags=["bills"])
 
 
-async def _verify_meter_ownership(meter_id: str, user: User, db: AsyncSession) -> Meter:
-    try:
-        mid = uuid.UUID(meter_id)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid meter_id")
-
-    result = await db.execute(
-        select(Meter).join(Property).where(Meter.id == mid, Property.user_id == user.id)
-    )
-    meter = result.scalar_one_or_none()
-    if not meter:
-        raise HTTPException(status_code=404, detail="Meter not found")
-    return meter
-
-
 @router.get("", response_model=list[BillResponse])
 async def list_bills(
-    meter_id: str,
+    request: Request,
+    response: Response,
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
-    user: User = Depends(get_current_user),
+    cursor: str | None = Query(default=None),
+    meter: OwnedMeter = Depends(owned_meter),
     db: AsyncSession = Depends(get_db),
 ):
-    meter = await _verify_meter_ownership(meter_id, user, db)
-
+    """Newest first; pass the X-Next-Cursor response header back as cursor for the next page."""
+    etag = make_etag(request, await meter_version(db, meter.id))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    columns = select(
+        Bill.id,
+        Bill.meter_id,
+        Bill.reading_from_id,
+        Bill.reading_to_id,
+        cast(Bill.tariff_used, Float).label("tariff_used"),
+        Bill.currency,
+        cast(Bill.consumed_units, Float).label("consumed_units"),
+        cast(Bill.total_cost, Float).label("total_cost"),
+        Bill.period_start,
+        Bill.period_end,
+    )
     result = await db.execute(
-        select(Bill)
-        .where(Bill.meter_id == meter.id)
-        .order_by(Bill.period_end.desc())
-        .limit(limit)
-        .offset(offset)
+        paginate(columns.where(Bill.meter_id == meter.id), Bill.period_end, Bill.id, limit, offset, cursor)
     )
-    bills = result.scalars().all()
-    return [
-        BillResponse(
-            id=str(b.id),
-            meter_id=str(b.meter_id),
-            reading_from_id=str(b.reading_from_id),
-            reading_to_id=str(b.reading_to_id),
-            tariff_used=float(b.tariff_used),
-            currency=b.currency,
-            consumed_units=float(b.consumed_units),
-            total_cost=float(b.total_cost),
-            period_start=b.period_start,
-            period_end=b.period_end,
-        )
-        for b in bills
-    ]
-
-
-@router.post("", response_model=BillResponse, status_code=status.HTTP_201_CREATED)
-@limiter.limit("30/minute")
+    bills = page_rows(result.all(), limit, "period_end", response)
+    return rows_response(bills, headers={**response.headers, ETAG_HEADER: etag})
+
+
+@router.post(
+    "",
+    response_model=BillResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limiter.limit("30/minute"))],
+)
 async def create_bill(
     request: Request,
     body: BillCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    meter = await _verify_meter_ownership(body.meter_id, user, db)
+    meter = await get_owned_meter(body.meter_id, user, db)
 
     # Fetch both readings
     try:
@@ -123,6 +113,7 @@ async def create_bill(
         period_end=reading_to.recorded_at.date(),
     )
     db.add(bill)
+    await bump_meters(db, meter.id)
     await db.commit()
     await db.refresh(bill)
 
@@ -143,7 +134,7 @@ async def create_bill(
 @router.delete("/{bill_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_bill(
     bill_id: str,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     try:
@@ -162,4 +153,5 @@ async def delete_bill(
         raise HTTPException(status_code=404, detail="Bill not found")
 
     await db.delete(bill)
+    await bump_meters(db, bill.meter_id)
     await db.commit()
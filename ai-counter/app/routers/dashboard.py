@@ -0,0 +1,140 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy import Select, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.auth_cache import Principal
+from app.dependencies import get_current_user, get_db
+from app.etags import ETAG_HEADER, make_etag, not_modified
+from app.models.bill import Bill
+from app.models.meter import Meter
+from app.models.property import Property
+from app.models.reading import Reading
+from app.models.tariff import Tariff
+from app.schemas.bill import BillResponse
+from app.schemas.dashboard import DashboardMeter, DashboardResponse
+from app.schemas.reading import ReadingResponse
+from app.schemas.tariff import TariffResponse
+from app.services.ownership import find_owned
+
+router = APIRouter(tags=["dashboard"])
+
+
+def _latest_per_meter(model, sort: str, limit: int, meter_ids, *criteria) -> Select:
+    """The newest `limit` rows of model for each meter, as one LATERAL index scan per meter."""
+    sort_column = getattr(model, sort)
+    latest = (
+        select(model)
+        .where(model.meter_id == Meter.id, *criteria)
+        .order_by(sort_column.desc(), model.id)
+        .limit(limit)
+        .lateral()
+    )
+    row = aliased(model, latest)
+    return (
+        select(row)
+        .select_from(Meter)
+        .join(latest, true())
+        .where(Meter.id.in_(meter_ids))
+        .order_by(getattr(row, sort).desc(), row.id)
+    )
+
+
+async def _grouped(db: AsyncSession, statement: Select) -> dict:
+    rows = defaultdict(list)
+    for row in (await db.execute(statement)).scalars().all():
+        rows[row.meter_id].append(row)
+    return rows
+
+
+@router.get("/dashboard", response_model=DashboardResponse)
+async def dashboard(
+    request: Request,
+    response: Response,
+    readings: int = Query(default=5, ge=1, le=50),
+    bills: int = Query(default=3, ge=1, le=50),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Every meter with its latest readings, current tariff and latest bills in one call.
+
+    A fixed number of queries whatever the number of meters: the meters'
+    versions (enough to answer If-None-Match), their fields (usually cached),
+    then one each for readings, tariffs and bills.
+    """
+    versions = (
+        await db.execute(
+            select(Meter.id, Meter.version)
+            .join(Property)
+            .where(Property.user_id == user.id)
+            .order_by(Meter.created_at)
+        )
+    ).all()
+    today = datetime.now(timezone.utc).date()
+    # The current tariff depends on the date, so the tag does too
+    etag = make_etag(request, user.id, today, *(f"{v.id}:{v.version}" for v in versions))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers[ETAG_HEADER] = etag
+    if not versions:
+        return DashboardResponse(meters=[])
+
+    ids = [v.id for v in versions]
+    owned = await find_owned(user, set(ids), db)
+    latest_readings = await _grouped(db, _latest_per_meter(Reading, "recorded_at", readings, ids))
+    current_tariffs = await _grouped(
+        db, _latest_per_meter(Tariff, "effective_from", 1, ids, Tariff.effective_from <= today)
+    )
+    latest_bills = await _grouped(db, _latest_per_meter(Bill, "period_end", bills, ids))
+
+    entries = []
+    for m in (owned[mid] for mid in ids if mid in owned):
+        tariff = current_tariffs[m.id][0] if current_tariffs[m.id] else None
+        entries.append(
+            DashboardMeter(
+                id=str(m.id),
+                property_id=str(m.property_id),
+                utility_type=m.utility_type,
+                name=m.name,
+                digit_count=m.digit_count,
+                readings=[
+                    ReadingResponse(
+                        id=str(r.id),
+                        meter_id=str(r.meter_id),
+                        value=r.value,
+                        recorded_at=r.recorded_at,
+                        created_at=r.created_at,
+                    )
+                    for r in latest_readings[m.id]
+                ],
+                tariff=TariffResponse(
+                    id=str(tariff.id),
+                    meter_id=str(tariff.meter_id),
+                    price_per_unit=float(tariff.price_per_unit),
+                    currency=tariff.currency,
+                    effective_from=tariff.effective_from,
+                )
+                if tariff
+                else None,
+                bills=[
+                    BillResponse(
+                        id=str(b.id),
+                        meter_id=str(b.meter_id),
+                        reading_from_id=str(b.reading_from_id),
+                        reading_to_id=str(b.reading_to_id),
+                        tariff_used=float(b.tariff_used),
+                        currency=b.currency,
+                        consumed_units=float(b.consumed_units),
+                        total_cost=float(b.total_cost),
+                        period_start=b.period_start,
+                        period_end=b.period_end,
+                    )
+                    for b in latest_bills[m.id]
+                ],
+            )
+        )
+    return DashboardResponse(meters=entries)
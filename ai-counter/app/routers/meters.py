@@ -1,47 +1,46 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.auth_cache import Principal
 from app.dependencies import get_current_user, get_db
+from app.etags import ETAG_HEADER, bump_user, make_etag, not_modified, user_version
 from app.models.meter import Meter
 from app.models.property import Property
-from app.models.user import User
+from app.responses import rows_response
 from app.schemas.meter import MeterCreate, MeterResponse
+from app.services.ownership import invalidate_meters
 
 router = APIRouter(prefix="/meters", tags=["meters"])
 
 
 @router.get("", response_model=list[MeterResponse])
 async def list_meters(
-    user: User = Depends(get_current_user),
+    request: Request,
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    etag = make_etag(request, user.id, await user_version(db, user.id))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
     result = await db.execute(
-        select(Meter)
+        select(Meter.id, Meter.property_id, Meter.utility_type, Meter.name, Meter.digit_count)
         .join(Property)
         .where(Property.user_id == user.id)
         .order_by(Meter.created_at)
     )
-    meters = result.scalars().all()
-    return [
-        MeterResponse(
-            id=str(m.id),
-            property_id=str(m.property_id),
-            utility_type=m.utility_type,
-            name=m.name,
-            digit_count=m.digit_count,
-        )
-        for m in meters
-    ]
+    return rows_response(result.all(), headers={ETAG_HEADER: etag})
 
 
 @router.post("", response_model=MeterResponse, status_code=status.HTTP_201_CREATED)
 async def create_meter(
     body: MeterCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     # Verify property belongs to user
@@ -66,7 +65,9 @@ async def create_meter(
         name=body.name,
     )
     db.add(meter)
+    await bump_user(db, user.id)
     await db.commit()
+    invalidate_meters(user.id)
     await db.refresh(meter)
 
     return MeterResponse(
@@ -1,149 +1,420 @@
 import asyncio
+import hashlib
 import json
-import re
+import os
 import time
 import uuid
 from datetime import datetime, timezone
+from typing import Awaitable, Callable
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, UploadFile, status
-from fastapi.responses import JSONResponse
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from sqlalchemy import func, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.dependencies import get_current_user, get_db
-
-limiter = Limiter(key_func=get_remote_address)
+from app import jobs, single_flight
+from app.auth_cache import Principal
+from app.dependencies import get_current_user, get_db, get_sessionmaker
+from app.etags import ETAG_HEADER, bump_meters, make_etag, meter_version, not_modified
 from app.models.meter import Meter
 from app.models.property import Property
 from app.models.reading import Reading
-from app.models.user import User
-from app.recognizer import recognize_digits
+from app.models.recognition_job import RecognitionJob
+from app.pagination import page_rows, paginate
+from app.rate_limit import limiter
+from app.responses import rows_response
 from app.schemas.reading import ReadingResponse
-from app.validation import ValidationError, normalize_digits, validate_image
+from app.services import quota
+from app.services.ownership import OwnedMeter, find_owned, get_owned_meter, owned_meter
+from app.services.recognition import BackendUnavailable, RecognitionFailed, recognize_meter_image
+from app.validation import ValidationError, validate_image, validate_stream
 
 router = APIRouter(tags=["readings"])
 
-TIMEOUT_SECONDS = 10
-DAILY_SCAN_LIMIT = 3
-
+BATCH_MAX_ITEMS = 10
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+JOB_EVENTS_MAX_SECONDS = 60
+# While the vision backend's breaker is open: "fail" returns 503 at once,
+# "defer" stores the image as a recognition job that runs once it recovers.
+DEGRADED_MODE = os.environ.get("DEGRADED_MODE", "fail")
+# Outcomes worth retrying are not replayed for a repeated Idempotency-Key
+RETRYABLE_STATUSES = {408, 429, 500, 503}
 
-def _parse_response(raw_text: str, digit_count: int = 5) -> str:
-    """Extract digits from GPT-4o response (JSON or chain-of-thought)."""
-    match = re.search(r'\{[^}]+\}', raw_text)
-    if match:
-        try:
-            data = json.loads(match.group())
-            values = [data.get(f"pos{i}") for i in range(1, digit_count + 1)]
-            if all(v is not None and isinstance(v, int) and 0 <= v <= 9 for v in values):
-                return "".join(str(v) for v in values)
-        except (json.JSONDecodeError, TypeError):
-            pass
-    return normalize_digits(raw_text)
 
+def _daily_limit_content(scans_used: int) -> dict:
+    return {
+        "error": f"Daily scan limit reached ({quota.DAILY_SCAN_LIMIT}/day). Try again tomorrow.",
+        "daily_limit": quota.DAILY_SCAN_LIMIT,
+        "scans_used": scans_used,
+    }
 
-async def _verify_meter_ownership(meter_id: str, user: User, db: AsyncSession) -> Meter:
-    """Verify meter belongs to user and return it."""
-    try:
-        mid = uuid.UUID(meter_id)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid meter_id")
 
-    result = await db.execute(
-        select(Meter).join(Property).where(Meter.id == mid, Property.user_id == user.id)
-    )
-    meter = result.scalar_one_or_none()
-    if not meter:
-        raise HTTPException(status_code=404, detail="Meter not found")
-    return meter
+async def _refund(
+    sessionmaker: async_sessionmaker[AsyncSession], reservation: quota.Reservation, count: int | None = None
+) -> None:
+    async with sessionmaker() as session:
+        await quota.refund(session, reservation, count)
 
 
-@router.post("/recognize")
-@limiter.limit("20/minute")
+@router.post("/recognize", dependencies=[Depends(limiter.limit("20/minute"))])
 async def recognize(
     request: Request,
     image: UploadFile = File(...),
     meter_id: str = Form(...),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
 ):
-    # Verify meter belongs to user
-    meter = await _verify_meter_ownership(meter_id, user, db)
+    return await _recognize_scan(
+        request, meter_id, image.content_type, lambda: validate_image(image), user, db, sessionmaker
+    )
 
-    # 0. Check daily scan limit
-    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    scan_count_result = await db.execute(
-        select(func.count(Reading.id))
-        .join(Meter)
-        .join(Property)
-        .where(Property.user_id == user.id, Reading.created_at >= today_start)
+
+@router.post("/recognize/raw", dependencies=[Depends(limiter.limit("20/minute"))])
+async def recognize_raw(
+    request: Request,
+    meter_id: str = Query(...),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+):
+    """Same as /recognize, but the request body is the image itself (no multipart, no temp file)."""
+    content_type = request.headers.get("content-type")
+    content_length = request.headers.get("content-length")
+    return await _recognize_scan(
+        request,
+        meter_id,
+        content_type,
+        lambda: validate_stream(
+            request.stream(), content_type, int(content_length) if content_length and content_length.isdigit() else None
+        ),
+        user,
+        db,
+        sessionmaker,
     )
-    scans_used = scan_count_result.scalar()
-    if scans_used >= DAILY_SCAN_LIMIT:
-        return JSONResponse(
-            status_code=429,
-            content={
-                "error": f"Daily scan limit reached ({DAILY_SCAN_LIMIT}/day). Try again tomorrow.",
-                "daily_limit": DAILY_SCAN_LIMIT,
-                "scans_used": scans_used,
-            },
-        )
+
+
+async def _recognize_scan(
+    request: Request,
+    meter_id: str,
+    content_type: str | None,
+    read_image: Callable[[], Awaitable[bytes]],
+    user: Principal,
+    db: AsyncSession,
+    sessionmaker: async_sessionmaker[AsyncSession],
+):
+    # Phase 1: short checks on the request session
+
+    # Verify meter belongs to user
+    meter = await get_owned_meter(meter_id, user, db)
+
+    # A retry carrying the Idempotency-Key of a finished scan gets the same answer
+    idempotency_key = request.headers.get("Idempotency-Key")
+    replay = single_flight.idempotent_responses.get((user.id, idempotency_key)) if idempotency_key else None
+    if replay is not None:
+        fingerprint, outcome = replay
+        try:
+            image_data = await read_image()
+        except ValidationError as e:
+            return JSONResponse(status_code=400, content={"error": e.detail})
+        if _scan_fingerprint(meter.id, image_data) != fingerprint:
+            return JSONResponse(
+                status_code=422, content={"error": "Idempotency-Key was already used for a different scan"}
+            )
+        single_flight.idempotent_responses.replayed()
+        return _respond(outcome)
+
+    # 0. Reserve one of today's scans
+    reservation, scans_used = await quota.reserve(db, user.id)
+    if reservation is None:
+        return JSONResponse(status_code=429, content=_daily_limit_content(scans_used))
+
+    # Hand the pooled connection back before the slow part
+    await db.close()
 
     # 1. Validate input
     try:
-        image_data = await validate_image(image)
+        image_data = await read_image()
     except ValidationError as e:
+        await _refund(sessionmaker, reservation)
         return JSONResponse(status_code=400, content={"error": e.detail})
+    except asyncio.CancelledError:
+        await asyncio.shield(_refund(sessionmaker, reservation))
+        raise
+
+    # Phase 2 + 3, shared with any identical scan of this meter already in flight;
+    # only the scan that does the work is charged
+    fingerprint = _scan_fingerprint(meter.id, image_data)
+    flight, led = single_flight.recognitions.join(
+        (user.id, *fingerprint), lambda: _recognize_and_save(user, meter, image_data, content_type, sessionmaker)
+    )
+    if not led:
+        await _refund(sessionmaker, reservation)
+        reservation = None
+    outcome = await asyncio.shield(flight)
+    # Timeouts, unreadable meters and backend failures don't use up the quota
+    if reservation is not None and outcome[0] not in (status.HTTP_200_OK, status.HTTP_202_ACCEPTED):
+        await _refund(sessionmaker, reservation)
+    if idempotency_key and outcome[0] not in RETRYABLE_STATUSES:
+        single_flight.idempotent_responses.put((user.id, idempotency_key), (fingerprint, outcome))
+    return _respond(outcome)
+
+
+def _scan_fingerprint(meter_id: uuid.UUID, image_data: bytes) -> tuple[uuid.UUID, str]:
+    """What identifies a scan for single flight and Idempotency-Key replays."""
+    return meter_id, hashlib.sha256(image_data).hexdigest()
+
+
+def _respond(outcome: tuple[int, dict, dict | None]) -> JSONResponse:
+    status_code, content, headers = outcome
+    return JSONResponse(status_code=status_code, content=content, headers=headers)
+
+
+async def _recognize_and_save(
+    user: Principal,
+    meter: OwnedMeter,
+    image_data: bytes,
+    content_type: str | None,
+    sessionmaker: async_sessionmaker[AsyncSession],
+) -> tuple[int, dict, dict | None]:
+    """Recognize a validated scan and save its reading; returns (status, body, headers)."""
+    # Phase 2: recognize (cache, preprocessing, GPT-4o with timeout, parsing) with no connection held
+    try:
+        digits = await recognize_meter_image(image_data, content_type, meter)
+    except BackendUnavailable as e:
+        if DEGRADED_MODE != "defer":
+            return e.status_code, e.content, e.headers
+        async with sessionmaker() as session:
+            return await _queue_job(session, user, meter, image_data, content_type, deferred=True)
+    except RecognitionFailed as e:
+        return e.status_code, e.content, e.headers
+
+    # Phase 3: auto-save reading on a fresh short-lived session
+    reading = Reading(
+        meter_id=meter.id,
+        value=int(digits),
+        recorded_at=datetime.now(timezone.utc),
+    )
+    async with sessionmaker() as session:
+        session.add(reading)
+        await bump_meters(session, meter.id)
+        await session.commit()
+
+    return 200, {"result": digits, "reading_id": str(reading.id)}, None
+
+
+@router.post("/recognize/batch", dependencies=[Depends(limiter.limit("10/minute"))])
+async def recognize_batch(
+    request: Request,
+    images: list[UploadFile] = File(...),
+    meter_ids: list[str] = Form(...),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+):
+    """Recognize several (image, meter_id) pairs concurrently; one result or error per item."""
+    if len(images) != len(meter_ids):
+        raise HTTPException(status_code=400, detail="Send one meter_id per image")
+    if len(images) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} images per batch")
+
+    results: list[dict | None] = [None] * len(images)
+    parsed: dict[int, uuid.UUID] = {}
+    for i, meter_id in enumerate(meter_ids):
+        try:
+            parsed[i] = uuid.UUID(meter_id)
+        except ValueError:
+            results[i] = {"meter_id": meter_id, "status": 400, "error": "Invalid meter_id"}
+
+    # At most one ownership query for every meter in the batch
+    owned = await find_owned(user, set(parsed.values()), db) if parsed else {}
+
+    candidates: list[tuple[int, OwnedMeter]] = []
+    for i, mid in parsed.items():
+        if mid not in owned:
+            results[i] = {"meter_id": meter_ids[i], "status": 404, "error": "Meter not found"}
+        else:
+            candidates.append((i, owned[mid]))
+
+    # Reserve the whole batch at once; if that is more than is left today,
+    # take the remaining scans one by one
+    reservation, scans_used = None, 0
+    if candidates:
+        reservation, scans_used = await quota.reserve(db, user.id, len(candidates))
+    if reservation is None:
+        taken = 0
+        while taken < len(candidates):
+            single, scans_used = await quota.reserve(db, user.id)
+            if single is None:
+                break
+            taken += 1
+            reservation = quota.Reservation(user.id, single.day, taken)
+    await db.close()
+
+    granted = reservation.count if reservation else 0
+    todo = candidates[:granted]
+    for i, _ in candidates[granted:]:
+        results[i] = {"meter_id": meter_ids[i], "status": 429, **_daily_limit_content(scans_used)}
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(i: int, meter: OwnedMeter) -> str | None:
+        try:
+            image_data = await validate_image(images[i])
+        except ValidationError as e:
+            results[i] = {"meter_id": meter_ids[i], "status": 400, "error": e.detail}
+            return None
+        async with semaphore:
+            try:
+                return await recognize_meter_image(image_data, images[i].content_type, meter)
+            except RecognitionFailed as e:
+                results[i] = {"meter_id": meter_ids[i], "status": e.status_code, **e.content}
+                return None
+
+    digits_per_item = await asyncio.gather(*(run(i, meter) for i, meter in todo))
+
+    # Insert every reading in a single statement
+    now = datetime.now(timezone.utc)
+    rows = []
+    for (i, meter), digits in zip(todo, digits_per_item):
+        if digits is None:
+            continue
+        reading_id = uuid.uuid4()
+        rows.append({"id": reading_id, "meter_id": meter.id, "value": int(digits), "recorded_at": now})
+        results[i] = {"meter_id": meter_ids[i], "status": 200, "result": digits, "reading_id": str(reading_id)}
+    if rows:
+        async with sessionmaker() as session:
+            await session.execute(insert(Reading).values(rows))
+            await bump_meters(session, *(row["meter_id"] for row in rows))
+            await session.commit()
+    if reservation is not None and len(rows) < granted:
+        await _refund(sessionmaker, reservation, granted - len(rows))
+
+    return {"results": results}
+
+
+@router.post(
+    "/recognize/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(limiter.limit("20/minute"))],
+)
+async def create_recognition_job(
+    request: Request,
+    image: UploadFile = File(...),
+    meter_id: str = Form(...),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue a recognition and return 202 with a job id to poll or stream."""
+    meter = await get_owned_meter(meter_id, user, db)
 
-    # 2. Start timer
-    start = time.monotonic()
+    reservation, scans_used = await quota.reserve(db, user.id)
+    if reservation is None:
+        return JSONResponse(status_code=429, content=_daily_limit_content(scans_used))
 
-    # 3. Call GPT-4o Vision API with timeout
     try:
-        raw_text = await asyncio.wait_for(
-            asyncio.to_thread(recognize_digits, image_data, image.content_type, meter.utility_type),
-            timeout=TIMEOUT_SECONDS - (time.monotonic() - start),
-        )
-    except asyncio.TimeoutError:
-        return JSONResponse(status_code=408, content={"error": "Processing exceeded 10 seconds"})
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": "Recognition failed"})
+        image_data = await validate_image(image)
+    except ValidationError as e:
+        await quota.refund(db, reservation)
+        return JSONResponse(status_code=400, content={"error": e.detail})
 
-    # 4. Parse structured JSON response, fallback to plain-text normalization
-    expected = meter.digit_count or 5
-    digits = _parse_response(raw_text, expected)
+    return _respond(await _queue_job(db, user, meter, image_data, image.content_type))
 
-    if len(digits) < expected:
-        return JSONResponse(
-            status_code=422,
-            content={"error": f"Expected at least {expected} digits, got {len(digits)}", "result": digits},
-        )
-    digits = digits[:expected]
 
-    # 5. Auto-save reading
-    reading = Reading(
+async def _queue_job(
+    db: AsyncSession, user: Principal, meter: OwnedMeter, image_data: bytes, content_type: str | None, deferred: bool = False
+) -> tuple[int, dict, dict | None]:
+    """Store the image as a pending recognition job and answer 202 with where to poll."""
+    job = RecognitionJob(
+        id=uuid.uuid4(),
+        user_id=user.id,
         meter_id=meter.id,
-        value=int(digits),
-        recorded_at=datetime.now(timezone.utc),
+        status="pending",
+        image=image_data,
+        content_type=content_type,
     )
-    db.add(reading)
+    db.add(job)
     await db.commit()
-    await db.refresh(reading)
+    jobs.enqueue(job.id)
 
-    return {"result": digits, "reading_id": str(reading.id)}
+    content = {"job_id": str(job.id), "status": "pending"}
+    if deferred:
+        content["deferred"] = True
+    return status.HTTP_202_ACCEPTED, content, {"Location": f"/recognize/jobs/{job.id}"}
 
 
-@router.post("/readings", response_model=ReadingResponse, status_code=status.HTTP_201_CREATED)
-@limiter.limit("30/minute")
+def _parse_job_id(job_id: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job_id")
+
+
+@router.get("/recognize/jobs/{job_id}")
+async def get_recognition_job(
+    job_id: str,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(jobs.status_query(_parse_job_id(job_id), user.id))
+    job = result.one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.job_payload(job)
+
+
+@router.get("/recognize/jobs/{job_id}/events")
+async def stream_recognition_job(
+    job_id: str,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Server-Sent Events: one "status" event per change, ending with done/failed."""
+    jid = _parse_job_id(job_id)
+    job = await jobs.get_job(jid, user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Don't keep the auth lookup's connection checked out for the whole stream
+    await db.close()
+
+    async def events():
+        deadline = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+        current = job
+        last_status = None
+        while True:
+            if current is not None and current.status != last_status:
+                last_status = current.status
+                yield f"event: status\ndata: {json.dumps(jobs.job_payload(current))}\n\n"
+                if current.status in jobs.TERMINAL_STATUSES:
+                    return
+            else:
+                yield ": keep-alive\n\n"
+            if time.monotonic() >= deadline:
+                return
+            await jobs.wait_for_update(jid, timeout=5)
+            current = await jobs.get_job(jid, user.id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/readings",
+    response_model=ReadingResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limiter.limit("30/minute"))],
+)
 async def create_reading(
     request: Request,
     meter_id: str = Form(...),
     value: int = Form(...),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    meter = await _verify_meter_ownership(meter_id, user, db)
+    meter = await get_owned_meter(meter_id, user, db)
     expected = meter.digit_count or 5
     max_value = 10 ** expected - 1
 
@@ -159,6 +430,7 @@ async def create_reading(
         recorded_at=datetime.now(timezone.utc),
     )
     db.add(reading)
+    await bump_meters(db, meter.id)
     await db.commit()
     await db.refresh(reading)
 
@@ -173,38 +445,34 @@ async def create_reading(
 
 @router.get("/readings", response_model=list[ReadingResponse])
 async def list_readings(
-    meter_id: str,
+    request: Request,
+    response: Response,
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
-    user: User = Depends(get_current_user),
+    cursor: str | None = Query(default=None),
+    meter: OwnedMeter = Depends(owned_meter),
     db: AsyncSession = Depends(get_db),
 ):
-    meter = await _verify_meter_ownership(meter_id, user, db)
+    """Newest first; pass the X-Next-Cursor response header back as cursor for the next page."""
+    etag = make_etag(request, await meter_version(db, meter.id))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
 
+    columns = select(Reading.id, Reading.meter_id, Reading.value, Reading.recorded_at, Reading.created_at)
     result = await db.execute(
-        select(Reading)
-        .where(Reading.meter_id == meter.id)
-        .order_by(Reading.recorded_at.desc())
-        .limit(limit)
-        .offset(offset)
+        paginate(columns.where(Reading.meter_id == meter.id), Reading.recorded_at, Reading.id, limit, offset, cursor)
     )
-    readings = result.scalars().all()
-    return [
-        ReadingResponse(
-            id=str(r.id),
-            meter_id=str(r.meter_id),
-            value=r.value,
-            recorded_at=r.recorded_at,
-            created_at=r.created_at,
-        )
-        for r in readings
-    ]
+    readings = page_rows(result.all(), limit, "recorded_at", response)
+    return rows_response(readings, headers={**response.headers, ETAG_HEADER: etag})
 
 
 @router.get("/readings/{reading_id}", response_model=ReadingResponse)
 async def get_reading(
     reading_id: str,
-    user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     try:
@@ -213,15 +481,21 @@ async def get_reading(
         raise HTTPException(status_code=400, detail="Invalid reading_id")
 
     result = await db.execute(
-        select(Reading)
+        select(Reading, Meter.version)
         .join(Meter)
         .join(Property)
         .where(Reading.id == rid, Property.user_id == user.id)
     )
-    reading = result.scalar_one_or_none()
-    if not reading:
+    row = result.one_or_none()
+    if not row:
         raise HTTPException(status_code=404, detail="Reading not found")
+    reading, version = row
 
+    etag = make_etag(request, version)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers[ETAG_HEADER] = etag
     return ReadingResponse(
         id=str(reading.id),
         meter_id=str(reading.meter_id),
@@ -234,7 +508,7 @@ async def get_reading(
 @router.delete("/readings/{reading_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_reading(
     reading_id: str,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     try:
@@ -253,4 +527,5 @@ async def delete_reading(
         raise HTTPException(status_code=404, detail="Reading not found")
 
     await db.delete(reading)
+    await bump_meters(db, reading.meter_id)
     await db.commit()
@@ -1,67 +1,54 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import Float, cast, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.auth_cache import Principal
 from app.dependencies import get_current_user, get_db
+from app.etags import ETAG_HEADER, bump_meters, make_etag, meter_version, not_modified
 from app.models.meter import Meter
 from app.models.property import Property
 from app.models.tariff import Tariff
-from app.models.user import User
+from app.responses import rows_response
 from app.schemas.tariff import TariffCreate, TariffResponse, TariffUpdate
+from app.services.ownership import OwnedMeter, get_owned_meter, owned_meter
 
 router = APIRouter(prefix="/tariffs", tags=["tariffs"])
 
 
-async def _verify_meter_ownership(meter_id: str, user: User, db: AsyncSession) -> Meter:
-    try:
-        mid = uuid.UUID(meter_id)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid meter_id")
-
-    result = await db.execute(
-        select(Meter).join(Property).where(Meter.id == mid, Property.user_id == user.id)
-    )
-    meter = result.scalar_one_or_none()
-    if not meter:
-        raise HTTPException(status_code=404, detail="Meter not found")
-    return meter
-
-
 @router.get("", response_model=list[TariffResponse])
 async def list_tariffs(
-    meter_id: str,
-    user: User = Depends(get_current_user),
+    request: Request,
+    meter: OwnedMeter = Depends(owned_meter),
     db: AsyncSession = Depends(get_db),
 ):
-    meter = await _verify_meter_ownership(meter_id, user, db)
+    etag = make_etag(request, await meter_version(db, meter.id))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
 
     result = await db.execute(
-        select(Tariff)
+        select(
+            Tariff.id,
+            Tariff.meter_id,
+            cast(Tariff.price_per_unit, Float).label("price_per_unit"),
+            Tariff.currency,
+            Tariff.effective_from,
+        )
         .where(Tariff.meter_id == meter.id)
         .order_by(Tariff.effective_from.desc())
     )
-    tariffs = result.scalars().all()
-    return [
-        TariffResponse(
-            id=str(t.id),
-            meter_id=str(t.meter_id),
-            price_per_unit=float(t.price_per_unit),
-            currency=t.currency,
-            effective_from=t.effective_from,
-        )
-        for t in tariffs
-    ]
+    return rows_response(result.all(), headers={ETAG_HEADER: etag})
 
 
 @router.post("", response_model=TariffResponse, status_code=status.HTTP_201_CREATED)
 async def create_tariff(
     body: TariffCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    meter = await _verify_meter_ownership(body.meter_id, user, db)
+    meter = await get_owned_meter(body.meter_id, user, db)
 
     tariff = Tariff(
         meter_id=meter.id,
@@ -70,6 +57,7 @@ async def create_tariff(
         effective_from=body.effective_from,
     )
     db.add(tariff)
+    await bump_meters(db, meter.id)
     await db.commit()
     await db.refresh(tariff)
 
@@ -86,7 +74,7 @@ async def create_tariff(
 async def update_tariff(
     tariff_id: str,
     body: TariffUpdate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     try:
@@ -109,6 +97,7 @@ async def update_tariff(
     if body.effective_from is not None:
         tariff.effective_from = body.effective_from
 
+    await bump_meters(db, tariff.meter_id)
     await db.commit()
     await db.refresh(tariff)
 
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+
+from app.schemas.bill import BillResponse
+from app.schemas.meter import MeterResponse
+from app.schemas.reading import ReadingResponse
+from app.schemas.tariff import TariffResponse
+
+
+class DashboardMeter(MeterResponse):
+    readings: list[ReadingResponse]
+    tariff: TariffResponse | None
+    bills: list[BillResponse]
+
+
+class DashboardResponse(BaseModel):
+    meters: list[DashboardMeter]
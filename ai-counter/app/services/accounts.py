@@ -0,0 +1,92 @@
+"""Account provisioning in one statement.
+
+A new user gets a default property with gas, electricity and water meters.
+Instead of INSERT / flush / INSERT / flush / INSERT / refresh, the user,
+property and meters go in as data-modifying CTEs chained with RETURNING, so
+signup costs a single round trip. Uniqueness is left to the constraints:
+callers catch IntegrityError rather than checking for the email first.
+"""
+from dataclasses import dataclass
+
+from sqlalchemy import Boolean, bindparam, column, literal_column, select, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth_cache import Principal
+from app.models.meter import Meter
+from app.models.property import Property
+from app.models.user import User
+
+DEFAULT_PROPERTY_NAME = "My Home"
+DEFAULT_METERS = [
+    ("gas", "Gas Meter", 5),
+    ("electricity", "Electricity Meter", 6),
+    ("water", "Water Meter", 5),
+]
+
+
+@dataclass(frozen=True, slots=True)
+class Provisioned:
+    user: Principal
+    created: bool
+
+
+def _provision_statement(link_on_email: str | None, **user_values):
+    """INSERT user -> property -> meters as one statement returning (id, email, name, created).
+
+    With link_on_email (the provider id column, e.g. "google_id"), an existing
+    account with the same email gets that column set instead of a conflict,
+    and no default property is added for it.
+    """
+    user_insert = insert(User).values(**user_values)
+    if link_on_email:
+        user_insert = user_insert.on_conflict_do_update(
+            index_elements=[User.email], set_={link_on_email: user_insert.excluded[link_on_email]}
+        )
+    # xmax is 0 only on freshly inserted rows, not on ones ON CONFLICT updated
+    new_user = user_insert.returning(
+        User.id, User.email, User.name, literal_column("xmax = 0", Boolean).label("created")
+    ).cte("new_user")
+
+    new_property = (
+        insert(Property)
+        .from_select(
+            ["user_id", "name"],
+            select(new_user.c.id, bindparam("property_name", DEFAULT_PROPERTY_NAME)).where(new_user.c.created),
+            include_defaults=False,
+        )
+        .returning(Property.id)
+        .cte("new_property")
+    )
+
+    defaults = values(
+        column("utility_type"), column("name"), column("digit_count"), name="default_meters"
+    ).data(DEFAULT_METERS)
+    new_meters = (
+        insert(Meter)
+        .from_select(
+            ["property_id", "utility_type", "name", "digit_count"],
+            select(new_property.c.id, defaults.c.utility_type, defaults.c.name, defaults.c.digit_count),
+            include_defaults=False,
+        )
+        .returning(Meter.id)
+        .cte("new_meters")
+    )
+
+    # Ids and timestamps of the property and meters come from server defaults
+    return select(new_user.c.id, new_user.c.email, new_user.c.name, new_user.c.created).add_cte(new_meters)
+
+
+async def provision_user(db: AsyncSession, link_on_email: str | None = None, **user_values) -> Provisioned:
+    """Create a user with the default property and meters and commit.
+
+    Raises IntegrityError on a unique violation (email, or a provider id when
+    linking); the session is rolled back first.
+    """
+    try:
+        row = (await db.execute(_provision_statement(link_on_email, **user_values))).one()
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return Provisioned(Principal(row.id, row.email, row.name), row.created)
@@ -1,88 +1,98 @@
-import time
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
 import jwt
 
-from app.config import JWT_ALGORITHM, JWT_EXPIRY_MINUTES, JWT_SECRET
+from app.config import (
+    BCRYPT_ROUNDS,
+    JWT_ALGORITHM,
+    JWT_EXPIRY_MINUTES,
+    JWT_SECRET,
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+)
+from app.services.jwks import apple_keys, google_keys, verify_identity_token
 
-# Cache Apple's JWKS for 1 hour
-_apple_jwks_cache: dict | None = None
-_apple_jwks_fetched_at: float = 0
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+APPLE_ISSUERS = ("https://appleid.apple.com",)
 
+# bcrypt takes 100+ ms per call at cost 12; it runs here instead of on the event loop
+_hash_executor: Executor | None = None
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
 
+def _get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        if PASSWORD_HASH_EXECUTOR == "thread":
+            _hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+        else:
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _hash_executor
 
-def verify_password(password: str, hashed: str) -> bool:
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+    _hash_executor = None
+
+
+def _hashpw(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def _checkpw(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode(), hashed.encode())
 
 
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_executor(), _hashpw, password, BCRYPT_ROUNDS)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_executor(), _checkpw, password, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True when a stored hash was made at a different cost than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
 def create_access_token(user_id: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=JWT_EXPIRY_MINUTES)
     payload = {"sub": user_id, "exp": expire}
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 
-def decode_access_token(token: str) -> str | None:
-    """Decode JWT and return user_id, or None if invalid/expired."""
+def decode_access_token_claims(token: str) -> dict | None:
+    """Verify a JWT and return its claims, or None if invalid/expired."""
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload.get("sub")
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.PyJWTError:
         return None
 
 
-async def _get_apple_jwks() -> dict:
-    """Fetch Apple's JWKS, cached for 1 hour."""
-    import httpx
+def decode_access_token(token: str) -> str | None:
+    """Decode JWT and return user_id, or None if invalid/expired."""
+    claims = decode_access_token_claims(token)
+    return claims.get("sub") if claims else None
 
-    global _apple_jwks_cache, _apple_jwks_fetched_at
-    if _apple_jwks_cache and (time.time() - _apple_jwks_fetched_at) < 3600:
-        return _apple_jwks_cache
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get("https://appleid.apple.com/auth/keys")
-        resp.raise_for_status()
-        _apple_jwks_cache = resp.json()
-        _apple_jwks_fetched_at = time.time()
-        return _apple_jwks_cache
+async def verify_google_token(id_token: str, client_id: str) -> dict | None:
+    """Verify a Google ID token and return the decoded payload, or None."""
+    return await verify_identity_token(google_keys, id_token, client_id, GOOGLE_ISSUERS)
 
 
 async def verify_apple_token(identity_token: str, bundle_id: str) -> dict | None:
     """Verify an Apple identity token and return the decoded payload, or None."""
-    from jwt.algorithms import RSAAlgorithm
-
-    try:
-        # Decode JWT header to get kid
-        header = jwt.get_unverified_header(identity_token)
-        kid = header.get("kid")
-        if not kid:
-            return None
-
-        # Fetch Apple's public keys
-        jwks = await _get_apple_jwks()
-        matching_key = None
-        for key in jwks.get("keys", []):
-            if key.get("kid") == kid:
-                matching_key = key
-                break
-
-        if not matching_key:
-            return None
-
-        # Convert JWK to public key
-        public_key = RSAAlgorithm.from_jwk(matching_key)
-
-        # Verify and decode the token
-        payload = jwt.decode(
-            identity_token,
-            public_key,
-            algorithms=["RS256"],
-            audience=bundle_id,
-            issuer="https://appleid.apple.com",
-        )
-        return payload
-    except (jwt.PyJWTError, KeyError, ValueError, Exception):
-        return None
+    return await verify_identity_token(apple_keys, identity_token, bundle_id, APPLE_ISSUERS)
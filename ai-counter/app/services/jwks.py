@@ -0,0 +1,135 @@
+"""Signing keys for third-party identity tokens (Google, Apple).
+
+One KeySet per provider fetches its JWKS through a shared async HTTP client
+and keeps the parsed public keys by kid for the Cache-Control max-age the
+provider sends. Concurrent cold logins share a single fetch; after expiry
+the old keys keep serving for up to JWKS_STALE_SECONDS while one background
+refresh runs.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+
+import httpx
+import jwt
+
+logger = logging.getLogger(__name__)
+
+JWKS_DEFAULT_MAX_AGE = int(os.environ.get("JWKS_DEFAULT_MAX_AGE", "3600"))
+JWKS_STALE_SECONDS = int(os.environ.get("JWKS_STALE_SECONDS", "86400"))
+# An unknown kid forces a refetch (key rotation), but at most this often
+JWKS_MIN_REFRESH_SECONDS = int(os.environ.get("JWKS_MIN_REFRESH_SECONDS", "60"))
+JWKS_TIMEOUT_SECONDS = 5.0
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=JWKS_TIMEOUT_SECONDS)
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+
+
+def _max_age(cache_control: str | None) -> int:
+    match = _MAX_AGE.search(cache_control or "")
+    return int(match.group(1)) if match else JWKS_DEFAULT_MAX_AGE
+
+
+class KeySet:
+    """Cached, parsed JWKS of one identity provider."""
+
+    def __init__(self, url: str, http_client: httpx.AsyncClient | None = None, clock=time.monotonic):
+        self.url = url
+        self._http_client = http_client
+        self._clock = clock
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._fresh_until = 0.0
+        self._fetched_at: float | None = None
+        self._refresh: asyncio.Task | None = None
+        self.fetches = 0
+
+    def _refresh_once(self) -> asyncio.Task:
+        """Start a fetch unless one is already running; callers share it."""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.ensure_future(self._fetch())
+            self._refresh.add_done_callback(self._log_failure)
+        return self._refresh
+
+    async def _fetch(self) -> None:
+        client = self._http_client or _get_http_client()
+        response = await client.get(self.url)
+        response.raise_for_status()
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            try:
+                key = jwt.PyJWK(jwk)
+            except jwt.PyJWKError:
+                continue
+            if key.key_id:
+                keys[key.key_id] = key
+        self.fetches += 1
+        self._keys = keys
+        self._fetched_at = self._clock()
+        self._fresh_until = self._fetched_at + _max_age(response.headers.get("cache-control"))
+
+    async def get_key(self, kid: str) -> jwt.PyJWK | None:
+        now = self._clock()
+        key = self._keys.get(kid)
+        if key is not None:
+            if now >= self._fresh_until:
+                if now < self._fresh_until + JWKS_STALE_SECONDS:
+                    # Stale-while-revalidate: answer now, refresh in the background
+                    self._refresh_once()
+                    return key
+                # Shielded like the cold path: a cancelled caller must not cancel the shared fetch
+                await asyncio.shield(self._refresh_once())
+                return self._keys.get(kid)
+            return key
+
+        # Cold cache, or a kid we have not seen (rotation): fetch, rate limited
+        if self._fetched_at is not None and now - self._fetched_at < JWKS_MIN_REFRESH_SECONDS:
+            return None
+        await asyncio.shield(self._refresh_once())
+        return self._keys.get(kid)
+
+    def _log_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("JWKS refresh from %s failed: %s", self.url, task.exception())
+
+    def stats(self) -> dict:
+        return {"keys": len(self._keys), "fetches": self.fetches}
+
+
+google_keys = KeySet("https://www.googleapis.com/oauth2/v3/certs")
+apple_keys = KeySet("https://appleid.apple.com/auth/keys")
+
+
+async def verify_identity_token(
+    key_set: KeySet, token: str, audience: str, issuers: tuple[str, ...]
+) -> dict | None:
+    """Verify an RS256 identity token against the provider's keys; claims or None."""
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if not kid:
+            return None
+        key = await key_set.get_key(kid)
+        if key is None:
+            return None
+        claims = jwt.decode(token, key.key, algorithms=["RS256"], audience=audience)
+    except (jwt.PyJWTError, httpx.HTTPError, ValueError):
+        return None
+    if claims.get("iss") not in issuers:
+        return None
+    return claims
@@ -0,0 +1,92 @@
+"""Which meters a user owns, cached per process.
+
+Readings, bills and tariffs all take a meter_id and used to authorize it with
+a Meter JOIN Property query on every request. Each user's meters are now
+loaded in one query and kept for OWNERSHIP_CACHE_TTL_SECONDS, so a request
+for a known meter needs no ownership round trip. An id that is not in the
+cached map is looked up once more before answering 404, so a meter created
+through another worker is found straight away. Code that adds or removes
+meters, or deletes the account, must call invalidate_meters().
+"""
+import os
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth_cache import Principal, TTLCache
+from app.dependencies import get_current_user, get_db
+from app.models.meter import Meter
+from app.models.property import Property
+
+OWNERSHIP_CACHE_TTL_SECONDS = float(os.environ.get("OWNERSHIP_CACHE_TTL_SECONDS", "60"))
+OWNERSHIP_CACHE_SIZE = int(os.environ.get("OWNERSHIP_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True, slots=True)
+class OwnedMeter:
+    """The meter fields handlers and recognition need, detached from any session."""
+
+    id: uuid.UUID
+    property_id: uuid.UUID
+    utility_type: str
+    name: str
+    digit_count: int | None
+
+
+owned_meters = TTLCache(OWNERSHIP_CACHE_SIZE)
+
+
+async def _load(user_id: uuid.UUID, db: AsyncSession) -> dict[uuid.UUID, OwnedMeter]:
+    result = await db.execute(
+        select(Meter).join(Property).where(Property.user_id == user_id).order_by(Meter.created_at)
+    )
+    meters = {
+        m.id: OwnedMeter(m.id, m.property_id, m.utility_type, m.name, m.digit_count)
+        for m in result.scalars().all()
+    }
+    if OWNERSHIP_CACHE_TTL_SECONDS > 0:
+        owned_meters.put(user_id, meters, time.time() + OWNERSHIP_CACHE_TTL_SECONDS)
+    return meters
+
+
+async def find_owned(user: Principal, meter_ids: set[uuid.UUID], db: AsyncSession) -> dict[uuid.UUID, OwnedMeter]:
+    """The subset of meter_ids the user owns; reloads once if any id is unknown."""
+    meters = owned_meters.get(user.id)
+    if meters is None or not meter_ids <= meters.keys():
+        meters = await _load(user.id, db)
+    return {mid: meters[mid] for mid in meter_ids if mid in meters}
+
+
+async def get_owned_meter(meter_id: str, user: Principal, db: AsyncSession) -> OwnedMeter:
+    """Verify meter belongs to user and return it."""
+    try:
+        mid = uuid.UUID(meter_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid meter_id")
+
+    meter = (await find_owned(user, {mid}, db)).get(mid)
+    if meter is None:
+        raise HTTPException(status_code=404, detail="Meter not found")
+    return meter
+
+
+async def owned_meter(
+    meter_id: str,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> OwnedMeter:
+    """Dependency for routes taking meter_id as a query parameter."""
+    return await get_owned_meter(meter_id, user, db)
+
+
+def invalidate_meters(user_id: uuid.UUID) -> None:
+    """Forget a user's meters after one was added or removed."""
+    owned_meters.pop(user_id)
+
+
+def stats() -> dict:
+    return owned_meters.stats()
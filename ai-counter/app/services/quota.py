@@ -0,0 +1,87 @@
+"""Per-user daily scan quota.
+
+Each scan reserves one unit on the user's scan_quotas row for the current
+UTC day before any work starts. The reservation is a single upsert that only
+increments while the counter is below the limit, so parallel requests cannot
+all slip past it. A scan that produces a reading (or a queued job) keeps its
+unit; one that ends in a timeout, an unreadable result or a backend failure
+gives it back with refund().
+"""
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Date, Integer, bindparam, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DAILY_SCAN_LIMIT = int(os.environ.get("DAILY_SCAN_LIMIT", "3"))
+
+# Increment only while the result stays within the limit; when it would not,
+# the second branch reports the current count for the 429 body.
+_RESERVE = text(
+    """
+    WITH reserved AS (
+        INSERT INTO scan_quotas AS q (user_id, day, used)
+        VALUES (:user_id, :day, :count)
+        ON CONFLICT (user_id, day) DO UPDATE SET used = q.used + :count
+        WHERE q.used + :count <= :limit
+        RETURNING q.used
+    )
+    SELECT true AS granted, used FROM reserved
+    UNION ALL
+    SELECT false, used FROM scan_quotas
+    WHERE user_id = :user_id AND day = :day AND NOT EXISTS (SELECT 1 FROM reserved)
+    """
+).bindparams(
+    bindparam("user_id", type_=UUID(as_uuid=True)),
+    bindparam("day", type_=Date),
+    bindparam("count", type_=Integer),
+    bindparam("limit", type_=Integer),
+)
+
+_REFUND = text(
+    "UPDATE scan_quotas SET used = GREATEST(used - :count, 0) WHERE user_id = :user_id AND day = :day"
+).bindparams(
+    bindparam("user_id", type_=UUID(as_uuid=True)),
+    bindparam("day", type_=Date),
+    bindparam("count", type_=Integer),
+)
+
+
+def today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+@dataclass(frozen=True, slots=True)
+class Reservation:
+    user_id: uuid.UUID
+    day: date
+    count: int
+
+
+async def reserve(
+    db: AsyncSession, user_id: uuid.UUID, count: int = 1, limit: int | None = None
+) -> tuple[Reservation | None, int]:
+    """Reserve count scans for today, all or nothing; (reservation or None, scans used) and commit."""
+    limit = DAILY_SCAN_LIMIT if limit is None else limit
+    day = today()
+    if count > limit:
+        return None, limit
+    row = (
+        await db.execute(_RESERVE, {"user_id": user_id, "day": day, "count": count, "limit": limit})
+    ).one_or_none()
+    await db.commit()
+    if row is None or not row.granted:
+        return None, row.used if row is not None else limit
+    return Reservation(user_id, day, count), row.used
+
+
+async def refund(db: AsyncSession, reservation: Reservation, count: int | None = None) -> None:
+    """Give back count (default all) of the reservation's scans, on the day they were reserved, and commit."""
+    count = reservation.count if count is None else count
+    if count <= 0:
+        return
+    await db.execute(_REFUND, {"user_id": reservation.user_id, "day": reservation.day, "count": count})
+    await db.commit()
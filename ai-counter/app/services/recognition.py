@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from app.circuit_breaker import CircuitBreaker, vision_breaker
+from app.models.meter import Meter
+from app.preprocess import UnsupportedImage, preprocess
+from app.recognition_cache import recognition_cache
+from app.recognizer import _parse_response, recognize_digits, recognize_locally
+from app.services.ownership import OwnedMeter
+
+TIMEOUT_SECONDS = 10
+
+
+class RecognitionFailed(Exception):
+    """Recognition ended without a usable reading; carries the HTTP error to return."""
+
+    def __init__(self, status_code: int, content: dict, headers: dict | None = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+
+class BackendUnavailable(RecognitionFailed):
+    """The vision backend's circuit breaker is open; nothing was sent upstream."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(
+            503,
+            {"error": "Recognition is temporarily unavailable. Try again shortly.", "retry_after": retry_after},
+            {"Retry-After": str(retry_after)},
+        )
+
+
+async def recognize_meter_image(
+    image_data: bytes,
+    content_type: str | None,
+    meter: Meter | OwnedMeter,
+    backend=None,
+    breaker: CircuitBreaker | None = None,
+    local=None,
+) -> str:
+    """Return the meter's digits for a validated image.
+
+    Holds no database connection across the vision call. backend and breaker
+    default to the GPT-4o recognizer and its shared breaker, local to the
+    in-process OCR tiers.
+
+    Raises RecognitionFailed with 400 for a HEIC that cannot be transcoded,
+    408 on timeout, 500 on backend errors and 422 when fewer digits than the
+    meter has come back; BackendUnavailable (503) while the breaker is open
+    and no local tier could read the image.
+    """
+    backend = backend or recognize_digits
+    breaker = breaker or vision_breaker
+    local = local or recognize_locally
+    expected = meter.digit_count or 5
+
+    # Serve retries of the same photo from the recognition cache
+    fingerprint = await recognition_cache.fingerprint(image_data)
+    digits = await recognition_cache.get(fingerprint, meter.id, meter.utility_type, expected)
+    if digits is not None:
+        return digits
+
+    # Local OCR needs no backend: it runs ahead of the breaker, so it still
+    # answers while the breaker is open and its reads never count as backend calls
+    raw_text = await local(image_data, meter.utility_type, expected)
+    if raw_text is None:
+        raw_text = await _call_backend(image_data, content_type, meter.utility_type, expected, backend, breaker)
+
+    # Parse structured JSON response, fallback to plain-text normalization
+    digits = _parse_response(raw_text, expected)
+    if len(digits) < expected:
+        raise RecognitionFailed(
+            422, {"error": f"Expected at least {expected} digits, got {len(digits)}", "result": digits}
+        )
+    digits = digits[:expected]
+    await recognition_cache.put(fingerprint, meter.id, meter.utility_type, expected, digits)
+    return digits
+
+
+async def _call_backend(
+    image_data: bytes,
+    content_type: str | None,
+    utility_type: str,
+    expected: int,
+    backend,
+    breaker: CircuitBreaker,
+) -> str:
+    """Raw text from the remote backend, with its outcome recorded on the breaker."""
+    # Fail fast instead of waiting out the timeout on a backend that is down
+    if not breaker.allow():
+        raise BackendUnavailable(breaker.retry_after)
+
+    # Shrink the photo off-loop, then call GPT-4o Vision API with timeout
+    start = time.monotonic()
+    try:
+        vision_data, detail = await preprocess(image_data, utility_type)
+        raw_text = await asyncio.wait_for(
+            backend(vision_data, content_type, utility_type, detail, expected),
+            timeout=TIMEOUT_SECONDS - (time.monotonic() - start),
+        )
+    except asyncio.TimeoutError:
+        breaker.record(False, time.monotonic() - start)
+        raise RecognitionFailed(408, {"error": "Processing exceeded 10 seconds"})
+    except UnsupportedImage as e:
+        breaker.release()
+        raise RecognitionFailed(400, {"error": str(e)})
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record(False, time.monotonic() - start)
+        raise RecognitionFailed(500, {"error": "Recognition failed"})
+    breaker.record(True, time.monotonic() - start)
+    return raw_text
@@ -0,0 +1,105 @@
+"""In-process deduplication of repeated scans.
+
+Mobile clients on flaky networks re-POST the same photo while the first
+request is still waiting on GPT-4o. SingleFlight lets those duplicates attach
+to the pending work instead of starting their own vision call and inserting
+a second Reading. IdempotencyStore replays finished responses for requests
+that carry the same Idempotency-Key within IDEMPOTENCY_TTL_SECONDS; callers
+store a fingerprint of the request with each response so a key reused for a
+different request can be refused.
+
+Both live in process memory, so duplicates landing on another worker
+process are not coalesced.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+
+class SingleFlight:
+    """Run one coroutine per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> tuple[asyncio.Task, bool]:
+        """Start func under key, or attach to the run already in flight; (task, whether this call started it).
+
+        Deciding and starting happen without yielding to the loop, so exactly
+        one of any set of concurrent callers leads. Await the task through
+        asyncio.shield, as run() does.
+        """
+        task = self._flights.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task, False
+        self.leaders += 1
+        task = asyncio.ensure_future(func())
+        self._flights[key] = task
+        task.add_done_callback(lambda _: self._flights.pop(key, None))
+        return task, True
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task, _ = self.join(key, func)
+        # A caller that disconnects must not cancel the work the others wait on
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "leaders": self.leaders, "coalesced": self.coalesced}
+
+
+class IdempotencyStore:
+    """LRU with TTL of finished responses, keyed on (user, Idempotency-Key)."""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_SECONDS, maxsize: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.replays = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        """The value stored for key, if unexpired; the caller decides whether it is replayed."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def replayed(self) -> None:
+        """Count a stored response that was served again."""
+        self.replays += 1
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "replays": self.replays}
+
+
+recognitions = SingleFlight()
+idempotent_responses = IdempotencyStore()
+
+
+def stats() -> dict:
+    return {
+        **recognitions.stats(),
+        "idempotent_replays": idempotent_responses.replays,
+        "llm_calls_saved": recognitions.coalesced + idempotent_responses.replays,
+    }
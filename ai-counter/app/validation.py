@@ -1,6 +1,8 @@
 import logging
 import struct
 import zlib
+from typing import AsyncIterator
+
 from fastapi import UploadFile
 
 
@@ -10,6 +12,12 @@ ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/heic", "image/heif",
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 MIN_WIDTH = 100
 MIN_HEIGHT = 100
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+_JPEG_SOF_MARKERS = (0xC0, 0xC1, 0xC2)
+HEIF_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx", b"mif1", b"msf1"}
+# iPhone photos keep the meta box in the first few KB, ahead of mdat
+HEIF_HEADER_LIMIT = 256 * 1024
 
 
 class ValidationError(Exception):
@@ -42,47 +50,225 @@ def _get_png_dimensions(data: bytes) -> tuple[int, int]:
     return width, height
 
 
+def _boxes(data, start: int = 0, end: int | None = None):
+    """Yield (type, payload start, box end) for the ISO-BMFF boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[offset : offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[offset + 8 : offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            raise ValidationError("Invalid HEIF structure")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _find_box(data, box_type: bytes, start: int, end: int) -> tuple[int, int] | None:
+    for found, payload, box_end in _boxes(data, start, end):
+        if found == box_type:
+            return payload, box_end
+    return None
+
+
+def _get_heif_dimensions(data: bytes) -> tuple[int, int]:
+    """Extract width and height of the primary image from HEIF/HEIC binary data.
+
+    Walks meta -> pitm / iprp -> ipco (ispe properties) and ipma (item to
+    property associations). Falls back to the largest ispe when the primary
+    item's association cannot be resolved.
+    """
+    meta = _find_box(data, b"meta", 0, len(data))
+    if meta is None:
+        raise ValidationError("Could not determine HEIF dimensions")
+    meta_start = meta[0] + 4  # full box: version + flags
+    meta_end = meta[1]
+
+    primary = None
+    pitm = _find_box(data, b"pitm", meta_start, meta_end)
+    if pitm is not None:
+        version = data[pitm[0]]
+        primary = struct.unpack(">I" if version else ">H", data[pitm[0] + 4 : pitm[0] + (8 if version else 6)])[0]
+
+    iprp = _find_box(data, b"iprp", meta_start, meta_end)
+    if iprp is None:
+        raise ValidationError("Could not determine HEIF dimensions")
+    ipco = _find_box(data, b"ipco", *iprp)
+    if ipco is None:
+        raise ValidationError("Could not determine HEIF dimensions")
+
+    # Property indices are 1-based in ipma
+    sizes: dict[int, tuple[int, int]] = {}
+    for index, (box_type, payload, _) in enumerate(_boxes(data, *ipco), start=1):
+        if box_type == b"ispe":
+            sizes[index] = struct.unpack(">II", data[payload + 4 : payload + 12])
+    if not sizes:
+        raise ValidationError("Could not determine HEIF dimensions")
+
+    ipma = _find_box(data, b"ipma", *iprp)
+    if primary is not None and ipma is not None:
+        version, flags = data[ipma[0]], int.from_bytes(data[ipma[0] + 1 : ipma[0] + 4], "big")
+        offset = ipma[0] + 4
+        entry_count = struct.unpack(">I", data[offset : offset + 4])[0]
+        offset += 4
+        for _ in range(entry_count):
+            if version < 1:
+                item_id = struct.unpack(">H", data[offset : offset + 2])[0]
+                offset += 2
+            else:
+                item_id = struct.unpack(">I", data[offset : offset + 4])[0]
+                offset += 4
+            count = data[offset]
+            offset += 1
+            for _ in range(count):
+                if flags & 1:
+                    index = struct.unpack(">H", data[offset : offset + 2])[0] & 0x7FFF
+                    offset += 2
+                else:
+                    index = data[offset] & 0x7F
+                    offset += 1
+                if item_id == primary and index in sizes:
+                    return sizes[index]
+
+    return max(sizes.values(), key=lambda wh: wh[0] * wh[1])
+
+
 def _detect_format(data: bytes) -> str:
     """Detect image format from magic bytes."""
     if data[:2] == b'\xff\xd8':
         return "jpeg"
     if data[:8] == b"\x89PNG\r\n\x1a\n":
         return "png"
+    if data[4:8] == b"ftyp" and bytes(data[8:12]) in HEIF_BRANDS:
+        return "heif"
     return "unknown"
 
 
 def get_image_dimensions(data: bytes, content_type: str) -> tuple[int, int] | None:
-    """Return (width, height) for JPEG or PNG image data, or None for unsupported formats."""
+    """Return (width, height) for JPEG, PNG or HEIF image data, or None for unsupported formats."""
     fmt = _detect_format(data)
     if fmt == "jpeg":
         return _get_jpeg_dimensions(data)
     if fmt == "png":
         return _get_png_dimensions(data)
-    logger.warning("Unknown image format (not JPEG/PNG), skipping dimension check")
+    if fmt == "heif":
+        return _get_heif_dimensions(data)
+    logger.warning("Unknown image format (not JPEG/PNG/HEIF), skipping dimension check")
     return None
 
 
-async def validate_image(file: UploadFile) -> bytes:
-    """Validate uploaded image and return its bytes.
+class ImageHeaderReader:
+    """Incremental JPEG SOF / PNG IHDR / HEIF ispe parser fed one upload chunk at a time.
 
-    Raises ValidationError for invalid input.
+    Skipped JPEG segments are stepped over by slicing a memoryview of each
+    chunk; only the few header bytes being parsed are ever copied. HEIF keeps
+    up to HEIF_HEADER_LIMIT bytes until its meta box is complete.
     """
-    content_type = (file.content_type or "").lower()
-    if content_type not in ALLOWED_CONTENT_TYPES:
-        raise ValidationError(f"Unsupported content type: {content_type}")
 
-    data = await file.read()
+    def __init__(self):
+        self.format: str | None = None
+        self.dimensions: tuple[int, int] | None = None
+        self.done = False
+        self._header = bytearray()
+        self._need = 2  # magic bytes first
+        self._skip = 0
+
+    def feed(self, chunk: bytes) -> None:
+        view = memoryview(chunk)
+        if self.format == "heif":
+            self._feed_heif(view)
+            return
+        while view and not self.done:
+            if self._skip:
+                n = min(self._skip, len(view))
+                view = view[n:]
+                self._skip -= n
+                continue
+            take = view[: self._need - len(self._header)]
+            self._header += take
+            view = view[len(take):]
+            if len(self._header) == self._need:
+                self._parse()
+                if self.format == "heif":
+                    self._feed_heif(view)
+                    return
+
+    def _feed_heif(self, view: memoryview) -> None:
+        if self.done:
+            return
+        self._header += view[: HEIF_HEADER_LIMIT - len(self._header)]
+        try:
+            meta = _find_box(self._header, b"meta", 0, len(self._header))
+        except (ValidationError, struct.error):
+            meta = None
+        if meta is not None and meta[1] <= len(self._header):
+            self.dimensions = _get_heif_dimensions(bytes(self._header))
+            self.done = True
+        elif len(self._header) >= HEIF_HEADER_LIMIT:
+            raise ValidationError("Could not determine HEIF dimensions")
+
+    def _parse(self) -> None:
+        header = self._header
+        if self.format is None:
+            if header[:2] == b"\xff\xd8":
+                self.format = "jpeg"
+                self._header = bytearray()
+                self._need = 4
+            elif len(header) < 12:
+                self._need = 12
+            elif header[:8] == b"\x89PNG\r\n\x1a\n":
+                self.format = "png"
+                self._need = 24
+            elif _detect_format(header) == "heif":
+                self.format = "heif"
+            else:
+                self.format = "unknown"
+                self.done = True
+                logger.warning("Unknown image format (not JPEG/PNG/HEIF), skipping dimension check")
+            return
+
+        if self.format == "png":
+            self.dimensions = struct.unpack(">II", header[16:24])
+            self.done = True
+            return
 
-    if len(data) > MAX_FILE_SIZE:
-        raise ValidationError(
-            f"File size {len(data)} bytes exceeds maximum {MAX_FILE_SIZE} bytes"
-        )
+        # JPEG: header holds FF, marker, 2-byte length (+ SOF payload when needed)
+        if header[0] != 0xFF:
+            raise ValidationError("Invalid JPEG structure")
+        marker = header[1]
+        if marker in _JPEG_SOF_MARKERS:
+            if self._need < 9:
+                self._need = 9
+                return
+            height, width = struct.unpack(">HH", header[5:9])
+            self.dimensions = (width, height)
+            self.done = True
+            return
+        length = struct.unpack(">H", header[2:4])[0]
+        if length < 2:
+            raise ValidationError("Invalid JPEG structure")
+        self._header = bytearray()
+        self._need = 4
+        self._skip = length - 2
 
-    try:
-        dimensions = get_image_dimensions(data, "")
-    except (struct.error, IndexError, zlib.error) as e:
-        raise ValidationError(f"Could not read image dimensions: {e}")
+    def finish(self) -> tuple[int, int] | None:
+        """Dimensions once the whole upload was fed; raises if the header never completed."""
+        if self.done:
+            return self.dimensions
+        if self.format == "jpeg":
+            raise ValidationError("Could not determine JPEG dimensions")
+        if self.format == "png":
+            raise ValidationError("Could not read image dimensions: truncated PNG header")
+        if self.format == "heif":
+            raise ValidationError("Could not determine HEIF dimensions")
+        return None
 
+
+def _check_resolution(dimensions: tuple[int, int] | None) -> None:
     if dimensions is not None:
         width, height = dimensions
         if width < MIN_WIDTH or height < MIN_HEIGHT:
@@ -90,7 +276,62 @@ async def validate_image(file: UploadFile) -> bytes:
                 f"Image resolution {width}x{height} is below minimum {MIN_WIDTH}x{MIN_HEIGHT}"
             )
 
-    return data
+
+def _check_content_type(content_type: str | None) -> None:
+    content_type = (content_type or "").lower()
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise ValidationError(f"Unsupported content type: {content_type}")
+
+
+def _too_large(size: int) -> ValidationError:
+    return ValidationError(f"File size {size} bytes exceeds maximum {MAX_FILE_SIZE} bytes")
+
+
+async def validate_stream(
+    chunks: AsyncIterator[bytes], content_type: str | None, content_length: int | None = None
+) -> bytes:
+    """Validate an image arriving in chunks and return its bytes.
+
+    Rejects as soon as the size limit is crossed (or up front from a declared
+    Content-Length) and checks the resolution from the header bytes while
+    the rest is still arriving.
+
+    Raises ValidationError for invalid input.
+    """
+    _check_content_type(content_type)
+    if content_length is not None and content_length > MAX_FILE_SIZE:
+        raise _too_large(content_length)
+
+    reader = ImageHeaderReader()
+    # Grown in place rather than kept as a list of chunks to join at the end
+    data = bytearray()
+    async for chunk in chunks:
+        if len(data) + len(chunk) > MAX_FILE_SIZE:
+            raise _too_large(len(data) + len(chunk))
+        if not reader.done:
+            try:
+                reader.feed(chunk)
+            except (struct.error, IndexError) as e:
+                raise ValidationError(f"Could not read image dimensions: {e}")
+            _check_resolution(reader.dimensions)
+        data += chunk
+
+    _check_resolution(reader.finish())
+    # Immutable for callers: the bytes are hashed, cached and shared across tasks
+    return bytes(data)
+
+
+async def _upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+async def validate_image(file: UploadFile) -> bytes:
+    """Validate uploaded image and return its bytes.
+
+    Raises ValidationError for invalid input.
+    """
+    return await validate_stream(_upload_chunks(file), file.content_type, file.size)
 
 
 def normalize_digits(raw: str) -> str:
@@ -0,0 +1,78 @@
+"""Database queries per authenticated request, with and without the auth caches.
+
+Sends --requests GET /meters with one bearer token through the real
+dependency chain against a fake session that counts execute() calls and
+whether a connection would have been checked out.
+
+    python -m benchmarks.bench_auth_queries --requests 500
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import auth_cache  # noqa: E402
+from app.dependencies import get_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.auth import create_access_token  # noqa: E402
+
+USER_ID = uuid.uuid4()
+
+
+class CountingSession:
+    queries = 0
+
+    async def execute(self, statement, *args, **kwargs):
+        CountingSession.queries += 1
+        result = MagicMock()
+        result.one_or_none.return_value = SimpleNamespace(id=USER_ID, email="bench@test.com", name="Bench")
+        result.scalars.return_value.all.return_value = []
+        return result
+
+
+async def _get_db():
+    yield CountingSession()
+
+
+def run(client: TestClient, token: str, requests: int) -> tuple[float, float]:
+    CountingSession.queries = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get("/meters", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200, response.text
+    elapsed = time.perf_counter() - start
+    return CountingSession.queries / requests, elapsed / requests * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    app.dependency_overrides[get_db] = _get_db
+    client = TestClient(app)
+    token = create_access_token(str(USER_ID))
+
+    print(f"{'variant':>10} {'queries/req':>12} {'ms/req':>8}")
+    for label, ttl, token_cache in [("uncached", 0, 0), ("cached", 60, 10000)]:
+        auth_cache.PRINCIPAL_CACHE_TTL_SECONDS = ttl
+        auth_cache.verified_tokens.maxsize = token_cache
+        auth_cache.principals.clear()
+        auth_cache.verified_tokens.clear()
+        queries, ms = run(client, token, args.requests)
+        print(f"{label:>10} {queries:>12.2f} {ms:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Dashboard load: the app's per-meter fan-out vs one GET /dashboard.
+
+Needs a migrated Postgres at DATABASE_URL (alembic upgrade head). For each
+--meters count, seeds a throwaway user with that many meters, each with
+--readings readings, a few tariffs and --bills bills, then times a full
+dashboard load through the ASGI app with a real bearer token:
+
+  fan-out    GET /meters, then GET /readings, /tariffs and /bills per meter
+             concurrently (what dashboard_provider.dart's Future.wait does)
+  dashboard  GET /dashboard
+
+Auth and ownership caches are warm in both modes, as for a returning user.
+The seeded users are deleted afterwards.
+
+    DATABASE_URL=postgresql://localhost/ytilities_bench \\
+        python -m benchmarks.bench_dashboard --meters 3 50 --repeats 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+
+import httpx  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app.database import async_session, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.auth import create_access_token  # noqa: E402
+
+EMAIL_DOMAIN = "dashboard-bench.test"
+
+
+async def seed(meters: int, readings: int, bills: int) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    async with async_session() as db:
+        await db.execute(
+            text("INSERT INTO users (id, email, name) VALUES (:id, :email, 'Bench')"),
+            {"id": user_id, "email": f"{user_id}@{EMAIL_DOMAIN}"},
+        )
+        property_id = (
+            await db.execute(
+                text("INSERT INTO properties (user_id, name) VALUES (:user_id, 'Bench') RETURNING id"),
+                {"user_id": user_id},
+            )
+        ).scalar_one()
+        await db.execute(
+            text(
+                """
+                INSERT INTO meters (property_id, utility_type, name)
+                SELECT :property_id, 'gas', 'Bench ' || n FROM generate_series(1, :meters) AS n
+                """
+            ),
+            {"property_id": property_id, "meters": meters},
+        )
+        await db.execute(
+            text(
+                """
+                INSERT INTO readings (meter_id, value, recorded_at)
+                SELECT m.id, n, now() - (:readings - n) * interval '1 day'
+                FROM meters m CROSS JOIN generate_series(1, :readings) AS n
+                WHERE m.property_id = :property_id
+                """
+            ),
+            {"property_id": property_id, "readings": readings},
+        )
+        await db.execute(
+            text(
+                """
+                INSERT INTO tariffs (meter_id, price_per_unit, effective_from)
+                SELECT m.id, 0.5 + n * 0.1, current_date - (n * 90)
+                FROM meters m CROSS JOIN generate_series(0, 3) AS n
+                WHERE m.property_id = :property_id
+                """
+            ),
+            {"property_id": property_id},
+        )
+        await db.execute(
+            text(
+                """
+                INSERT INTO bills (meter_id, reading_from_id, reading_to_id, tariff_used,
+                                   consumed_units, total_cost, period_start, period_end)
+                SELECT m.id, r.first_id, r.last_id, 0.5, 30, 15, current_date - (n + 1) * 30, current_date - n * 30
+                FROM meters m
+                CROSS JOIN generate_series(0, :bills - 1) AS n
+                CROSS JOIN LATERAL (
+                    SELECT (array_agg(id ORDER BY recorded_at))[1] AS first_id,
+                           (array_agg(id ORDER BY recorded_at DESC))[1] AS last_id
+                    FROM readings WHERE meter_id = m.id
+                ) AS r
+                WHERE m.property_id = :property_id
+                """
+            ),
+            {"property_id": property_id, "bills": bills},
+        )
+        await db.commit()
+    return user_id
+
+
+async def fan_out(client: httpx.AsyncClient) -> int:
+    meters = (await client.get("/meters")).json()
+
+    async def per_meter(meter_id: str):
+        params = {"meter_id": meter_id}
+        return await asyncio.gather(
+            client.get("/readings", params=params),
+            client.get("/tariffs", params=params),
+            client.get("/bills", params=params),
+        )
+
+    responses = await asyncio.gather(*(per_meter(m["id"]) for m in meters))
+    assert all(r.status_code == 200 for group in responses for r in group)
+    return 1 + 3 * len(meters)
+
+
+async def dashboard(client: httpx.AsyncClient) -> int:
+    response = await client.get("/dashboard")
+    assert response.status_code == 200, response.text
+    return 1
+
+
+async def time_load(load, client: httpx.AsyncClient, repeats: int) -> tuple[float, int]:
+    requests = await load(client)  # warm caches and the pool
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await load(client)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), requests
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--meters", type=int, nargs="+", default=[3, 50])
+    parser.add_argument("--readings", type=int, default=200)
+    parser.add_argument("--bills", type=int, default=12)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        print(f"{'meters':>6} {'fan-out ms':>11} {'requests':>9} {'dashboard ms':>13}")
+        for meters in args.meters:
+            user_id = await seed(meters, args.readings, args.bills)
+            headers = {"Authorization": f"Bearer {create_access_token(str(user_id))}"}
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+                fan_out_ms, requests = await time_load(fan_out, client, args.repeats)
+                dashboard_ms, _ = await time_load(dashboard, client, args.repeats)
+            print(f"{meters:>6} {fan_out_ms:>11.1f} {requests:>9} {dashboard_ms:>13.1f}")
+    finally:
+        async with async_session() as db:
+            await db.execute(text("DELETE FROM users WHERE email LIKE :pattern"), {"pattern": f"%@{EMAIL_DOMAIN}"})
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""Conditional GETs under a typical app polling pattern.
+
+Needs a migrated Postgres at DATABASE_URL (alembic upgrade head). Seeds a
+throwaway user with --meters meters and some history, then plays the app's
+dashboard refresh --refreshes times through the ASGI app: GET /meters and
+GET /readings, /tariffs and /bills per meter, each sent with the ETag from
+that URL's last response. Every --write-every refreshes one meter gets a new
+reading, as a scan would. Reports the 304 ratio, the body bytes 304s saved
+and how many list queries were skipped. The seeded user is deleted afterwards.
+
+    DATABASE_URL=postgresql://localhost/ytilities_bench \\
+        python -m benchmarks.bench_etags --meters 3 --refreshes 200 --write-every 10
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+os.environ.setdefault("RATELIMIT_ENABLED", "false")
+
+import httpx  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app.database import async_session, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.accounts import provision_user  # noqa: E402
+from app.services.auth import create_access_token  # noqa: E402
+
+EMAIL_DOMAIN = "etag-bench.test"
+
+
+async def seed(meters: int) -> uuid.UUID:
+    async with async_session() as db:
+        provisioned = await provision_user(db, email=f"{uuid.uuid4().hex}@{EMAIL_DOMAIN}", name="Bench")
+        user_id = provisioned.user.id
+        # provision_user creates three meters; add the rest and a year of readings
+        await db.execute(
+            text(
+                """
+                INSERT INTO meters (property_id, utility_type, name)
+                SELECT p.id, 'water', 'Bench ' || n
+                FROM properties p CROSS JOIN generate_series(4, :meters) AS n
+                WHERE p.user_id = :user_id
+                """
+            ),
+            {"user_id": user_id, "meters": meters},
+        )
+        await db.execute(
+            text(
+                """
+                INSERT INTO readings (meter_id, value, recorded_at)
+                SELECT m.id, n, now() - (365 - n) * interval '1 day'
+                FROM meters m JOIN properties p ON p.id = m.property_id
+                CROSS JOIN generate_series(1, 365) AS n
+                WHERE p.user_id = :user_id
+                """
+            ),
+            {"user_id": user_id},
+        )
+        await db.commit()
+    return user_id
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--meters", type=int, default=3)
+    parser.add_argument("--refreshes", type=int, default=200)
+    parser.add_argument("--write-every", type=int, default=10)
+    args = parser.parse_args()
+
+    user_id = await seed(args.meters)
+    headers = {"Authorization": f"Bearer {create_access_token(str(user_id))}"}
+    etags: dict[str, str] = {}
+    sizes: dict[str, int] = {}
+    requests = not_modified = saved = sent = 0
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+
+            async def get(url: str, params: dict | None = None) -> httpx.Response:
+                nonlocal requests, not_modified, saved, sent
+                key = str(httpx.URL(url, params=params))
+                conditional = {"If-None-Match": etags[key]} if key in etags else {}
+                response = await client.get(url, params=params, headers=conditional)
+                requests += 1
+                if response.status_code == 304:
+                    not_modified += 1
+                    saved += sizes[key]
+                else:
+                    assert response.status_code == 200, response.text
+                    etags[key] = response.headers["etag"]
+                    sizes[key] = len(response.content)
+                    sent += len(response.content)
+                return response
+
+            meter_ids: list[str] = []
+            writes = itertools.cycle(range(args.meters))
+            for refresh in range(1, args.refreshes + 1):
+                meters = await get("/meters")
+                if meters.status_code == 200:
+                    meter_ids = [m["id"] for m in meters.json()]
+                for meter_id in meter_ids:
+                    for url in ("/readings", "/tariffs", "/bills"):
+                        await get(url, {"meter_id": meter_id})
+                if refresh % args.write_every == 0:
+                    created = await client.post(
+                        "/readings", data={"meter_id": meter_ids[next(writes)], "value": 1000 + refresh}
+                    )
+                    assert created.status_code == 201, created.text
+    finally:
+        async with async_session() as db:
+            await db.execute(text("DELETE FROM users WHERE email LIKE :pattern"), {"pattern": f"%@{EMAIL_DOMAIN}"})
+            await db.commit()
+        await engine.dispose()
+
+    print(f"requests         {requests}")
+    print(f"304 hit ratio    {not_modified / requests:.1%}  ({not_modified} list queries skipped)")
+    print(f"body bytes sent  {sent}")
+    print(f"body bytes saved {saved}  ({saved / (saved + sent):.1%} of what polling without ETags sends)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
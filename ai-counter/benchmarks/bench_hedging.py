@@ -0,0 +1,104 @@
+"""Tail latency of vision calls with and without hedging.
+
+Starts the fake vision server in-process with a long-tail latency
+distribution and fires the same recognizer call at it sequentially:
+
+    python -m benchmarks.bench_hedging --requests 400 --latency-ms 300 --tail-prob 0.05 --tail-ms 3000
+
+Prints p50/p95/p99 and a latency histogram per variant, plus how many extra
+upstream requests hedging cost.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn  # noqa: E402
+
+from benchmarks import fake_vision_server  # noqa: E402
+
+BUCKETS_MS = [100, 250, 500, 1000, 2000, 4000, 8000]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _histogram(values: list[float]) -> None:
+    edges = BUCKETS_MS + [float("inf")]
+    counts = [0] * len(edges)
+    for v in values:
+        counts[next(i for i, edge in enumerate(edges) if v <= edge)] += 1
+    widest = max(counts) or 1
+    for edge, count in zip(edges, counts):
+        label = f"<= {edge:.0f}" if edge != float("inf") else f"> {BUCKETS_MS[-1]}"
+        print(f"  {label:>9} ms | {'#' * round(40 * count / widest):<40} {count}")
+
+
+async def run_variant(recognizer, hedge: bool, requests: int) -> tuple[list[float], int]:
+    recognizer._latencies.clear()
+    for key in recognizer._stats:
+        recognizer._stats[key] = 0
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await recognizer._recognize_with_vision(b"\xff\xd8\xff", "gas", "low", 5, mode="structured", hedge=hedge)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, recognizer._stats["vision_requests"]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--tail-prob", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=3000)
+    parser.add_argument("--percentile", type=float, default=0.9)
+    parser.add_argument("--max-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    fake_vision_server.settings.update(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, tail_prob=args.tail_prob, tail_ms=args.tail_ms
+    )
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(fake_vision_server.app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    from app import recognizer
+
+    recognizer.HEDGE_PERCENTILE = args.percentile
+    recognizer.HEDGE_MAX_RATIO = args.max_ratio
+    recognizer.init_client()
+
+    for label, hedge in [("no hedging", False), ("hedging", True)]:
+        latencies, upstream = await run_variant(recognizer, hedge, args.requests)
+        print(
+            f"\n{label}: p50 {_percentile(latencies, 0.5):.0f} ms  p95 {_percentile(latencies, 0.95):.0f} ms  "
+            f"p99 {_percentile(latencies, 0.99):.0f} ms  upstream requests {upstream} "
+            f"(+{100 * (upstream - args.requests) / args.requests:.1f}%)"
+        )
+        _histogram(latencies)
+
+    await recognizer.close_client()
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
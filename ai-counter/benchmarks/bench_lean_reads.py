@@ -0,0 +1,109 @@
+"""Cost of turning one list page into a response body: ORM path vs lean path.
+
+  orm   select(Reading) -> Reading objects -> ReadingResponse per row ->
+        response_model validation and serialization (what FastAPI does for
+        a returned list) -> stdlib json, as the endpoint used to
+  lean  select(<columns>) -> rows -> orjson via rows_response()
+
+Rows come from an in-memory SQLite table so ORM hydration and row
+processing are real but no network time is counted. Reports rows/s and
+the peak memory traced while building one page.
+
+    python -m benchmarks.bench_lean_reads --rows 500 --pages 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.models.reading import Reading  # noqa: E402
+from app.responses import rows_response  # noqa: E402
+from app.schemas.reading import ReadingResponse  # noqa: E402
+
+METER_ID = uuid.uuid4()
+page_adapter = TypeAdapter(list[ReadingResponse])
+
+
+def orm_page(db: Session, rows: int) -> bytes:
+    readings = db.execute(select(Reading).where(Reading.meter_id == METER_ID).limit(rows)).scalars().all()
+    models = [
+        ReadingResponse(
+            id=str(r.id),
+            meter_id=str(r.meter_id),
+            value=r.value,
+            recorded_at=r.recorded_at,
+            created_at=r.created_at,
+        )
+        for r in readings
+    ]
+    content = page_adapter.dump_python(page_adapter.validate_python(models), mode="json")
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+    # Hydrated objects stay in the identity map until the session lets go of them
+    db.expunge_all()
+    return body
+
+
+def lean_page(db: Session, rows: int) -> bytes:
+    result = db.execute(
+        select(Reading.id, Reading.meter_id, Reading.value, Reading.recorded_at, Reading.created_at)
+        .where(Reading.meter_id == METER_ID)
+        .limit(rows)
+    )
+    return rows_response(result.all()).body
+
+
+def measure(page, db: Session, rows: int, pages: int) -> tuple[float, float, int]:
+    page(db, rows)  # warm statement caches
+    start = time.perf_counter()
+    for _ in range(pages):
+        page(db, rows)
+    rows_per_second = rows * pages / (time.perf_counter() - start)
+
+    tracemalloc.start()
+    body = page(db, rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows_per_second, peak / 1024, len(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Reading.__table__.create(engine)
+    now = datetime.now(timezone.utc)
+    with Session(engine) as db:
+        db.execute(
+            insert(Reading),
+            [
+                {"id": uuid.uuid4(), "meter_id": METER_ID, "value": i, "recorded_at": now - timedelta(minutes=i)}
+                for i in range(args.rows)
+            ],
+        )
+        db.commit()
+
+        print(f"{'path':<6} {'rows/s':>10} {'peak KiB/page':>14} {'body bytes':>11}")
+        for label, page in (("orm", orm_page), ("lean", lean_page)):
+            rows_per_second, peak_kib, size = measure(page, db, args.rows, args.pages)
+            print(f"{label:<6} {rows_per_second:>10.0f} {peak_kib:>14.1f} {size:>11}")
+
+
+if __name__ == "__main__":
+    main()
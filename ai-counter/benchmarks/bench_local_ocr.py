@@ -0,0 +1,50 @@
+"""Offline accuracy and latency of the local OCR tier on the synthetic corpus.
+
+    python -m benchmarks.bench_local_ocr [--n 500] [--seed 0] [--min-confidence 0.8] [--held-out]
+
+"served" is the share of scans the local tier would answer without
+escalating; "wrong" counts served reads that do not match the label.
+--held-out renders faces the engine has no templates for, with
+perspective distortion; the default corpus uses the engine's own face.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.local_ocr import recognize_local  # noqa: E402
+from tests.ocr_corpus import generate  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-confidence", type=float, default=0.8)
+    parser.add_argument("--held-out", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'utility':>12} {'accuracy':>9} {'served':>7} {'wrong':>6} {'p50 ms':>7} {'p95 ms':>7}")
+    for utility_type in ("gas", "water", "electricity"):
+        correct = served = wrong = 0
+        timings = []
+        for data, label in generate(args.n, utility_type, args.seed, args.held_out):
+            start = time.perf_counter()
+            reading = recognize_local(data, utility_type, len(label))
+            timings.append((time.perf_counter() - start) * 1000)
+            correct += reading.digits == label
+            if reading.confidence >= args.min_confidence:
+                served += 1
+                wrong += reading.digits != label
+        timings.sort()
+        print(
+            f"{utility_type:>12} {correct / args.n:>9.1%} {served / args.n:>7.1%} {wrong:>6} "
+            f"{statistics.median(timings):>7.2f} {timings[int(len(timings) * 0.95)]:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Page latency at depth: OFFSET vs keyset cursor on one meter's readings.
+
+Needs a migrated Postgres at DATABASE_URL (alembic upgrade head). Seeds a
+throwaway user/meter with --rows readings (server-side generate_series),
+then times the list_readings query for the page starting at each --depths
+row, once with OFFSET and once seeking from the cursor of the row before.
+The seeded data is deleted afterwards.
+
+    DATABASE_URL=postgresql://localhost/ytilities_bench \\
+        python -m benchmarks.bench_pagination --rows 1000000 --depths 0 1000 100000 500000 990000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from sqlalchemy import select, text  # noqa: E402
+
+from app.database import async_session, engine  # noqa: E402
+from app.models.reading import Reading  # noqa: E402
+from app.pagination import encode_cursor, paginate  # noqa: E402
+
+PAGE_SIZE = 50
+
+
+async def seed(rows: int) -> tuple[uuid.UUID, uuid.UUID]:
+    user_id, meter_id = uuid.uuid4(), uuid.uuid4()
+    async with async_session() as db:
+        await db.execute(
+            text("INSERT INTO users (id, email, name) VALUES (:id, :email, 'Bench')"),
+            {"id": user_id, "email": f"{user_id}@pagination-bench.test"},
+        )
+        property_id = (
+            await db.execute(
+                text("INSERT INTO properties (user_id, name) VALUES (:user_id, 'Bench') RETURNING id"),
+                {"user_id": user_id},
+            )
+        ).scalar_one()
+        await db.execute(
+            text("INSERT INTO meters (id, property_id, utility_type, name) VALUES (:id, :property_id, 'gas', 'Bench')"),
+            {"id": meter_id, "property_id": property_id},
+        )
+        await db.execute(
+            text(
+                """
+                INSERT INTO readings (meter_id, value, recorded_at)
+                SELECT :meter_id, n % 100000, now() - n * interval '1 minute'
+                FROM generate_series(1, :rows) AS n
+                """
+            ),
+            {"meter_id": meter_id, "rows": rows},
+        )
+        await db.commit()
+        await db.execute(text("ANALYZE readings"))
+    return user_id, meter_id
+
+
+async def time_page(statement, repeats: int) -> float:
+    samples = []
+    async with async_session() as db:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            (await db.execute(statement)).scalars().all()
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 1_000, 100_000, 500_000, 990_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Seeding {args.rows} readings...")
+    user_id, meter_id = await seed(args.rows)
+    base = select(Reading).where(Reading.meter_id == meter_id)
+
+    def page(offset: int, cursor: str | None):
+        return paginate(base, Reading.recorded_at, Reading.id, PAGE_SIZE, offset, cursor)
+
+    try:
+        print(f"{'depth':>10} {'offset ms':>10} {'cursor ms':>10}")
+        for depth in args.depths:
+            offset_ms = await time_page(page(depth, None), args.repeats)
+            cursor = None
+            if depth:
+                async with async_session() as db:
+                    previous = (
+                        await db.execute(
+                            select(Reading.recorded_at, Reading.id)
+                            .where(Reading.meter_id == meter_id)
+                            .order_by(Reading.recorded_at.desc(), Reading.id)
+                            .offset(depth - 1)
+                            .limit(1)
+                        )
+                    ).one()
+                cursor = encode_cursor(previous.recorded_at, previous.id)
+            cursor_ms = await time_page(page(0, cursor), args.repeats)
+            print(f"{depth:>10} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+    finally:
+        async with async_session() as db:
+            await db.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Event-loop lag during a login storm, with bcrypt inline vs offloaded.
+
+Fires --logins concurrent password verifications while a 10 ms ticker
+measures how late the event loop wakes up; every other request on the
+worker (including /recognize) sees that lag.
+
+    python -m benchmarks.bench_password_hashing --logins 40 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt  # noqa: E402
+
+os.environ.setdefault("JWT_SECRET", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from app.services import auth  # noqa: E402
+
+TICK = 0.01
+
+
+async def _ticker(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+
+async def _inline_verify(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+async def run_variant(verify, hashed: str, logins: int) -> tuple[float, list[float]]:
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    await asyncio.sleep(TICK * 2)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verify("correct horse", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    assert all(results)
+    return elapsed, sorted(lags)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=auth.PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+    hashed = bcrypt.hashpw(b"correct horse", bcrypt.gensalt(args.rounds)).decode()
+    auth.PASSWORD_HASH_WORKERS = args.workers
+
+    print(f"{args.logins} logins, bcrypt cost {args.rounds}, {args.workers} workers")
+    print(f"{'variant':>10} {'logins/s':>9} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    for label, executor in [("inline", None), ("thread", "thread"), ("process", "process")]:
+        if executor is None:
+            verify = _inline_verify
+        else:
+            auth.shutdown_hash_executor()
+            auth.PASSWORD_HASH_EXECUTOR = executor
+            # Warm the pool so worker start-up is not counted
+            await auth.verify_password("correct horse", hashed)
+            verify = auth.verify_password
+        elapsed, lags = await run_variant(verify, hashed, args.logins)
+        print(
+            f"{label:>10} {args.logins / elapsed:>9.1f} {statistics.median(lags):>11.1f} "
+            f"{lags[int(len(lags) * 0.99)]:>11.1f} {lags[-1]:>11.1f}"
+        )
+    auth.shutdown_hash_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Compare vision payloads with and without server-side preprocessing.
+
+Reports base64 bytes sent, billed tiles/tokens and latency for synthetic
+phone photos. Latency is local (preprocess + base64) unless --live is passed,
+in which case each variant also goes through recognize_digits end to end.
+
+    python -m benchmarks.bench_preprocess [--live] [--runs 5]
+"""
+import argparse
+import asyncio
+import base64
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from app.preprocess import preprocess_image, vision_tokens  # noqa: E402
+from app.validation import get_image_dimensions  # noqa: E402
+
+SIZES = [(4032, 3024), (3024, 4032), (1920, 1080), (480, 360)]
+
+
+def make_photo(width: int, height: int) -> bytes:
+    noise = Image.effect_noise((width, height), 40).convert("RGB")
+    base = Image.new("RGB", (width, height), (120, 110, 100))
+    img = Image.blend(base, noise, 0.5)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+def measure(data: bytes, utility_type: str, enabled: bool) -> tuple[int, int, float, str, bytes]:
+    start = time.perf_counter()
+    if enabled:
+        payload, detail = preprocess_image(data, utility_type)
+    else:
+        payload, detail = data, "high"
+    b64 = base64.b64encode(payload)
+    elapsed = time.perf_counter() - start
+    width, height = get_image_dimensions(payload, "")
+    return len(b64), vision_tokens(width, height, detail), elapsed, detail, payload
+
+
+async def live(payload: bytes, detail: str, utility_type: str) -> float:
+    from app.recognizer import close_client, recognize_digits
+
+    start = time.perf_counter()
+    await recognize_digits(payload, "image/jpeg", utility_type, detail)
+    elapsed = time.perf_counter() - start
+    await close_client()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--utility", default="gas")
+    parser.add_argument("--live", action="store_true", help="also call the vision API")
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'mode':>5} {'b64 bytes':>11} {'tokens':>7} {'detail':>6} {'local ms':>9} {'live ms':>8}")
+    for width, height in SIZES:
+        data = make_photo(width, height)
+        for enabled in (False, True):
+            timings = []
+            for _ in range(args.runs):
+                sent, tokens, elapsed, detail, payload = measure(data, args.utility, enabled)
+                timings.append(elapsed)
+            live_ms = ""
+            if args.live:
+                live_ms = f"{asyncio.run(live(payload, detail, args.utility)) * 1000:.0f}"
+            print(
+                f"{width}x{height:<5} {'after' if enabled else 'raw':>5} {sent:>11} {tokens:>7} {detail:>6} "
+                f"{statistics.median(timings) * 1000:>9.1f} {live_ms:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Per-request cost of the rate limiter.
+
+Times RateLimiter.check() for the in-process backend, for the Postgres
+backend's allowed path (one upsert round trip) and for over-limit clients,
+which the local pre-check turns away without a query. The Postgres rows
+need a migrated database at DATABASE_URL (alembic upgrade head) and are
+skipped without --postgres.
+
+    python -m benchmarks.bench_rate_limit --checks 2000
+    DATABASE_URL=postgresql://localhost/ytilities_bench \\
+        python -m benchmarks.bench_rate_limit --checks 2000 --postgres
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from sqlalchemy import delete  # noqa: E402
+
+from app.database import async_session, engine  # noqa: E402
+from app.models.rate_limit_bucket import RateLimitBucket  # noqa: E402
+from app.rate_limit import MemoryBackend, PostgresBackend, RateLimiter, RateLimitExceeded  # noqa: E402
+
+KEY_PREFIX = "bench-rate-limit|"
+
+
+async def timed(limiter: RateLimiter, keys: list[str], capacity: int) -> tuple[float, int]:
+    rejected = 0
+    start = time.perf_counter()
+    for key in keys:
+        try:
+            await limiter.check(key, capacity, capacity / 60)
+        except RateLimitExceeded:
+            rejected += 1
+    return (time.perf_counter() - start) / len(keys) * 1e6, rejected
+
+
+async def bench(label: str, backend, checks: int) -> None:
+    limiter = RateLimiter(backend, enabled=True)
+    # Allowed: every check on a fresh key, so each one reaches the backend
+    allowed_us, _ = await timed(limiter, [f"{KEY_PREFIX}{uuid.uuid4()}" for _ in range(checks)], 10)
+    # Over limit: one client hammering a 10/minute route
+    over_us, rejected = await timed(limiter, [f"{KEY_PREFIX}hammer"] * checks, 10)
+    stats = limiter.stats()
+    print(
+        f"{label:<10} allowed {allowed_us:8.1f} us/check   over-limit {over_us:8.1f} us/check "
+        f"({rejected} rejected, {stats['backend_checks']} backend checks)"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=2000)
+    parser.add_argument("--postgres", action="store_true")
+    args = parser.parse_args()
+
+    await bench("memory", MemoryBackend(), args.checks)
+    if args.postgres:
+        try:
+            await bench("postgres", PostgresBackend(), args.checks)
+        finally:
+            async with async_session() as db:
+                await db.execute(delete(RateLimitBucket).where(RateLimitBucket.key.startswith(KEY_PREFIX)))
+                await db.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
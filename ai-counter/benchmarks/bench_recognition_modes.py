@@ -0,0 +1,63 @@
+"""Side-by-side latency / output tokens: chain-of-thought vs structured output.
+
+Needs OPENAI_API_KEY (or OPENAI_BASE_URL pointing at a compatible server).
+
+    python -m benchmarks.bench_recognition_modes IMAGE [IMAGE ...] --utility gas --runs 5
+
+Streamed runs report content chunks received before the JSON closed, which
+is the number of output tokens actually waited for.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import recognizer  # noqa: E402
+from app.preprocess import preprocess_image  # noqa: E402
+from app.recognizer import _parse_response  # noqa: E402
+
+VARIANTS = [("cot", False), ("structured", False), ("structured", True)]
+
+
+async def run_once(payload: bytes, detail: str, utility_type: str, digit_count: int, mode: str, stream: bool):
+    request = recognizer._build_request(payload, utility_type, detail, digit_count, mode)
+    start = time.perf_counter()
+    raw, tokens = await recognizer._post_completion(request, payload, stream)
+    return time.perf_counter() - start, tokens, _parse_response(raw, digit_count)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--utility", default="gas")
+    parser.add_argument("--digits", type=int, default=None)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    digit_count = args.digits or recognizer._default_digit_count(args.utility)
+
+    print(f"{'mode':>18} {'p50 ms':>8} {'p95 ms':>8} {'out tokens':>11}  reads")
+    for mode, stream in VARIANTS:
+        latencies, tokens, reads = [], [], []
+        for path in args.images:
+            with open(path, "rb") as f:
+                payload, detail = preprocess_image(f.read(), args.utility)
+            for _ in range(args.runs):
+                elapsed, used, digits = await run_once(payload, detail, args.utility, digit_count, mode, stream)
+                latencies.append(elapsed * 1000)
+                tokens.append(used)
+                reads.append(digits)
+        latencies.sort()
+        label = f"{mode}{'+stream' if stream else ''}"
+        print(
+            f"{label:>18} {statistics.median(latencies):>8.0f} {latencies[int(len(latencies) * 0.95)]:>8.0f} "
+            f"{statistics.mean(tokens):>11.1f}  {sorted(set(reads))}"
+        )
+    await recognizer.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""Signup throughput: ORM insert/flush provisioning vs the single CTE statement.
+
+Needs a migrated Postgres at DATABASE_URL (alembic upgrade head). Creates
+--signups users per mode with --concurrency sessions in flight, counts the
+statements each signup sends, then deletes the benchmark users again.
+Password hashing is left out so only database round trips are compared.
+
+    DATABASE_URL=postgresql://localhost/ytilities_bench \\
+        python -m benchmarks.bench_signup --signups 500 --concurrency 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET", "bench")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from sqlalchemy import delete, event, select  # noqa: E402
+
+from app.database import async_session, engine  # noqa: E402
+from app.models.meter import Meter  # noqa: E402
+from app.models.property import Property  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.accounts import provision_user  # noqa: E402
+
+EMAIL_DOMAIN = "signup-bench.test"
+statements = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count(*args):
+    global statements
+    statements += 1
+
+
+async def signup_orm(email: str) -> None:
+    """The previous register flow: exists-check, then insert/flush per table."""
+    async with async_session() as db:
+        result = await db.execute(select(User).where(User.email == email))
+        assert result.scalar_one_or_none() is None
+        user = User(email=email, password_hash="x", name="Bench")
+        db.add(user)
+        await db.flush()
+        prop = Property(user_id=user.id, name="My Home")
+        db.add(prop)
+        await db.flush()
+        db.add(Meter(property_id=prop.id, utility_type="gas", name="Gas Meter"))
+        db.add(Meter(property_id=prop.id, utility_type="electricity", name="Electricity Meter", digit_count=6))
+        db.add(Meter(property_id=prop.id, utility_type="water", name="Water Meter"))
+        await db.commit()
+        await db.refresh(user)
+
+
+async def signup_cte(email: str) -> None:
+    async with async_session() as db:
+        await provision_user(db, email=email, password_hash="x", name="Bench")
+
+
+async def run(signup, signups: int, concurrency: int) -> tuple[float, float]:
+    global statements
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await signup(f"{uuid.uuid4().hex}@{EMAIL_DOMAIN}")
+
+    statements = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(signups)))
+    elapsed = time.perf_counter() - start
+    return signups / elapsed, statements / signups
+
+
+async def cleanup() -> None:
+    async with async_session() as db:
+        await db.execute(delete(User).where(User.email.like(f"%@{EMAIL_DOMAIN}")))
+        await db.commit()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signups", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        for label, signup in (("orm insert/flush", signup_orm), ("single CTE", signup_cte)):
+            await run(signup, min(20, args.signups), args.concurrency)  # warm the pool
+            throughput, per_signup = await run(signup, args.signups, args.concurrency)
+            print(f"{label:<18} {throughput:8.1f} signups/s  {per_signup:4.1f} statements/signup")
+    finally:
+        await cleanup()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
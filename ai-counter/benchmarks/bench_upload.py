@@ -0,0 +1,133 @@
+"""Peak RSS and latency of upload validation: buffered multipart vs streaming vs raw body.
+
+Each measurement runs in a fresh subprocess (ru_maxrss only ever grows), posting
+a synthetic JPEG through an in-process ASGI app that only validates the upload:
+
+    python -m benchmarks.bench_upload --sizes 1 10 50
+
+Variants:
+  buffered   multipart + read the whole file before checking (the old validate_image)
+  multipart  multipart + chunked validate_image
+  raw        raw image/jpeg body + validate_stream (what /recognize/raw does)
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import struct
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VARIANTS = ["buffered", "multipart", "raw"]
+CHUNK = 64 * 1024
+
+
+def _jpeg_header(width: int = 4032, height: int = 3024) -> bytes:
+    return b"\xFF\xD8\xFF\xC0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+
+
+class _LazyJpeg:
+    """File-like JPEG of the given size, generated on read so the client holds no copy."""
+
+    def __init__(self, size: int):
+        self.header = _jpeg_header()
+        self.remaining = size
+
+    def read(self, n: int = CHUNK) -> bytes:
+        n = min(n if n > 0 else CHUNK, self.remaining)
+        if n <= 0:
+            return b""
+        out = self.header[:n] + b"\x00" * max(0, n - len(self.header))
+        self.header = self.header[n:]
+        self.remaining -= n
+        return out
+
+    async def aiter(self):
+        while chunk := self.read(CHUNK):
+            yield chunk
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _build_app():
+    from fastapi import FastAPI, File, Request, UploadFile
+    from fastapi.responses import JSONResponse
+
+    from app.validation import MAX_FILE_SIZE, ValidationError, validate_image, validate_stream
+
+    bench = FastAPI()
+
+    @bench.post("/buffered")
+    async def buffered(image: UploadFile = File(...)):
+        data = await image.read()
+        if len(data) > MAX_FILE_SIZE:
+            return JSONResponse(status_code=400, content={"error": "too large"})
+        return {"size": len(data)}
+
+    @bench.post("/multipart")
+    async def multipart(image: UploadFile = File(...)):
+        try:
+            return {"size": len(await validate_image(image))}
+        except ValidationError as e:
+            return JSONResponse(status_code=400, content={"error": e.detail})
+
+    @bench.post("/raw")
+    async def raw(request: Request):
+        length = request.headers.get("content-length")
+        try:
+            data = await validate_stream(request.stream(), request.headers.get("content-type"), int(length) if length else None)
+            return {"size": len(data)}
+        except ValidationError as e:
+            return JSONResponse(status_code=400, content={"error": e.detail})
+
+    return bench
+
+
+async def _child(variant: str, size: int) -> dict:
+    import httpx
+
+    app = _build_app()
+    baseline = _rss_mb()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        body = _LazyJpeg(size)
+        start = time.perf_counter()
+        if variant == "raw":
+            # No Content-Length, so the size check has to happen while streaming
+            response = await client.post("/raw", content=body.aiter(), headers={"Content-Type": "image/jpeg"})
+        else:
+            response = await client.post(f"/{variant}", files={"image": ("meter.jpg", body, "image/jpeg")})
+        elapsed = time.perf_counter() - start
+    return {"status": response.status_code, "ms": elapsed * 1000, "rss_mb": _rss_mb() - baseline}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 10, 50], help="upload sizes in MB")
+    parser.add_argument("--child", nargs=2, metavar=("VARIANT", "BYTES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.child[0], int(args.child[1])))))
+        return
+
+    print(f"{'size':>8} {'variant':>10} {'status':>6} {'ms':>8} {'peak RSS +MB':>13}")
+    for size_mb in args.sizes:
+        size = int(size_mb * 1024 * 1024)
+        for variant in VARIANTS:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_upload", "--child", variant, str(size)],
+                capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{size_mb:>6g}MB {variant:>10} {result['status']:>6} {result['ms']:>8.1f} {result['rss_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Answers every request with a pos1..posN JSON reading after a configurable
+latency, so load and tail-latency benchmarks run without the real API:
+
+    python -m benchmarks.fake_vision_server --port 9000 --latency-ms 3000 --tail-prob 0.05 --tail-ms 9000
+    OPENAI_BASE_URL=http://127.0.0.1:9000/v1 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+settings = {"latency_ms": 2000.0, "jitter_ms": 300.0, "tail_prob": 0.0, "tail_ms": 8000.0, "error_rate": 0.0}
+stats = {"requests": 0, "cancelled": 0}
+
+
+def _latency() -> float:
+    if random.random() < settings["tail_prob"]:
+        return settings["tail_ms"] / 1000
+    return max(0.0, random.gauss(settings["latency_ms"], settings["jitter_ms"])) / 1000
+
+
+def _reading(body: dict) -> str:
+    schema = (body.get("response_format") or {}).get("json_schema", {}).get("schema", {})
+    count = len(schema.get("required", [])) or 5
+    return json.dumps({f"pos{i}": random.randint(0, 9) for i in range(1, count + 1)})
+
+
+async def completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    try:
+        await asyncio.sleep(_latency())
+    except asyncio.CancelledError:
+        stats["cancelled"] += 1
+        raise
+    if random.random() < settings["error_rate"]:
+        return JSONResponse({"error": {"message": "fake upstream error", "type": "server_error"}}, status_code=500)
+
+    content = _reading(body)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if body.get("stream"):
+        async def chunks():
+            for piece in [content[i : i + 8] for i in range(0, len(content), 8)]:
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model", "gpt-4o"),
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return JSONResponse(
+        {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": body.get("model", "gpt-4o"),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": 800, "completion_tokens": len(content) // 3, "total_tokens": 800},
+        }
+    )
+
+
+async def get_stats(request: Request):
+    return JSONResponse(stats)
+
+
+app = Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"]), Route("/stats", get_stats)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9000)
+    for key, value in settings.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=value)
+    args = parser.parse_args()
+    for key in settings:
+        settings[key] = getattr(args, key)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
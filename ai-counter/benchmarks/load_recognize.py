@@ -0,0 +1,108 @@
+"""Check that other endpoints keep serving while many scans are in flight.
+
+Start the fake vision backend and the API with limits opened up, e.g.:
+
+    python -m benchmarks.fake_vision_server --port 9000 --latency-ms 5000
+    OPENAI_BASE_URL=http://127.0.0.1:9000/v1 RATELIMIT_ENABLED=false DAILY_SCAN_LIMIT=100000 \\
+        uvicorn app.main:app --port 8000
+
+then:
+
+    python -m benchmarks.load_recognize --base-url http://127.0.0.1:8000 --scans 60
+
+A throwaway user is registered unless --token is given. GET /meters is probed
+every --probe-interval seconds while the scans run; its latency should stay
+flat instead of queueing behind the connection pool.
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_jpeg() -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.effect_noise((800, 600), 40).convert("RGB").save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+async def login(client: httpx.AsyncClient) -> str:
+    email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+    resp = await client.post("/auth/register", json={"email": email, "password": "load-test-pw", "name": "Load"})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token")
+    parser.add_argument("--scans", type=int, default=60)
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.scans + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        token = args.token or await login(client)
+        client.headers["Authorization"] = f"Bearer {token}"
+        meters = (await client.get("/meters")).json()
+        meter_id = meters[0]["id"]
+        image = make_jpeg()
+
+        async def scan() -> tuple[int, float]:
+            start = time.perf_counter()
+            resp = await client.post(
+                "/recognize",
+                files={"image": ("meter.jpg", image, "image/jpeg")},
+                data={"meter_id": meter_id},
+            )
+            return resp.status_code, time.perf_counter() - start
+
+        probes: list[float] = []
+        probe_errors = 0
+        done = asyncio.Event()
+
+        async def probe() -> None:
+            nonlocal probe_errors
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    resp = await client.get("/meters", timeout=5)
+                    resp.raise_for_status()
+                    probes.append((time.perf_counter() - start) * 1000)
+                except httpx.HTTPError:
+                    probe_errors += 1
+                await asyncio.sleep(args.probe_interval)
+
+        prober = asyncio.create_task(probe())
+        results = await asyncio.gather(*(scan() for _ in range(args.scans)))
+        done.set()
+        await prober
+
+    codes: dict[int, int] = {}
+    for code, _ in results:
+        codes[code] = codes.get(code, 0) + 1
+    scan_times = sorted(elapsed for _, elapsed in results)
+    probes.sort()
+    print(f"scans: {args.scans} status={codes} p50={statistics.median(scan_times):.2f}s max={scan_times[-1]:.2f}s")
+    if probes:
+        print(
+            f"GET /meters during scans: n={len(probes)} errors={probe_errors} "
+            f"p50={statistics.median(probes):.1f}ms p95={probes[int(len(probes) * 0.95)]:.1f}ms max={probes[-1]:.1f}ms"
+        )
+    else:
+        print(f"GET /meters during scans: no successful probes, errors={probe_errors}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+import os
+import re
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+# Tests run without Postgres; keep rate limit buckets in process
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+
+from app.auth_cache import Principal  # noqa: E402
+from app.models.meter import Meter  # noqa: E402
+
+USER = Principal(uuid.UUID("00000000-0000-0000-0000-0000000000a1"), "tester@test.com", "Tester")
+METER = Meter(
+    id=uuid.UUID("00000000-0000-0000-0000-0000000000a2"),
+    property_id=uuid.UUID("00000000-0000-0000-0000-0000000000a3"),
+    utility_type="gas",
+    name="Gas Meter",
+    digit_count=5,
+)
+
+
+class FakeSession:
+    """Stand-in AsyncSession answering by the table a statement reads.
+
+    tables maps a table name to what both .all() and .scalars().all() return
+    for it; the meters entry also answers the ownership lookup. Version
+    counters behave like the meters/users version columns. Every statement
+    is kept in executed, its SQL in statements.
+    """
+
+    def __init__(self, tables: dict | None = None, meters: list | None = None):
+        self.tables = {"meters": [METER] if meters is None else meters, **(tables or {})}
+        self.meter_version = 0
+        self.user_version = 0
+        self.executed: list = []
+        self.statements: list[str] = []
+
+    def count(self, predicate) -> int:
+        return sum(1 for sql in self.statements if predicate(sql))
+
+    def ownership_queries(self) -> int:
+        """Loads of a user's Meter entities, as app.services.ownership does."""
+        return sum(
+            1
+            for statement in self.executed
+            if getattr(statement, "column_descriptions", None) and statement.column_descriptions[0]["type"] is Meter
+        )
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        self.executed.append(statement)
+        self.statements.append(sql)
+        result = MagicMock()
+        if sql.startswith("UPDATE meters SET version"):
+            self.meter_version += 1
+        elif sql.startswith("UPDATE users SET version"):
+            self.user_version += 1
+        elif sql.startswith("SELECT meters.version"):
+            result.scalar_one.return_value = self.meter_version
+        elif sql.startswith("SELECT users.version"):
+            result.scalar_one.return_value = self.user_version
+        elif sql.startswith("SELECT meters.id, meters.version \nFROM"):
+            meters = self.tables["meters"]
+            result.all.return_value = [SimpleNamespace(id=m.id, version=self.meter_version) for m in meters]
+        else:
+            # The innermost FROM: a LATERAL select reads its rows from the inner table
+            found = re.findall(r"FROM (\w+)", sql)
+            rows = list(self.tables.get(found[-1], [])) if found else []
+            result.all.return_value = rows
+            result.scalars.return_value.all.return_value = rows
+            result.scalar_one_or_none.return_value = rows[0] if rows else None
+            result.one_or_none.return_value = rows[0] if rows else None
+        return result
+
+    def add(self, obj):
+        if getattr(obj, "id", None) is None:
+            obj.id = uuid.uuid4()
+
+    async def delete(self, obj):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, obj):
+        obj.id = obj.id or uuid.uuid4()
+        if hasattr(obj, "created_at"):
+            obj.created_at = obj.created_at or datetime.now(timezone.utc)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def _clear_meter_ownership():
+    # Test modules share user ids but fake different meters
+    from app.services.ownership import owned_meters
+
+    owned_meters.clear()
+
+
+@pytest.fixture
+def use_session(monkeypatch):
+    """use_session(session, user=USER) routes the app's database and auth to fakes; returns a TestClient."""
+    from fastapi.testclient import TestClient
+
+    from app.dependencies import get_current_user, get_db, get_sessionmaker
+    from app.main import app
+    from app.rate_limit import limiter
+
+    overrides = dict(app.dependency_overrides)
+    monkeypatch.setattr(limiter, "enabled", False)
+
+    def use(session, user: Principal = USER) -> TestClient:
+        async def _get_db():
+            yield session
+
+        app.dependency_overrides[get_current_user] = lambda: user
+        app.dependency_overrides[get_db] = _get_db
+        app.dependency_overrides[get_sessionmaker] = lambda: asynccontextmanager(_get_db)
+        return TestClient(app)
+
+    yield use
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(overrides)
@@ -0,0 +1,158 @@
+"""Labeled synthetic meter crops for the local OCR engine.
+
+Deterministic for a given seed, so accuracy and latency numbers are
+comparable between runs: ``generate(n, utility_type, seed)`` yields
+``(jpeg_bytes, label)`` pairs.
+
+The default corpus draws digits from the same DRUM_FONT and segment layout
+the engine matches against, so it only checks the engine against its own
+face. ``held_out=True`` renders with faces the engine has never seen (Pillow's
+bundled TrueType font, slanted hexagonal LCD segments), then adds a
+perspective warp on top of the noise and blur.
+"""
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from app.local_ocr import DRUM_FONT, SEVEN_SEGMENT_DIGITS
+
+DIGIT_COUNTS = {"gas": 5, "water": 5, "electricity": 6}
+
+
+def _finish(canvas, rng) -> bytes:
+    canvas = canvas + rng.normal(0, 10, canvas.shape)
+    # 3x3 box blur to soften edges like a phone camera
+    padded = np.pad(canvas, 1, mode="edge")
+    canvas = sum(padded[dy : dy + canvas.shape[0], dx : dx + canvas.shape[1]] for dy in range(3) for dx in range(3)) / 9
+    canvas = np.clip(canvas, 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(canvas, mode="L").save(buf, format="JPEG", quality=int(rng.integers(70, 95)))
+    return buf.getvalue()
+
+
+def render_drums(label: str, rng) -> bytes:
+    px = int(rng.integers(6, 11))
+    glyph_w, glyph_h = 5 * px, 7 * px
+    cell_w = glyph_w + 4 * px
+    margin = 2 * px
+    drum, ink = float(rng.integers(20, 60)), float(rng.integers(190, 245))
+    canvas = np.full((glyph_h + 2 * margin, cell_w * len(label) + 2 * margin), float(rng.integers(90, 130)))
+    for i, digit in enumerate(label):
+        x = margin + i * cell_w
+        canvas[margin // 2 : -margin // 2, x + px // 2 : x + cell_w - px // 2] = drum
+        bitmap = np.array([[c == "1" for c in row] for row in DRUM_FONT[digit]])
+        glyph = np.kron(bitmap, np.ones((px, px), dtype=bool))
+        dy = int(rng.integers(-px // 2, px // 2 + 1))
+        dx = int(rng.integers(-px // 2, px // 2 + 1))
+        gx = x + 2 * px + dx
+        region = canvas[margin + dy : margin + dy + glyph_h, gx : gx + glyph_w]
+        region[glyph] = ink
+    return _finish(canvas, rng)
+
+
+def _perspective(img, rng, strength: float = 0.06):
+    """Warp as if shot off-axis: each corner moves up to ``strength`` of the image size."""
+    w, h = img.size
+
+    def jitter(size: int) -> float:
+        return float(rng.uniform(-strength, strength) * size)
+
+    # Source quad corners (upper left, lower left, lower right, upper right)
+    quad = (jitter(w), jitter(h), jitter(w), h + jitter(h), w + jitter(w), h + jitter(h), w + jitter(w), jitter(h))
+    return img.transform((w, h), Image.Transform.QUAD, quad, Image.Resampling.BILINEAR, fillcolor=img.getpixel((0, 0)))
+
+
+def render_font_drums(label: str, rng) -> bytes:
+    size = int(rng.integers(40, 72))
+    font = ImageFont.load_default(size=size)
+    drum, ink, bezel = int(rng.integers(20, 60)), int(rng.integers(190, 245)), int(rng.integers(90, 130))
+    left, top, right, bottom = font.getbbox("8")
+    cell = right - left + size // 3
+    margin = size // 4
+    img = Image.new("L", (cell * len(label) + 2 * margin, bottom - top + 2 * margin), bezel)
+    draw = ImageDraw.Draw(img)
+    for i, digit in enumerate(label):
+        x = margin + i * cell
+        draw.rectangle((x + 2, margin // 2, x + cell - 3, img.height - margin // 2), fill=drum)
+        d_left, _, d_right, _ = font.getbbox(digit)
+        dx = int(rng.integers(-2, 3))
+        dy = int(rng.integers(-size // 12, size // 12 + 1))
+        draw.text((x + (cell - (d_right - d_left)) // 2 - d_left + dx, margin - top + dy), digit, font=font, fill=ink)
+    return _finish(np.asarray(_perspective(img, rng), dtype=float), rng)
+
+
+def render_slanted_lcd(label: str, rng) -> bytes:
+    h = int(rng.integers(48, 80))
+    w = int(h * rng.uniform(0.45, 0.6))
+    t = max(3, int(h * rng.uniform(0.08, 0.14)))
+    gap = int(h * 0.35)
+    margin = h // 3
+    slant = float(rng.uniform(0.08, 0.2))
+    background, ink = int(rng.integers(170, 210)), int(rng.integers(30, 70))
+    img = Image.new("L", ((w + gap) * len(label) + 2 * margin + int(slant * h), h + 2 * margin), background)
+    draw = ImageDraw.Draw(img)
+    half = h / 2
+
+    def bar(x: float, y: float, horizontal: bool) -> list[tuple[float, float]]:
+        # Hexagonal segment pointed at both ends, starting at (x, y)
+        if horizontal:
+            length = w - t
+            return [(x, y), (x + t / 2, y - t / 2), (x + length - t / 2, y - t / 2),
+                    (x + length, y), (x + length - t / 2, y + t / 2), (x + t / 2, y + t / 2)]
+        return [(x, y), (x + t / 2, y + t / 2), (x + t / 2, y + half - t / 2),
+                (x, y + half), (x - t / 2, y + half - t / 2), (x - t / 2, y + t / 2)]
+
+    for i, digit in enumerate(label):
+        left, right = margin + i * (w + gap) + t / 2, margin + i * (w + gap) + w - t / 2
+        bars = {
+            "a": (left, t / 2, True),
+            "b": (right, t / 2, False),
+            "c": (right, half, False),
+            "d": (left, h - t / 2, True),
+            "e": (left, half, False),
+            "f": (left, t / 2, False),
+            "g": (left, half, True),
+        }
+        for segment in SEVEN_SEGMENT_DIGITS[digit]:
+            x, y, horizontal = bars[segment]
+            draw.polygon([(px + slant * (h - py), py + margin) for px, py in bar(x, y, horizontal)], fill=ink)
+    return _finish(np.asarray(_perspective(img, rng), dtype=float), rng)
+
+
+def render_lcd(label: str, rng) -> bytes:
+    h = int(rng.integers(48, 80))
+    w = int(h * 0.55)
+    t = max(3, h // 9)
+    gap = int(h * 0.3)
+    margin = h // 4
+    background, ink = float(rng.integers(170, 210)), float(rng.integers(30, 70))
+    canvas = np.full((h + 2 * margin, (w + gap) * len(label) + 2 * margin), background)
+    half = h // 2
+    boxes = {
+        "a": (0, t, t, w - t),
+        "b": (t // 2, half, w - t, w),
+        "c": (half, h - t // 2, w - t, w),
+        "d": (h - t, h, t, w - t),
+        "e": (half, h - t // 2, 0, t),
+        "f": (t // 2, half, 0, t),
+        "g": (half - t // 2, half + t - t // 2, t, w - t),
+    }
+    for i, digit in enumerate(label):
+        x = margin + i * (w + gap)
+        for segment in SEVEN_SEGMENT_DIGITS[digit]:
+            y0, y1, x0, x1 = boxes[segment]
+            canvas[margin + y0 + 1 : margin + y1 - 1, x + x0 + 1 : x + x1 - 1] = ink
+    return _finish(canvas, rng)
+
+
+def generate(n: int, utility_type: str = "gas", seed: int = 0, held_out: bool = False):
+    rng = np.random.default_rng(seed)
+    digit_count = DIGIT_COUNTS[utility_type]
+    if held_out:
+        render = render_slanted_lcd if utility_type == "electricity" else render_font_drums
+    else:
+        render = render_lcd if utility_type == "electricity" else render_drums
+    for _ in range(n):
+        label = "".join(str(d) for d in rng.integers(0, 10, digit_count))
+        yield render(label, rng), label
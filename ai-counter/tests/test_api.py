@@ -1,12 +1,18 @@
+import asyncio
 import io
 import struct
 import uuid
+from contextlib import asynccontextmanager
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
+from app import jobs
+from app.circuit_breaker import vision_breaker
 from app.main import app
+from app.recognition_cache import recognition_cache
+from app.single_flight import idempotent_responses
 from app.models.user import User
 
 client = TestClient(app)
@@ -40,7 +46,7 @@ def _make_minimal_jpeg(width: int = 800, height: int = 600) -> bytes:
 
 
 # Override auth dependency for all tests in this module
-from app.dependencies import get_current_user, get_db
+from app.dependencies import get_current_user, get_db, get_sessionmaker
 
 
 async def _mock_get_db():
@@ -57,17 +63,32 @@ async def _mock_get_db():
     # scalar_one_or_none() is sync, so use MagicMock for execute result
     mock_result = MagicMock()
     mock_result.scalar_one_or_none.return_value = mock_meter
+    mock_result.scalar.return_value = 0
+    mock_result.scalars.return_value.all.return_value = [mock_meter]
 
     mock_session = AsyncMock()
     mock_session.execute.return_value = mock_result
     yield mock_session
 
 
+def _mock_sessionmaker():
+    """Override get_sessionmaker so short-lived sessions are mocks too."""
+    return asynccontextmanager(_mock_get_db)
+
+
 app.dependency_overrides[get_current_user] = _auth_override
 app.dependency_overrides[get_db] = _mock_get_db
+app.dependency_overrides[get_sessionmaker] = _mock_sessionmaker
+
 
+@pytest.fixture(autouse=True)
+def _clear_recognition_cache():
+    recognition_cache.clear()
+    vision_breaker.reset()
+    idempotent_responses.clear()
 
-@patch("app.routers.readings.recognize_digits")
+
+@patch("app.services.recognition.recognize_digits")
 def test_successful_recognition(mock_recognize):
     mock_recognize.return_value = '{"pos1":0,"pos2":2,"pos3":3,"pos4":4,"pos5":0}'
     jpeg = _make_minimal_jpeg()
@@ -84,7 +105,7 @@ def test_successful_recognition(mock_recognize):
     assert "reading_id" in data
 
 
-@patch("app.routers.readings.recognize_digits")
+@patch("app.services.recognition.recognize_digits")
 def test_wrong_digit_count_returns_422(mock_recognize):
     mock_recognize.return_value = "0234"
     jpeg = _make_minimal_jpeg()
@@ -99,7 +120,7 @@ def test_wrong_digit_count_returns_422(mock_recognize):
     assert response.json()["result"] == "0234"
 
 
-@patch("app.routers.readings.recognize_digits")
+@patch("app.services.recognition.recognize_digits")
 def test_fallback_plain_text_response(mock_recognize):
     mock_recognize.return_value = "The reading is 02340."
     jpeg = _make_minimal_jpeg()
@@ -114,6 +135,50 @@ def test_fallback_plain_text_response(mock_recognize):
     assert response.json()["result"] == "02340"
 
 
+@patch("app.services.recognition.recognize_digits")
+def test_retry_of_same_image_is_served_from_cache(mock_recognize):
+    mock_recognize.return_value = '{"pos1":0,"pos2":2,"pos3":3,"pos4":4,"pos5":0}'
+    jpeg = _make_minimal_jpeg()
+
+    for _ in range(2):
+        response = client.post(
+            "/recognize",
+            files={"image": ("meter.jpg", io.BytesIO(jpeg), "image/jpeg")},
+            data={"meter_id": _mock_meter_id},
+        )
+        assert response.status_code == 200
+        assert response.json()["result"] == "02340"
+
+    assert mock_recognize.call_count == 1
+
+
+@patch("app.services.recognition.recognize_digits")
+def test_db_session_is_released_before_vision_call(mock_recognize):
+    sessions = []
+
+    async def tracking_get_db():
+        async for session in _mock_get_db():
+            sessions.append(session)
+            yield session
+
+    async def vision(*args, **kwargs):
+        assert sessions[0].close.await_count == 1
+        return '{"pos1":0,"pos2":2,"pos3":3,"pos4":4,"pos5":0}'
+
+    mock_recognize.side_effect = vision
+    app.dependency_overrides[get_db] = tracking_get_db
+    try:
+        response = client.post(
+            "/recognize",
+            files={"image": ("meter.jpg", io.BytesIO(_make_minimal_jpeg()), "image/jpeg")},
+            data={"meter_id": _mock_meter_id},
+        )
+    finally:
+        app.dependency_overrides[get_db] = _mock_get_db
+
+    assert response.status_code == 200
+
+
 def test_invalid_format_returns_400():
     response = client.post(
         "/recognize",
@@ -142,7 +207,21 @@ def test_health_returns_200():
     assert response.json() == {"status": "ok"}
 
 
-@patch("app.routers.readings.recognize_digits")
+@pytest.mark.parametrize("method, header", [("POST", "Idempotency-Key"), ("GET", "If-None-Match")])
+def test_cors_preflight_allows_conditional_and_idempotent_requests(method, header):
+    response = client.options(
+        "/recognize",
+        headers={
+            "Origin": "https://app.example.com",
+            "Access-Control-Request-Method": method,
+            "Access-Control-Request-Headers": f"authorization, {header.lower()}",
+        },
+    )
+    assert response.status_code == 200
+    assert header in response.headers["access-control-allow-headers"]
+
+
+@patch("app.services.recognition.recognize_digits")
 def test_chain_of_thought_response(mock_recognize):
     """GPT-4o returns chain-of-thought text followed by JSON."""
     mock_recognize.return_value = (
@@ -163,7 +242,7 @@ def test_chain_of_thought_response(mock_recognize):
     assert response.json()["result"] == "01814"
 
 
-@patch("app.routers.readings.recognize_digits")
+@patch("app.services.recognition.recognize_digits")
 def test_out_of_range_values_fall_back_to_normalize(mock_recognize):
     """If pos values are out of 0-9 range, fall back to plain-text normalization."""
     mock_recognize.return_value = '{"pos1": 0, "pos2": 12, "pos3": 8, "pos4": 1, "pos5": 4}'
@@ -178,3 +257,169 @@ def test_out_of_range_values_fall_back_to_normalize(mock_recognize):
     # Falls back to normalize_digits which extracts: 0, 1, 2, 8, 1, 4 -> "01281" (first 5)
     assert response.status_code == 200
     assert len(response.json()["result"]) == 5
+
+
+@patch("app.routers.readings.jobs.enqueue")
+def test_recognition_job_returns_202(mock_enqueue):
+    jpeg = _make_minimal_jpeg()
+
+    response = client.post(
+        "/recognize/jobs",
+        files={"image": ("meter.jpg", io.BytesIO(jpeg), "image/jpeg")},
+        data={"meter_id": _mock_meter_id},
+    )
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["location"] == f"/recognize/jobs/{job_id}"
+    mock_enqueue.assert_called_once_with(uuid.UUID(job_id))
+
+
+def test_recognition_job_rejects_invalid_image():
+    response = client.post(
+        "/recognize/jobs",
+        files={"image": ("file.txt", io.BytesIO(b"hello"), "text/plain")},
+        data={"meter_id": _mock_meter_id},
+    )
+
+    assert response.status_code == 400
+
+
+@patch("app.services.recognition.recognize_digits")
+def test_batch_returns_result_or_error_per_item(mock_recognize):
+    mock_recognize.return_value = '{"pos1":0,"pos2":2,"pos3":3,"pos4":4,"pos5":0}'
+    jpeg = _make_minimal_jpeg()
+    other_meter_id = "00000000-0000-0000-0000-000000000009"
+
+    response = client.post(
+        "/recognize/batch",
+        files=[
+            ("images", ("gas.jpg", io.BytesIO(jpeg), "image/jpeg")),
+            ("images", ("water.jpg", io.BytesIO(jpeg), "image/jpeg")),
+            ("images", ("light.jpg", io.BytesIO(jpeg), "image/jpeg")),
+        ],
+        data={"meter_ids": [_mock_meter_id, other_meter_id, "not-a-uuid"]},
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["status"] == 200
+    assert results[0]["result"] == "02340"
+    assert results[1] == {"meter_id": other_meter_id, "status": 404, "error": "Meter not found"}
+    assert results[2]["status"] == 400
+    assert mock_recognize.call_count == 1
+
+
+def test_batch_requires_one_meter_per_image():
+    response = client.post(
+        "/recognize/batch",
+        files=[("images", ("gas.jpg", io.BytesIO(_make_minimal_jpeg()), "image/jpeg"))],
+        data={"meter_ids": [_mock_meter_id, _mock_meter_id]},
+    )
+
+    assert response.status_code == 400
+
+
+def test_job_waiters_do_not_outlive_their_wait():
+    job_id = uuid.uuid4()
+
+    async def run():
+        # One poll times out while another is still waiting for the same job
+        early = asyncio.create_task(jobs.wait_for_update(job_id, timeout=0.01))
+        late = asyncio.create_task(jobs.wait_for_update(job_id, timeout=5))
+        await early
+        assert job_id in jobs._waiters
+        jobs._notify(job_id)
+        await asyncio.wait_for(late, 1)
+        await jobs.wait_for_update(uuid.uuid4(), timeout=0.01)
+
+    asyncio.run(run())
+    assert len(jobs._waiters) == 0
+
+
+@patch("app.routers.readings.jobs.enqueue")
+@patch("app.routers.readings.DEGRADED_MODE", "defer")
+@patch("app.services.recognition.recognize_digits")
+def test_open_breaker_defers_scan_as_job(mock_recognize, mock_enqueue):
+    jpeg = _make_minimal_jpeg()
+
+    with patch.object(vision_breaker, "allow", return_value=False):
+        response = client.post(
+            "/recognize",
+            files={"image": ("meter.jpg", io.BytesIO(jpeg), "image/jpeg")},
+            data={"meter_id": _mock_meter_id},
+        )
+
+    assert response.status_code == 202
+    assert response.json()["deferred"] is True
+    mock_recognize.assert_not_called()
+    mock_enqueue.assert_called_once()
+
+
+@patch("app.services.recognition.recognize_digits")
+def test_idempotency_key_replays_finished_scan(mock_recognize):
+    mock_recognize.return_value = '{"pos1":0,"pos2":2,"pos3":3,"pos4":4,"pos5":0}'
+    jpeg = _make_minimal_jpeg()
+    replays = idempotent_responses.replays
+
+    responses = [
+        client.post(
+            "/recognize",
+            files={"image": ("meter.jpg", io.BytesIO(jpeg), "image/jpeg")},
+            data={"meter_id": _mock_meter_id},
+            headers={"Idempotency-Key": "scan-1"},
+        )
+        for _ in range(2)
+    ]
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].json()["reading_id"] == responses[1].json()["reading_id"]
+    assert mock_recognize.call_count == 1
+    assert idempotent_responses.replays == replays + 1
+
+
+@patch("app.services.recognition.recognize_digits")
+def test_idempotency_key_reused_for_other_scan_is_422(mock_recognize):
+    mock_recognize.return_value = '{"pos1":0,"pos2":2,"pos3":3,"pos4":4,"pos5":0}'
+
+    def scan(jpeg: bytes):
+        return client.post(
+            "/recognize",
+            files={"image": ("meter.jpg", io.BytesIO(jpeg), "image/jpeg")},
+            data={"meter_id": _mock_meter_id},
+            headers={"Idempotency-Key": "scan-2"},
+        )
+
+    assert scan(_make_minimal_jpeg()).status_code == 200
+    replays = idempotent_responses.replays
+    response = scan(_make_minimal_jpeg() + b"\x00")
+
+    assert response.status_code == 422
+    assert "Idempotency-Key" in response.json()["error"]
+    assert mock_recognize.call_count == 1
+    assert idempotent_responses.replays == replays
+
+
+@patch("app.services.recognition.recognize_digits")
+def test_raw_body_recognition(mock_recognize):
+    mock_recognize.return_value = '{"pos1":0,"pos2":2,"pos3":3,"pos4":4,"pos5":0}'
+
+    response = client.post(
+        f"/recognize/raw?meter_id={_mock_meter_id}",
+        content=_make_minimal_jpeg(),
+        headers={"Content-Type": "image/jpeg"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["result"] == "02340"
+
+
+def test_raw_body_rejects_declared_oversize_upload():
+    response = client.post(
+        f"/recognize/raw?meter_id={_mock_meter_id}",
+        content=_make_minimal_jpeg(),
+        headers={"Content-Type": "image/jpeg", "Content-Length": str(50 * 1024 * 1024)},
+    )
+
+    assert response.status_code == 400
+    assert "exceeds maximum" in response.json()["error"]
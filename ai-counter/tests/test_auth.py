@@ -0,0 +1,178 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import bcrypt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+
+from app import auth_cache, dependencies
+from app.auth_cache import Principal
+from app.dependencies import get_current_user, get_db
+from app.main import app
+from app.models.user import User
+from app.services import accounts, auth
+
+
+@pytest.fixture
+def fast_bcrypt(monkeypatch):
+    monkeypatch.setattr(auth, "BCRYPT_ROUNDS", 4)
+
+
+def test_hash_and_verify_in_process_pool(fast_bcrypt):
+    async def run():
+        try:
+            hashed = await auth.hash_password("s3cret")
+            return hashed, await auth.verify_password("s3cret", hashed), await auth.verify_password("nope", hashed)
+        finally:
+            auth.shutdown_hash_executor()
+
+    hashed, ok, wrong = asyncio.run(run())
+    assert hashed.startswith("$2b$04$")
+    assert ok and not wrong
+
+
+def test_needs_rehash_compares_stored_cost(fast_bcrypt):
+    assert auth.needs_rehash(bcrypt.hashpw(b"pw", bcrypt.gensalt(5)).decode())
+    assert not auth.needs_rehash(bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode())
+    assert not auth.needs_rehash("not-a-bcrypt-hash")
+
+
+def test_login_rehashes_password_stored_at_old_cost(fast_bcrypt, monkeypatch):
+    monkeypatch.setattr(auth, "PASSWORD_HASH_EXECUTOR", "thread")
+    monkeypatch.setattr(auth, "_hash_executor", None)
+    user = User(
+        id=uuid.uuid4(),
+        email="old@test.com",
+        name="Old Hash",
+        password_hash=bcrypt.hashpw(b"s3cret", bcrypt.gensalt(5)).decode(),
+    )
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = user
+    session = AsyncMock()
+    session.execute.return_value = result
+
+    async def _get_db():
+        yield session
+
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = _get_db
+    try:
+        response = TestClient(app).post("/auth/login", json={"email": "old@test.com", "password": "s3cret"})
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_db)
+        else:
+            app.dependency_overrides[get_db] = previous
+        auth.shutdown_hash_executor()
+
+    assert response.status_code == 200
+    assert user.password_hash.startswith("$2b$04$")
+    session.commit.assert_awaited_once()
+
+
+class TestProvisioning:
+    def _compiled(self, link_on_email=None):
+        from sqlalchemy.dialects import postgresql
+
+        statement = accounts._provision_statement(link_on_email, email="a@test.com", name="A", google_id="g-1")
+        return str(statement.compile(dialect=postgresql.dialect()))
+
+    def test_user_property_and_meters_in_one_statement(self):
+        sql = self._compiled()
+        assert sql.count("INSERT INTO") == 3
+        assert "new_user AS" in sql and "new_property AS" in sql and "new_meters AS" in sql
+        assert "ON CONFLICT" not in sql
+
+    def test_social_login_links_on_email_conflict(self):
+        assert "ON CONFLICT (email) DO UPDATE SET google_id = excluded.google_id" in self._compiled("google_id")
+
+    def _register(self, session, monkeypatch):
+        monkeypatch.setattr(auth, "PASSWORD_HASH_EXECUTOR", "thread")
+        monkeypatch.setattr(auth, "_hash_executor", None)
+
+        async def _get_db():
+            yield session
+
+        app.dependency_overrides[get_db] = _get_db
+        try:
+            return TestClient(app).post(
+                "/auth/register", json={"email": "new@test.com", "password": "s3cret-pw", "name": "New"}
+            )
+        finally:
+            app.dependency_overrides.pop(get_db)
+            auth.shutdown_hash_executor()
+
+    def test_register_is_one_statement(self, fast_bcrypt, monkeypatch):
+        result = MagicMock()
+        result.one.return_value = SimpleNamespace(id=uuid.uuid4(), email="new@test.com", name="New", created=True)
+        session = AsyncMock()
+        session.execute.return_value = result
+
+        response = self._register(session, monkeypatch)
+
+        assert response.status_code == 201
+        assert response.json()["user"]["email"] == "new@test.com"
+        session.execute.assert_awaited_once()
+        session.commit.assert_awaited_once()
+
+    def test_duplicate_email_is_conflict(self, fast_bcrypt, monkeypatch):
+        session = AsyncMock()
+        session.execute.side_effect = IntegrityError("INSERT", {}, Exception("duplicate key"))
+
+        response = self._register(session, monkeypatch)
+
+        assert response.status_code == 409
+        session.rollback.assert_awaited_once()
+
+
+class TestCurrentUserFastPath:
+    @pytest.fixture(autouse=True)
+    def _clear_caches(self):
+        auth_cache.principals.clear()
+        auth_cache.verified_tokens.clear()
+
+    def _session(self, user_id):
+        result = MagicMock()
+        result.one_or_none.return_value = SimpleNamespace(id=user_id, email="a@test.com", name="A")
+        session = AsyncMock()
+        session.execute.return_value = result
+        return session
+
+    def _current_user(self, token, session):
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        return asyncio.run(get_current_user(credentials, session))
+
+    def test_repeat_requests_skip_query_and_signature_check(self, monkeypatch):
+        user_id = uuid.uuid4()
+        token = auth.create_access_token(str(user_id))
+        session = self._session(user_id)
+        decode = MagicMock(wraps=auth.decode_access_token_claims)
+        monkeypatch.setattr(dependencies, "decode_access_token_claims", decode)
+
+        principals = [self._current_user(token, session) for _ in range(3)]
+
+        assert principals[0] == Principal(id=user_id, email="a@test.com", name="A")
+        assert all(p is principals[0] for p in principals)
+        assert session.execute.await_count == 1
+        assert decode.call_count == 1
+
+    def test_invalidated_user_is_loaded_again(self):
+        user_id = uuid.uuid4()
+        token = auth.create_access_token(str(user_id))
+        session = self._session(user_id)
+
+        self._current_user(token, session)
+        auth_cache.invalidate_user(user_id)
+        self._current_user(token, session)
+
+        assert session.execute.await_count == 2
+
+    def test_invalid_token_is_rejected(self):
+        with pytest.raises(HTTPException) as exc:
+            self._current_user("not-a-jwt", self._session(uuid.uuid4()))
+        assert exc.value.status_code == 401
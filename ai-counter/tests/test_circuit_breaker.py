@@ -0,0 +1,136 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.models.meter import Meter
+from app.recognition_cache import recognition_cache
+from app.services.recognition import BackendUnavailable, RecognitionFailed, recognize_meter_image
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FakeBackend:
+    """Stands in for recognize_digits: fails while down, otherwise answers a reading."""
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    async def __call__(self, image_data, content_type, utility_type, detail, digit_count):
+        self.calls += 1
+        if self.down:
+            raise RuntimeError("upstream 500")
+        return "0" * digit_count
+
+
+def _breaker(clock=None, **kwargs) -> CircuitBreaker:
+    options = {"window_seconds": 60, "min_calls": 4, "failure_rate": 0.5, "slow_call_seconds": 5, "open_seconds": 30}
+    return CircuitBreaker("test", clock=clock or _Clock(), **{**options, **kwargs})
+
+
+class TestCircuitBreaker:
+    def test_opens_on_failure_rate(self):
+        breaker = _breaker()
+        for ok in (True, False, True, False):
+            assert breaker.allow()
+            breaker.record(ok, 0.1)
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        assert breaker.stats()["rejected"] == 1
+
+    def test_needs_min_calls_before_opening(self):
+        breaker = _breaker()
+        for _ in range(3):
+            breaker.record(False, 0.1)
+        assert breaker.state == CLOSED
+
+    def test_opens_on_slow_calls(self):
+        breaker = _breaker()
+        for _ in range(4):
+            breaker.record(True, 6.0)
+        assert breaker.state == OPEN
+
+    def test_old_calls_leave_the_window(self):
+        clock = _Clock()
+        breaker = _breaker(clock)
+        for _ in range(3):
+            breaker.record(False, 0.1)
+        clock.now = 61
+        breaker.record(False, 0.1)
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe_closes_or_reopens(self):
+        clock = _Clock()
+        breaker = _breaker(clock)
+        for _ in range(4):
+            breaker.record(False, 0.1)
+        clock.now = 30
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()  # one probe at a time
+        breaker.record(False, 0.1)
+        assert breaker.state == OPEN
+
+        clock.now = 60
+        assert breaker.allow()
+        breaker.record(True, 0.1)
+        assert breaker.state == CLOSED
+        assert breaker.stats()["transitions"] == {OPEN: 2, HALF_OPEN: 2, CLOSED: 1}
+
+
+class TestRecognitionWithBreaker:
+    @pytest.fixture(autouse=True)
+    def _clear_cache(self):
+        recognition_cache.clear()
+
+    def _recognize(self, backend, breaker, n, local=None):
+        meter = Meter(id=uuid.uuid4(), utility_type="gas", name="Gas")
+        # Distinct bytes per call so the recognition cache never answers
+        image = b"\xff\xd8" + bytes([n])
+        return asyncio.run(recognize_meter_image(image, "image/jpeg", meter, backend, breaker, local))
+
+    def test_open_breaker_fails_fast_without_calling_backend(self):
+        clock = _Clock()
+        backend, breaker = _FakeBackend(), _breaker(clock)
+        backend.down = True
+        for n in range(4):
+            with pytest.raises(RecognitionFailed) as exc:
+                self._recognize(backend, breaker, n)
+            assert exc.value.status_code == 500
+
+        with pytest.raises(BackendUnavailable) as exc:
+            self._recognize(backend, breaker, 4)
+        assert exc.value.status_code == 503
+        assert exc.value.headers == {"Retry-After": "30"}
+        assert backend.calls == 4
+
+        # Backend recovers; the half-open probe closes the breaker
+        backend.down = False
+        clock.now = 30
+        assert self._recognize(backend, breaker, 5) == "00000"
+        assert breaker.state == CLOSED
+
+    def test_local_reads_bypass_the_breaker(self):
+        backend, breaker = _FakeBackend(), _breaker()
+        backend.down = True
+        for n in range(4):
+            with pytest.raises(RecognitionFailed):
+                self._recognize(backend, breaker, n)
+        assert breaker.state == OPEN
+        window = breaker.stats()["window_calls"]
+
+        async def local(image_data, utility_type, digit_count):
+            return "01814"
+
+        assert [self._recognize(backend, breaker, n, local) for n in range(4, 8)] == ["01814"] * 4
+        assert backend.calls == 4
+        assert breaker.stats()["window_calls"] == window
+        assert breaker.stats()["rejected"] == 0
@@ -0,0 +1,87 @@
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.bill import Bill
+from app.models.meter import Meter
+from app.models.reading import Reading
+from app.models.tariff import Tariff
+from app.routers.dashboard import _latest_per_meter
+from tests.conftest import FakeSession
+
+NOW = datetime.now(timezone.utc)
+
+
+def _meters(count: int) -> list[Meter]:
+    property_id = uuid.uuid4()
+    return [
+        Meter(id=uuid.uuid4(), property_id=property_id, utility_type="gas", name=f"Meter {i}", digit_count=5)
+        for i in range(count)
+    ]
+
+
+def test_latest_rows_per_meter_use_one_lateral_query():
+    statement = _latest_per_meter(Reading, "recorded_at", 5, [uuid.uuid4(), uuid.uuid4()])
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "JOIN LATERAL" in sql
+    assert "WHERE readings.meter_id = meters.id ORDER BY readings.recorded_at DESC, readings.id" in sql
+    assert "LIMIT" in sql
+
+
+@pytest.mark.parametrize("meter_count", [3, 50])
+def test_query_count_does_not_grow_with_meters(use_session, meter_count):
+    session = FakeSession(meters=_meters(meter_count))
+    client = use_session(session)
+
+    assert len(client.get("/dashboard").json()["meters"]) == meter_count
+    assert len(session.statements) == 5
+    # The meters themselves come from the ownership cache next time
+    client.get("/dashboard")
+    assert len(session.statements) == 9
+
+
+def test_rows_are_grouped_under_their_meter(use_session):
+    gas, water = _meters(2)
+    readings = [
+        Reading(id=uuid.uuid4(), meter_id=meter.id, value=v, recorded_at=NOW - timedelta(days=v), created_at=NOW)
+        for meter, v in ((gas, 1), (water, 2), (gas, 3))
+    ]
+    tariff = Tariff(
+        id=uuid.uuid4(),
+        meter_id=water.id,
+        price_per_unit=Decimal("1.2500"),
+        currency="EUR",
+        effective_from=date(2026, 1, 1),
+    )
+    bill = Bill(
+        id=uuid.uuid4(),
+        meter_id=gas.id,
+        reading_from_id=readings[2].id,
+        reading_to_id=readings[0].id,
+        tariff_used=Decimal("1.1"),
+        currency="EUR",
+        consumed_units=Decimal("2"),
+        total_cost=Decimal("2.2"),
+        period_start=date(2026, 1, 1),
+        period_end=date(2026, 1, 31),
+    )
+    client = use_session(
+        FakeSession({"readings": readings, "tariffs": [tariff], "bills": [bill]}, meters=[gas, water])
+    )
+
+    body = client.get("/dashboard").json()["meters"]
+
+    assert [m["id"] for m in body] == [str(gas.id), str(water.id)]
+    assert [r["value"] for r in body[0]["readings"]] == [1, 3]
+    assert body[0]["tariff"] is None and body[1]["tariff"]["price_per_unit"] == 1.25
+    assert [b["id"] for b in body[0]["bills"]] == [str(bill.id)] and body[1]["bills"] == []
+
+
+def test_user_without_meters_skips_the_row_queries(use_session):
+    session = FakeSession(meters=[])
+
+    assert use_session(session).get("/dashboard").json() == {"meters": []}
+    assert len(session.statements) == 1
@@ -0,0 +1,87 @@
+import uuid
+
+import pytest
+from starlette.requests import Request
+
+from app.auth_cache import Principal
+from app.etags import make_etag, not_modified
+from tests.conftest import METER, FakeSession
+
+
+def _request(query: str = "", if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    scope = {"type": "http", "method": "GET", "path": "/tariffs", "query_string": query.encode(), "headers": headers}
+    return Request(scope)
+
+
+def test_etag_changes_with_version_and_query():
+    tag = make_etag(_request("meter_id=a"), 1)
+    assert tag.startswith('"') and tag.endswith('"')
+    assert make_etag(_request("meter_id=a"), 1) == tag
+    assert make_etag(_request("meter_id=a"), 2) != tag
+    assert make_etag(_request("meter_id=b"), 1) != tag
+
+
+@pytest.mark.parametrize("header", ['"abc"', '"x", "abc"', 'W/"abc"', "*"])
+def test_if_none_match_hits(header):
+    response = not_modified(_request(if_none_match=header), '"abc"')
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc"'
+
+
+@pytest.mark.parametrize("header", [None, '"abd"', "abc"])
+def test_if_none_match_misses(header):
+    assert not_modified(_request(if_none_match=header), '"abc"') is None
+
+
+def _tariff_queries(session: FakeSession) -> int:
+    return session.count(lambda sql: sql.startswith("SELECT tariffs."))
+
+
+@pytest.fixture
+def session():
+    return FakeSession()
+
+
+@pytest.fixture
+def client(use_session, session):
+    return use_session(session)
+
+
+def test_unchanged_list_is_304_without_list_query(client, session):
+    first = client.get("/tariffs", params={"meter_id": str(METER.id)})
+    etag = first.headers["etag"]
+    assert _tariff_queries(session) == 1
+
+    second = client.get("/tariffs", params={"meter_id": str(METER.id)}, headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert _tariff_queries(session) == 1
+
+
+def test_write_bumps_version_and_invalidates_etag(client, session):
+    etag = client.get("/tariffs", params={"meter_id": str(METER.id)}).headers["etag"]
+
+    created = client.post(
+        "/tariffs", json={"meter_id": str(METER.id), "price_per_unit": 0.3, "effective_from": "2026-10-01"}
+    )
+    assert created.status_code == 201
+    assert session.meter_version == 1
+
+    response = client.get("/tariffs", params={"meter_id": str(METER.id)}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.parametrize("path", ["/meters", "/dashboard"])
+def test_users_at_same_version_get_different_tags(use_session, path):
+    other = Principal(uuid.uuid4(), "other@test.com", "Other")
+    # Neither user has meters yet, so both are at version 0
+    mine = use_session(FakeSession(meters=[])).get(path).headers["etag"]
+
+    theirs = use_session(FakeSession(meters=[]), user=other).get(path, headers={"If-None-Match": mine})
+
+    assert theirs.status_code == 200
+    assert theirs.headers["etag"] != mine
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.services import jwks
+from app.services.jwks import KeySet, verify_identity_token
+
+AUDIENCE = "com.example.app"
+ISSUERS = ("https://issuer.example",)
+
+
+def _rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+class LocalJwks:
+    """Stand-in JWKS endpoint serving the public halves of the given keys."""
+
+    def __init__(self, keys: dict, max_age: int = 300, delay: float = 0.0):
+        self.keys = keys
+        self.max_age = max_age
+        self.delay = delay
+        self.requests = 0
+        self.fail = False
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            return httpx.Response(503)
+        body = {"keys": []}
+        for kid, key in self.keys.items():
+            jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+            body["keys"].append({**jwk, "kid": kid, "alg": "RS256", "use": "sig"})
+        return httpx.Response(200, json=body, headers={"Cache-Control": f"public, max-age={self.max_age}"})
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _token(key, kid, **claims):
+    payload = {"sub": "user-1", "aud": AUDIENCE, "iss": ISSUERS[0], "exp": int(time.time()) + 600, **claims}
+    return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return _rsa_key()
+
+
+def test_verifies_token_against_local_jwks(signing_key):
+    server = LocalJwks({"k1": signing_key})
+
+    async def run():
+        key_set = KeySet("https://jwks.test/keys", http_client=server.client())
+        ok = await verify_identity_token(key_set, _token(signing_key, "k1"), AUDIENCE, ISSUERS)
+        wrong_aud = await verify_identity_token(key_set, _token(signing_key, "k1", aud="other"), AUDIENCE, ISSUERS)
+        wrong_iss = await verify_identity_token(key_set, _token(signing_key, "k1", iss="https://evil"), AUDIENCE, ISSUERS)
+        forged = await verify_identity_token(key_set, _token(_rsa_key(), "k1"), AUDIENCE, ISSUERS)
+        return ok, wrong_aud, wrong_iss, forged
+
+    ok, wrong_aud, wrong_iss, forged = asyncio.run(run())
+    assert ok["sub"] == "user-1"
+    assert wrong_aud is None and wrong_iss is None and forged is None
+    assert server.requests == 1
+
+
+def test_keys_are_cached_for_max_age(signing_key):
+    server = LocalJwks({"k1": signing_key}, max_age=300)
+    clock = Clock()
+
+    async def run():
+        key_set = KeySet("https://jwks.test/keys", http_client=server.client(), clock=clock)
+        first = await key_set.get_key("k1")
+        clock.now += 299
+        second = await key_set.get_key("k1")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert server.requests == 1
+
+
+def test_concurrent_cold_lookups_share_one_fetch(signing_key):
+    server = LocalJwks({"k1": signing_key}, delay=0.05)
+
+    async def run():
+        key_set = KeySet("https://jwks.test/keys", http_client=server.client())
+        return await asyncio.gather(*(key_set.get_key("k1") for _ in range(20)))
+
+    keys = asyncio.run(run())
+    assert all(key is keys[0] for key in keys)
+    assert server.requests == 1
+
+
+def test_stale_keys_serve_while_one_refresh_runs(signing_key):
+    server = LocalJwks({"k1": signing_key}, max_age=60, delay=0.05)
+    clock = Clock()
+
+    async def run():
+        key_set = KeySet("https://jwks.test/keys", http_client=server.client(), clock=clock)
+        await key_set.get_key("k1")
+        clock.now += 120
+        started = time.perf_counter()
+        stale = await asyncio.gather(*(key_set.get_key("k1") for _ in range(10)))
+        elapsed = time.perf_counter() - started
+        await key_set._refresh
+        return stale, elapsed
+
+    stale, elapsed = asyncio.run(run())
+    assert all(key is not None for key in stale)
+    assert elapsed < 0.05
+    assert server.requests == 2
+
+
+def test_failed_background_refresh_keeps_stale_keys(signing_key):
+    server = LocalJwks({"k1": signing_key}, max_age=60)
+    clock = Clock()
+
+    async def run():
+        key_set = KeySet("https://jwks.test/keys", http_client=server.client(), clock=clock)
+        await key_set.get_key("k1")
+        server.fail = True
+        clock.now += 120
+        key = await key_set.get_key("k1")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return key, await key_set.get_key("k1")
+
+    first, second = asyncio.run(run())
+    assert first is not None and second is not None
+
+
+def test_cancelled_caller_does_not_cancel_expired_refresh(signing_key):
+    server = LocalJwks({"k1": signing_key}, max_age=60, delay=0.05)
+    clock = Clock()
+
+    async def run():
+        key_set = KeySet("https://jwks.test/keys", http_client=server.client(), clock=clock)
+        await key_set.get_key("k1")
+        clock.now += 60 + jwks.JWKS_STALE_SECONDS + 1
+        cancelled = asyncio.create_task(key_set.get_key("k1"))
+        waiting = asyncio.create_task(key_set.get_key("k1"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        return await waiting
+
+    assert asyncio.run(run()) is not None
+    assert server.requests == 2
+
+
+def test_unknown_kid_refetches_at_most_once_per_interval(signing_key, monkeypatch):
+    monkeypatch.setattr(jwks, "JWKS_MIN_REFRESH_SECONDS", 60)
+    server = LocalJwks({"k1": signing_key}, max_age=3600)
+    clock = Clock()
+
+    async def run():
+        key_set = KeySet("https://jwks.test/keys", http_client=server.client(), clock=clock)
+        await key_set.get_key("k1")
+        clock.now += 61
+        server.keys["k2"] = _rsa_key()  # provider rotated in a new key
+        rotated = await key_set.get_key("k2")
+        missing = [await key_set.get_key("nope") for _ in range(5)]
+        return rotated, missing
+
+    rotated, missing = asyncio.run(run())
+    assert rotated is not None
+    assert missing == [None] * 5
+    assert server.requests == 2
+
+
+def test_google_auth_rejects_unverifiable_token(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.routers import auth as auth_router
+
+    async def reject(token, client_id):
+        return None
+
+    monkeypatch.setattr(auth_router, "verify_google_token", reject)
+    with TestClient(app) as client:
+        response = client.post("/auth/google", json={"google_id_token": "garbage"})
+    assert response.status_code == 401
@@ -0,0 +1,90 @@
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, timezone
+
+import pytest
+from pydantic import TypeAdapter
+
+from app.responses import rows_response
+from app.schemas.bill import BillResponse
+from app.schemas.meter import MeterResponse
+from app.schemas.reading import ReadingResponse
+from tests.conftest import FakeSession
+
+ReadingRow = namedtuple("ReadingRow", "id meter_id value recorded_at created_at")
+MeterRow = namedtuple("MeterRow", "id property_id utility_type name digit_count")
+JobRow = namedtuple("JobRow", "id status result reading_id error_status error")
+BillRow = namedtuple(
+    "BillRow",
+    "id meter_id reading_from_id reading_to_id tariff_used currency consumed_units total_cost period_start period_end",
+)
+
+
+def _pydantic_body(model, rows) -> bytes:
+    """What FastAPI's response_model path would have sent for the same rows."""
+    adapter = TypeAdapter(list[model])
+    converted = [
+        {k: str(v) if isinstance(v, uuid.UUID) else v for k, v in row._asdict().items()} for row in rows
+    ]
+    return adapter.dump_json(adapter.validate_python(converted))
+
+
+@pytest.mark.parametrize(
+    "model, rows",
+    [
+        (
+            ReadingResponse,
+            [
+                ReadingRow(
+                    uuid.uuid4(),
+                    uuid.uuid4(),
+                    12345,
+                    datetime(2026, 10, 17, 8, 30, 15, 123456, tzinfo=timezone.utc),
+                    datetime(2026, 10, 17, 8, 30, tzinfo=timezone.utc),
+                )
+            ],
+        ),
+        (MeterResponse, [MeterRow(uuid.uuid4(), uuid.uuid4(), "water", "Kitchen ü", 5)]),
+        (
+            BillResponse,
+            [
+                BillRow(
+                    uuid.uuid4(),
+                    uuid.uuid4(),
+                    uuid.uuid4(),
+                    uuid.uuid4(),
+                    1.25,
+                    "EUR",
+                    30.0,
+                    37.5,
+                    date(2026, 9, 1),
+                    date(2026, 9, 30),
+                )
+            ],
+        ),
+    ],
+)
+def test_lean_body_matches_response_model(model, rows):
+    assert rows_response(rows).body == _pydantic_body(model, rows)
+
+
+def test_list_meters_selects_columns_and_skips_validation(use_session):
+    row = MeterRow(uuid.uuid4(), uuid.uuid4(), "gas", "Gas Meter", 5)
+    session = FakeSession(meters=[row])
+
+    response = use_session(session).get("/meters")
+
+    statement = session.executed[-1]
+    assert [c.name for c in statement.selected_columns] == list(MeterResponse.model_fields)
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == _pydantic_body(MeterResponse, [row])
+
+
+def test_job_poll_leaves_the_image_in_the_table(use_session):
+    row = JobRow(uuid.uuid4(), "done", "01814", None, None, None)
+    session = FakeSession({"recognition_jobs": [row]})
+
+    response = use_session(session).get(f"/recognize/jobs/{row.id}")
+
+    assert response.json() == {"job_id": str(row.id), "status": "done", "result": "01814", "reading_id": None}
+    assert "image" not in [c.name for c in session.executed[-1].selected_columns]
@@ -0,0 +1,66 @@
+import asyncio
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image  # noqa: E402
+
+from app import recognizer  # noqa: E402
+from app.local_ocr import LocalReading, recognize_local  # noqa: E402
+from tests.ocr_corpus import generate  # noqa: E402
+
+
+def _served(utility_type: str, n: int = 40, held_out: bool = False) -> tuple[int, int]:
+    """(served, wrong): reads confident enough to skip GPT-4o, and how many of those are wrong."""
+    served = wrong = 0
+    for data, label in generate(n, utility_type, seed=7, held_out=held_out):
+        reading = recognize_local(data, utility_type, len(label))
+        if reading.confidence >= recognizer.LOCAL_OCR_MIN_CONFIDENCE:
+            served += 1
+            wrong += reading.digits != label
+    return served, wrong
+
+
+class TestLocalOcr:
+    # The default corpus is drawn in the engine's own face, so these only guard against regressions
+    def test_drum_face_regression(self):
+        served, wrong = _served("gas")
+        assert served >= 36 and wrong == 0
+
+    def test_seven_segment_face_regression(self):
+        served, wrong = _served("electricity")
+        assert served >= 36 and wrong == 0
+
+    def test_unseen_drum_font_escalates_instead_of_guessing(self):
+        assert _served("gas", n=60, held_out=True)[1] == 0
+
+    def test_slanted_lcd_is_read_and_mostly_right(self):
+        served, wrong = _served("electricity", n=60, held_out=True)
+        assert served >= 30
+        assert wrong / served <= 0.05
+
+    def test_reader_is_not_in_the_recognizer_chain(self):
+        assert recognize_local not in recognizer.LOCAL_RECOGNIZERS
+
+    def test_full_photo_is_not_read_locally(self):
+        buf = io.BytesIO()
+        Image.new("RGB", (1600, 1200), (200, 30, 30)).save(buf, format="JPEG")
+        reading = recognize_local(buf.getvalue(), "gas", 5)
+        assert reading.confidence == 0.0
+
+
+class TestEscalation:
+    def _run(self, reading: LocalReading) -> str | None:
+        with patch.object(recognizer, "LOCAL_RECOGNIZERS", [lambda *args: reading]):
+            return asyncio.run(recognizer.recognize_locally(b"img", "gas"))
+
+    def test_confident_local_read_is_answered(self):
+        raw = self._run(LocalReading("01814", [0.99] * 5, "test"))
+        assert json.loads(raw) == {"pos1": 0, "pos2": 1, "pos3": 8, "pos4": 1, "pos5": 4}
+
+    def test_low_confidence_escalates(self):
+        assert self._run(LocalReading("01814", [0.99, 0.2, 0.99, 0.99, 0.99], "test")) is None
@@ -0,0 +1,77 @@
+import httpx
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from app import openai_compat
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+@pytest.fixture
+def client():
+    return AsyncOpenAI(api_key="x", max_retries=2)
+
+
+def _response(status: int, headers: dict | None = None, **kwargs) -> httpx.Response:
+    response = httpx.Response(status, headers=headers, request=REQUEST, **kwargs)
+    response.read()
+    return response
+
+
+def test_installed_sdk_is_the_verified_release():
+    assert openai.__version__ == openai_compat.VERIFIED_VERSION
+    openai_compat.check()
+
+
+def test_other_releases_are_refused():
+    with pytest.raises(RuntimeError, match="verified against"):
+        openai_compat.check("1.60.0")
+
+
+@pytest.mark.parametrize(
+    "status, headers, retried",
+    [
+        (408, None, True),
+        (409, None, True),
+        (429, None, True),
+        (500, None, True),
+        (503, None, True),
+        (400, None, False),
+        (401, None, False),
+        (503, {"x-should-retry": "false"}, False),
+        (400, {"x-should-retry": "true"}, True),
+    ],
+)
+def test_should_retry(client, status, headers, retried):
+    assert openai_compat.should_retry(client, _response(status, headers)) is retried
+
+
+def test_retry_delay_honours_retry_after(client):
+    assert openai_compat.retry_delay(client, 2, httpx.Headers({"retry-after": "3"})) == 3.0
+    assert openai_compat.retry_delay(client, 2, httpx.Headers({"retry-after-ms": "1500"})) == 1.5
+
+
+def test_retry_delay_backs_off_exponentially(client):
+    first = openai_compat.retry_delay(client, 2, None)
+    second = openai_compat.retry_delay(client, 1, None)
+    assert 0.375 <= first <= 0.5
+    assert 0.75 <= second <= 1.0
+
+
+@pytest.mark.parametrize(
+    "status, error",
+    [
+        (400, openai.BadRequestError),
+        (401, openai.AuthenticationError),
+        (429, openai.RateLimitError),
+        (503, openai.InternalServerError),
+    ],
+)
+def test_status_error_is_typed(client, status, error):
+    body = {"error": {"message": "nope", "type": "test"}}
+    raised = openai_compat.status_error(client, _response(status, json=body))
+    assert type(raised) is error
+    assert raised.status_code == status
+    assert raised.body == body["error"]
+    assert raised.message == f"Error code: {status} - {body}"
@@ -0,0 +1,74 @@
+import uuid
+
+import pytest
+
+from app.models.meter import Meter
+from app.services import ownership
+from tests.conftest import METER, USER, FakeSession
+
+
+@pytest.fixture
+def session():
+    return FakeSession()
+
+
+@pytest.fixture
+def client(use_session, session):
+    return use_session(session)
+
+
+ENDPOINTS = {
+    "list readings": lambda c: c.get("/readings", params={"meter_id": str(METER.id)}),
+    "create reading": lambda c: c.post("/readings", data={"meter_id": str(METER.id), "value": 123}),
+    "list bills": lambda c: c.get("/bills", params={"meter_id": str(METER.id)}),
+    "list tariffs": lambda c: c.get("/tariffs", params={"meter_id": str(METER.id)}),
+    "create tariff": lambda c: c.post(
+        "/tariffs", json={"meter_id": str(METER.id), "price_per_unit": 1.5, "effective_from": "2026-01-01"}
+    ),
+}
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_repeat_request_skips_ownership_query(client, session, endpoint):
+    first = ENDPOINTS[endpoint](client)
+    first_statements = len(session.statements)
+    assert first.status_code < 400, first.text
+    assert session.ownership_queries() == 1
+
+    second = ENDPOINTS[endpoint](client)
+    assert second.status_code == first.status_code
+    assert len(session.statements) - first_statements == first_statements - 1
+    assert session.ownership_queries() == 1
+
+
+def test_unknown_meter_reloads_once_then_404(client, session):
+    client.get("/tariffs", params={"meter_id": str(METER.id)})
+
+    response = client.get("/tariffs", params={"meter_id": str(uuid.uuid4())})
+
+    assert response.status_code == 404
+    assert session.ownership_queries() == 2
+
+
+def test_meter_from_another_worker_is_found(client, session):
+    client.get("/tariffs", params={"meter_id": str(METER.id)})
+    added = Meter(id=uuid.uuid4(), property_id=METER.property_id, utility_type="gas", name="Gas Meter")
+    session.tables["meters"].append(added)
+
+    assert client.get("/tariffs", params={"meter_id": str(added.id)}).status_code == 200
+
+
+def test_invalid_meter_id_is_400_without_query(client, session):
+    response = client.get("/bills", params={"meter_id": "not-a-uuid"})
+
+    assert response.status_code == 400
+    assert session.statements == []
+
+
+def test_account_deletion_forgets_meters(client, session):
+    client.get("/readings", params={"meter_id": str(METER.id)})
+    assert ownership.owned_meters.get(USER.id) is not None
+
+    client.delete("/auth/account")
+
+    assert ownership.owned_meters.get(USER.id) is None
@@ -0,0 +1,71 @@
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models.reading import Reading
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, paginate
+from tests.conftest import METER, FakeSession
+
+# list_readings selects columns, so its rows are tuples rather than Reading objects
+ReadingRow = namedtuple("ReadingRow", "id meter_id value recorded_at created_at")
+
+
+def test_cursor_round_trip():
+    row_id = uuid.uuid4()
+    recorded_at = datetime(2026, 10, 17, 8, 30, 15, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(recorded_at, row_id), datetime) == (recorded_at, row_id)
+    assert decode_cursor(encode_cursor(date(2026, 9, 30), row_id), date) == (date(2026, 9, 30), row_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bnVsbA", encode_cursor(date.today(), uuid.uuid4())[:-4]])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, datetime)
+    assert exc.value.status_code == 400
+
+
+def test_cursor_page_seeks_past_last_row_in_index_order():
+    cursor = encode_cursor(datetime.now(timezone.utc), uuid.uuid4())
+    query = select(Reading).where(Reading.meter_id == METER.id)
+    statement = paginate(query, Reading.recorded_at, Reading.id, 50, 0, cursor)
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "readings.recorded_at < " in sql and "readings.id > " in sql
+    assert "ORDER BY readings.recorded_at DESC, readings.id" in sql
+    assert "OFFSET" not in sql
+
+
+def test_cursor_and_offset_together_is_400():
+    with pytest.raises(HTTPException):
+        paginate(select(Reading), Reading.recorded_at, Reading.id, 50, 10, encode_cursor(date.today(), uuid.uuid4()))
+
+
+@pytest.fixture
+def readings_client(use_session):
+    now = datetime.now(timezone.utc)
+    rows = [
+        ReadingRow(id=uuid.uuid4(), meter_id=METER.id, value=i, recorded_at=now - timedelta(hours=i), created_at=now)
+        for i in range(3)
+    ]
+    return use_session(FakeSession({"readings": rows})), rows
+
+
+def test_list_readings_returns_next_cursor_when_more_rows(readings_client):
+    client, rows = readings_client
+    response = client.get("/readings", params={"meter_id": str(METER.id), "limit": 2})
+
+    assert response.status_code == 200
+    assert [r["value"] for r in response.json()] == [0, 1]
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER], datetime) == (rows[1].recorded_at, rows[1].id)
+
+
+def test_last_page_has_no_next_cursor(readings_client):
+    client, _ = readings_client
+    response = client.get("/readings", params={"meter_id": str(METER.id), "limit": 3})
+
+    assert len(response.json()) == 3
+    assert NEXT_CURSOR_HEADER not in response.headers
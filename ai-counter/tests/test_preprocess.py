@@ -0,0 +1,102 @@
+import asyncio
+import io
+
+import pytest
+
+from app import preprocess as preprocess_module
+from app.preprocess import UnsupportedImage, choose_detail, count_tiles, preprocess_image, target_size
+from app.validation import get_image_dimensions
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _make_photo(width: int, height: int, orientation: int | None = None) -> bytes:
+    img = Image.new("RGB", (width, height), (200, 30, 30))
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=95, exif=exif)
+    return buf.getvalue()
+
+
+class TestTileMath:
+    def test_phone_photo_bills_four_tiles(self):
+        assert count_tiles(4032, 3024) == 4
+
+    def test_target_size_matches_model_rescale(self):
+        assert target_size(4032, 3024, "high") == (1024, 768)
+
+    def test_target_size_respects_tile_budget(self):
+        width, height = target_size(4032, 3024, "high", max_tiles=2)
+        assert count_tiles(width, height) <= 2
+
+    def test_small_frames_use_low_detail(self):
+        assert choose_detail((480, 320)) == "low"
+        assert choose_detail((1024, 768)) == "high"
+        assert choose_detail(None) == "high"
+
+
+class TestPreprocessImage:
+    def test_downscales_large_photo(self):
+        data = _make_photo(4032, 3024)
+        processed, detail = preprocess_image(data, "gas")
+        assert detail == "high"
+        assert len(processed) < len(data)
+        with Image.open(io.BytesIO(processed)) as img:
+            assert img.size == (1024, 768)
+            assert img.mode == "RGB"
+
+    def test_exif_rotation_and_grayscale_for_lcd(self):
+        data = _make_photo(1600, 1200, orientation=6)
+        processed, _ = preprocess_image(data, "electricity")
+        with Image.open(io.BytesIO(processed)) as img:
+            assert img.width < img.height
+            assert img.mode == "L"
+
+    def test_undecodable_image_is_passed_through(self):
+        data = b"\xff\xd8\xff\xd9"
+        assert preprocess_image(data, "gas") == (data, "high")
+
+
+def _make_heic(width: int, height: int) -> bytes:
+    pillow_heif = pytest.importorskip("pillow_heif")
+    pillow_heif.register_heif_opener()
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buf, format="HEIF", quality=50)
+    return buf.getvalue()
+
+
+class TestHeif:
+    def test_dimensions_from_container(self):
+        assert get_image_dimensions(_make_heic(1280, 960), "") == (1280, 960)
+
+    def test_transcodes_to_jpeg(self):
+        processed, detail = preprocess_image(_make_heic(2048, 1536), "gas")
+        with Image.open(io.BytesIO(processed)) as img:
+            assert img.format == "JPEG"
+            assert img.size == (1024, 768)
+        assert detail == "high"
+
+    def test_transcode_runs_once_per_upload(self, monkeypatch):
+        data = _make_heic(640, 480)
+        calls = []
+
+        async def fake_run_in_process(func, *args):
+            calls.append(args)
+            return func(*args)
+
+        monkeypatch.setattr(preprocess_module, "run_in_process", fake_run_in_process)
+        monkeypatch.setattr(preprocess_module, "_transcoded", preprocess_module.OrderedDict())
+
+        async def run():
+            return [await preprocess_module.preprocess(data, "gas") for _ in range(2)]
+
+        first, second = asyncio.run(run())
+        assert first == second
+        assert len(calls) == 1
+
+    def test_undecodable_heic_is_rejected(self):
+        broken = _make_heic(640, 480)[:200]
+        with pytest.raises(UnsupportedImage):
+            preprocess_image(broken, "gas")
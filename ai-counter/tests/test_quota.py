@@ -0,0 +1,180 @@
+import asyncio
+import io
+import os
+import struct
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from app import single_flight
+from app.main import app
+from app.recognition_cache import recognition_cache
+from app.services import quota
+from tests.conftest import METER, FakeSession
+
+
+class QuotaSession(FakeSession):
+    """Adds the scan_quotas table; each statement applies atomically, as in Postgres."""
+
+    def __init__(self):
+        super().__init__()
+        self.used: dict[tuple, int] = {}
+        self.refund_delay = 0.0
+
+    async def execute(self, statement, params=None):
+        if statement is quota._RESERVE:
+            result = MagicMock()
+            key = (params["user_id"], params["day"])
+            used = self.used.get(key, 0)
+            granted = used + params["count"] <= params["limit"]
+            if granted:
+                used = self.used[key] = used + params["count"]
+            result.one_or_none.return_value = SimpleNamespace(granted=granted, used=used)
+        elif statement is quota._REFUND:
+            await asyncio.sleep(self.refund_delay)
+            result = MagicMock()
+            key = (params["user_id"], params["day"])
+            self.used[key] = max(0, self.used.get(key, 0) - params["count"])
+        else:
+            result = await super().execute(statement, params)
+        # Let other requests interleave between statements, as over a network
+        await asyncio.sleep(0)
+        return result
+
+
+def _jpeg(width: int) -> bytes:
+    return (
+        b"\xFF\xD8\xFF\xC0" + struct.pack(">HBHHB", 11, 8, 600, width, 1) + b"\x01\x11\x00\xFF\xD9"
+    )
+
+
+@pytest.fixture
+def store(use_session, monkeypatch):
+    store = QuotaSession()
+    use_session(store)
+    monkeypatch.setattr(quota, "DAILY_SCAN_LIMIT", 5)
+    recognition_cache.clear()
+    return store
+
+
+async def _scan(client: httpx.AsyncClient, width: int) -> httpx.Response:
+    return await client.post(
+        "/recognize",
+        files={"image": ("meter.jpg", io.BytesIO(_jpeg(width)), "image/jpeg")},
+        data={"meter_id": str(METER.id)},
+    )
+
+
+def _scans(widths) -> list[httpx.Response]:
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(_scan(client, w) for w in widths))
+
+    return asyncio.run(run())
+
+
+@patch("app.services.recognition.recognize_digits")
+def test_limit_holds_under_100_parallel_scans(mock_recognize, store):
+    async def slow_recognition(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return '{"pos1":0,"pos2":2,"pos3":3,"pos4":4,"pos5":0}'
+
+    mock_recognize.side_effect = slow_recognition
+
+    responses = _scans(range(800, 900))
+
+    codes = [r.status_code for r in responses]
+    assert codes.count(200) == 5
+    assert codes.count(429) == 95
+    assert all(r.json()["daily_limit"] == 5 for r in responses if r.status_code == 429)
+    assert mock_recognize.call_count == 5
+    assert list(store.used.values()) == [5]
+
+
+@patch("app.services.recognition.recognize_digits")
+def test_each_flight_is_charged_once(mock_recognize, store, monkeypatch):
+    async def recognition(*args, **kwargs):
+        await asyncio.sleep(0.02)
+        return '{"pos1":0,"pos2":2,"pos3":3,"pos4":4,"pos5":0}'
+
+    mock_recognize.side_effect = recognition
+    monkeypatch.setattr(quota, "DAILY_SCAN_LIMIT", 100)
+    # Followers are still refunding when the flight they joined finishes
+    store.refund_delay = 0.05
+    leaders = single_flight.recognitions.leaders
+
+    responses = _scans([800] * 20)
+
+    assert all(r.status_code == 200 for r in responses)
+    assert list(store.used.values()) == [single_flight.recognitions.leaders - leaders]
+
+
+@patch("app.services.recognition.recognize_digits")
+def test_unreadable_scan_is_refunded(mock_recognize, store):
+    mock_recognize.return_value = "0234"
+
+    assert [r.status_code for r in _scans([800, 801])] == [422, 422]
+    assert list(store.used.values()) == [0]
+
+
+def test_invalid_upload_is_refunded(store):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/recognize",
+                files={"image": ("meter.gif", io.BytesIO(b"GIF89a" + b"\x00" * 100), "image/gif")},
+                data={"meter_id": str(METER.id)},
+            )
+
+    assert asyncio.run(run()).status_code == 400
+    assert list(store.used.values()) == [0]
+
+
+@patch("app.services.recognition.recognize_digits")
+@patch("app.services.recognition.TIMEOUT_SECONDS", 0.01)
+def test_timed_out_scan_is_refunded(mock_recognize, store):
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    mock_recognize.side_effect = hang
+
+    assert [r.status_code for r in _scans([800])] == [408]
+    assert list(store.used.values()) == [0]
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_DATABASE_URL"), reason="needs a migrated Postgres in TEST_DATABASE_URL")
+def test_reserve_is_atomic_in_postgres():
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async def run():
+        engine = create_async_engine(os.environ["TEST_DATABASE_URL"], pool_size=20, max_overflow=80)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        user_id = uuid.uuid4()
+        async with sessions() as db:
+            await db.execute(
+                text("INSERT INTO users (id, email, name) VALUES (:id, :email, 'Quota')"),
+                {"id": user_id, "email": f"{user_id}@quota.test"},
+            )
+            await db.commit()
+
+        async def one():
+            async with sessions() as db:
+                reservation, _ = await quota.reserve(db, user_id, limit=5)
+                return reservation is not None
+
+        try:
+            granted = await asyncio.gather(*(one() for _ in range(100)))
+        finally:
+            async with sessions() as db:
+                await db.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+                await db.commit()
+            await engine.dispose()
+        return granted
+
+    assert sum(asyncio.run(run())) == 5
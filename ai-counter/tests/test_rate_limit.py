@@ -0,0 +1,164 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from app.main import _rate_limit_handler
+from app.rate_limit import MemoryBackend, RateLimiter, RateLimitExceeded, TokenBuckets, parse_rate
+from app.services.auth import create_access_token
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SharedStandIn(MemoryBackend):
+    """Stand-in for the Postgres backend: one bucket store behind several workers."""
+
+    shared = True
+
+    def __init__(self, clock=None):
+        super().__init__()
+        if clock is not None:
+            self.buckets = TokenBuckets(clock=clock)
+        self.calls = 0
+        self.down = False
+
+    async def take(self, key, capacity, refill, count=1):
+        self.calls += 1
+        if self.down:
+            raise OperationalError("SELECT", {}, Exception("connection refused"))
+        return await super().take(key, capacity, refill, count)
+
+
+def _allowed(limiter, key, capacity=3, refill=1.0):
+    try:
+        asyncio.run(limiter.check(key, capacity, refill))
+        return True
+    except RateLimitExceeded:
+        return False
+
+
+def test_parse_rate():
+    assert parse_rate("10/minute") == (10, 10 / 60)
+    assert parse_rate("3/hours") == (3, 3 / 3600)
+
+
+def test_token_bucket_refills_and_reports_retry_after():
+    clock = Clock()
+    buckets = TokenBuckets(clock=clock)
+    assert [buckets.take("k", 2, 0.5)[0] for _ in range(3)] == [True, True, False]
+    assert buckets.take("k", 2, 0.5) == (False, 2.0)
+    clock.now = 2.0
+    assert buckets.take("k", 2, 0.5)[0]
+
+
+def test_limit_holds_across_workers_sharing_a_backend():
+    backend = SharedStandIn()
+    workers = [RateLimiter(backend, enabled=True) for _ in range(3)]
+    results = [_allowed(workers[i % 3], "user:1", capacity=3, refill=1e-6) for i in range(9)]
+    assert results.count(True) == 3
+
+
+def test_burst_is_granted_from_leases():
+    backend = SharedStandIn()
+    limiter = RateLimiter(backend, enabled=True)
+    assert all(_allowed(limiter, "user:1", capacity=100, refill=1e-6) for _ in range(50))
+    # Leases of 10 tokens: one round trip per ten requests
+    assert backend.calls == 5
+    assert limiter.stats()["lease_grants"] == 45
+
+
+def test_leases_shrink_near_the_limit_and_never_exceed_it():
+    backend = SharedStandIn()
+    workers = [RateLimiter(backend, enabled=True) for _ in range(3)]
+    results = [_allowed(workers[i % 3], "user:1", capacity=100, refill=1e-6) for i in range(300)]
+    assert results.count(True) == 100
+    assert backend.calls <= 15
+
+
+def test_leases_expire_while_the_shared_bucket_refills():
+    clock = Clock()
+    backend = SharedStandIn(clock)
+    workers = [RateLimiter(backend, enabled=True, clock=clock) for _ in range(4)]
+    refill = 60 / 60
+    assert all(_allowed(worker, "user:1", capacity=60, refill=refill) for worker in workers)
+    # An hour idle refills the shared bucket; leftover leases must not add to it
+    clock.now = 3600.0
+    results = [_allowed(workers[i % 4], "user:1", capacity=60, refill=refill) for i in range(400)]
+    assert results.count(True) == 60
+
+
+def test_small_buckets_are_not_leased():
+    backend = SharedStandIn()
+    limiter = RateLimiter(backend, enabled=True)
+    assert all(_allowed(limiter, "ip:1", capacity=4, refill=1e-6) for _ in range(4))
+    assert backend.calls == 4
+
+
+def test_over_limit_client_is_rejected_without_backend_calls():
+    backend = SharedStandIn()
+    limiter = RateLimiter(backend, enabled=True)
+    results = [_allowed(limiter, "ip:1", capacity=3, refill=1e-6) for _ in range(20)]
+    assert results.count(True) == 3
+    assert backend.calls == 3
+    assert limiter.stats()["local_rejections"] == 17
+
+
+def test_shared_rejection_is_cached_locally():
+    backend = SharedStandIn()
+    other_worker = RateLimiter(backend, enabled=True)
+    for _ in range(3):
+        assert _allowed(other_worker, "ip:1", refill=1e-3)
+    limiter = RateLimiter(backend, enabled=True)
+    assert not _allowed(limiter, "ip:1", refill=1e-3)
+    calls = backend.calls
+    assert not any(_allowed(limiter, "ip:1", refill=1e-3) for _ in range(10))
+    assert backend.calls == calls
+
+
+def test_backend_outage_falls_back_to_local_limit():
+    backend = SharedStandIn()
+    backend.down = True
+    limiter = RateLimiter(backend, enabled=True)
+    results = [_allowed(limiter, "ip:1", capacity=3, refill=1e-6) for _ in range(5)]
+    assert results == [True, True, True, False, False]
+    assert limiter.stats()["backend_errors"] == 3
+
+
+@pytest.fixture
+def limited_app():
+    limiter = RateLimiter(MemoryBackend(), enabled=True)
+    app = FastAPI()
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_handler)
+
+    @app.get("/ping", dependencies=[Depends(limiter.limit("2/minute"))])
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def test_route_returns_429_with_retry_after(limited_app):
+    client = TestClient(limited_app)
+    assert [client.get("/ping").status_code for _ in range(3)] == [200, 200, 429]
+    response = client.get("/ping")
+    assert response.json() == {"detail": "Too many requests. Please try again later."}
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+
+
+def test_authenticated_clients_get_their_own_bucket(limited_app):
+    client = TestClient(limited_app)
+    tokens = [create_access_token(str(uuid.uuid4())) for _ in range(2)]
+    for token in tokens:
+        headers = {"Authorization": f"Bearer {token}"}
+        assert [client.get("/ping", headers=headers).status_code for _ in range(3)] == [200, 200, 429]
+    # An invalid token falls back to the remote address
+    assert client.get("/ping", headers={"Authorization": "Bearer nope"}).status_code == 200
@@ -0,0 +1,89 @@
+import asyncio
+import io
+import uuid
+
+import pytest
+
+from app import recognition_cache
+from app.models.recognition_cache import RecognitionCacheEntry
+from app.recognition_cache import Fingerprint, RecognitionCache
+
+PIL = pytest.importorskip("PIL.Image")
+
+METER_ID = uuid.uuid4()
+
+
+def _make_jpeg(quality: int = 90, crop: int = 0) -> bytes:
+    img = PIL.new("L", (320, 120), 255)
+    for i, x in enumerate(range(20, 300, 60)):
+        img.paste(40 * i, (x, 30, x + 40, 90))
+    if crop:
+        img = img.crop((crop, crop, 320 - crop, 120 - crop))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def _roundtrip(cache: RecognitionCache, stored: bytes, looked_up: bytes, other_meter: bool = False) -> str | None:
+    async def run():
+        fp = await cache.fingerprint(stored)
+        await cache.put(fp, METER_ID, "gas", 5, "01814")
+        return await cache.get(await cache.fingerprint(looked_up), uuid.uuid4() if other_meter else METER_ID, "gas", 5)
+
+    return asyncio.run(run())
+
+
+class TestRecognitionCache:
+    def test_exact_hit_and_miss(self):
+        cache = RecognitionCache(use_db=False)
+        assert _roundtrip(cache, b"image-a", b"image-a") == "01814"
+        assert _roundtrip(cache, b"image-a", b"image-b") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_key_includes_meter_shape(self):
+        cache = RecognitionCache(use_db=False)
+
+        async def run():
+            fp = await cache.fingerprint(b"image-a")
+            await cache.put(fp, METER_ID, "gas", 5, "01814")
+            return await cache.get(fp, METER_ID, "electricity", 6)
+
+        assert asyncio.run(run()) is None
+
+    def test_longest_key_fits_the_column(self, monkeypatch):
+        columns = RecognitionCacheEntry.__table__.c
+        monkeypatch.setattr(recognition_cache, "PROMPT_VERSION", "v" * columns.prompt_version.type.length)
+        key = RecognitionCache._key(
+            Fingerprint("f" * 64), uuid.uuid4(), "u" * columns.utility_type.type.length, -(2**31)
+        )
+        assert len(key) <= columns.key.type.length
+
+    def test_lru_eviction(self):
+        cache = RecognitionCache(maxsize=2, use_db=False)
+
+        async def run():
+            for data in (b"a", b"b", b"c"):
+                await cache.put(await cache.fingerprint(data), METER_ID, "gas", 5, "00000")
+            return await cache.get(await cache.fingerprint(b"a"), METER_ID, "gas", 5)
+
+        assert asyncio.run(run()) is None
+        assert cache.stats()["evictions"] == 1
+
+    def test_expired_entries_miss(self):
+        cache = RecognitionCache(ttl=-1, use_db=False)
+        assert _roundtrip(cache, b"image-a", b"image-a") is None
+
+    def test_perceptual_mode_matches_reencoded_copy(self):
+        cache = RecognitionCache(use_db=False, perceptual=True)
+        assert _roundtrip(cache, _make_jpeg(quality=90), _make_jpeg(quality=40, crop=2)) == "01814"
+
+    def test_exact_mode_misses_reencoded_copy(self):
+        cache = RecognitionCache(use_db=False)
+        assert _roundtrip(cache, _make_jpeg(quality=90), _make_jpeg(quality=40)) is None
+
+    def test_near_duplicates_on_other_meters_do_not_share(self):
+        cache = RecognitionCache(use_db=False, perceptual=True)
+        stored, looked_up = _make_jpeg(quality=90), _make_jpeg(quality=40, crop=2)
+        assert _roundtrip(cache, stored, looked_up, other_meter=True) is None
+        assert _roundtrip(cache, stored, stored, other_meter=True) is None
@@ -1,3 +1,14 @@
+import asyncio
+import base64
+import json
+import os
+import tracemalloc
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+from app import recognizer
 from app.validation import normalize_digits, validate_digit_count
 
 
@@ -39,3 +50,196 @@ class TestValidateDigitCount:
 
     def test_one_digit(self):
         assert validate_digit_count("5") is False
+
+
+class TestSharedClient:
+    def test_client_is_reused_until_closed(self):
+        first = recognizer.init_client()
+        assert recognizer.init_client() is first
+
+        asyncio.run(recognizer.close_client())
+        assert recognizer._client is None
+
+
+class _FakeStream:
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.read = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read == len(self.deltas):
+            raise StopAsyncIteration
+        delta = self.deltas[self.read]
+        self.read += 1
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+    async def close(self):
+        self.closed = True
+
+
+class TestStructuredMode:
+    def test_request_uses_schema_sized_to_digit_count(self):
+        request = recognizer._build_request(b"\xff\xd8", "electricity", "high", 6, "structured")
+        schema = request["response_format"]["json_schema"]["schema"]
+        assert schema["required"] == [f"pos{i}" for i in range(1, 7)]
+        assert request["max_tokens"] == recognizer.STRUCTURED_MAX_TOKENS
+        assert "Step 1" not in request["messages"][0]["content"]
+
+    def test_cot_request_is_unchanged(self):
+        request = recognizer._build_request(b"\xff\xd8", "gas", "high", 5, "cot")
+        assert "response_format" not in request
+        assert request["messages"][0]["content"] == recognizer.GAS_SYSTEM_PROMPT
+
+    def test_stream_stops_when_json_closes(self):
+        stream = _FakeStream(['{"pos1": 0, ', '"pos2": 1}', " trailing", " tokens"])
+        raw, chunks = asyncio.run(recognizer._read_stream(stream))
+        assert raw == '{"pos1": 0, "pos2": 1}'
+        assert chunks == 2
+        assert stream.closed
+
+
+class TestHedging:
+    def _setup(self, monkeypatch, replies):
+        """replies: list of (delay_seconds, raw_text) served to successive calls."""
+        calls = {"started": 0, "cancelled": 0}
+
+        async def fake_call(request, image_data, stream):
+            delay, raw = replies[calls["started"]]
+            calls["started"] += 1
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                calls["cancelled"] += 1
+                raise
+            return raw
+
+        monkeypatch.setattr(recognizer, "_vision_call", fake_call)
+        monkeypatch.setattr(recognizer, "_latencies", recognizer.deque([0.01] * 50, maxlen=200))
+        monkeypatch.setattr(recognizer, "HEDGE_MAX_RATIO", 1.0)
+        monkeypatch.setattr(recognizer, "_stats", {**recognizer._stats, "vision_calls": 1, "hedges": 0, "hedge_wins": 0})
+        return calls
+
+    def _recognize(self):
+        return asyncio.run(recognizer._recognize_with_vision(b"\xff\xd8", "gas", "high", 5, hedge=True))
+
+    def test_fast_call_does_not_hedge(self, monkeypatch):
+        calls = self._setup(monkeypatch, [(0, "12345")])
+        assert self._recognize() == "12345"
+        assert calls["started"] == 1
+
+    def test_slow_call_is_hedged_and_loser_cancelled(self, monkeypatch):
+        calls = self._setup(monkeypatch, [(5, "11111"), (0, "22222")])
+        assert self._recognize() == "22222"
+        assert calls == {"started": 2, "cancelled": 1}
+        assert recognizer._stats["hedge_wins"] == 1
+
+    def test_invalid_reply_waits_for_the_other(self, monkeypatch):
+        calls = self._setup(monkeypatch, [(0.05, "11111"), (0, "unreadable")])
+        assert self._recognize() == "11111"
+        assert calls["started"] == 2
+
+    def test_hedges_are_capped_by_ratio(self, monkeypatch):
+        calls = self._setup(monkeypatch, [(0.05, "11111"), (0, "22222")])
+        monkeypatch.setattr(recognizer, "HEDGE_MAX_RATIO", 0.0)
+        assert self._recognize() == "11111"
+        assert calls["started"] == 1
+
+
+class TestStreamedRequestBody:
+    def test_body_matches_inline_base64_request(self):
+        image = bytes(range(256)) * 1000 + b"\x01"
+        request = recognizer._build_request(image, "gas", "high", 5, "cot")
+        length, chunks = recognizer._request_body(request, image)
+
+        async def collect():
+            return b"".join([chunk async for chunk in chunks])
+
+        body = asyncio.run(collect())
+        assert len(body) == length
+        sent = json.loads(body)
+        url = sent["messages"][1]["content"][1]["image_url"]["url"]
+        assert url == "data:image/jpeg;base64," + base64.b64encode(image).decode()
+
+    def test_scan_allocations_stay_within_budget(self, monkeypatch):
+        image = b"\xff\xd8" + os.urandom(8 * 1024 * 1024)
+        received = 0
+
+        class DrainingTransport(httpx.AsyncBaseTransport):
+            # httpx.MockTransport buffers the whole request body, which would defeat the test
+            async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+                nonlocal received
+                async for chunk in request.stream:
+                    received += len(chunk)
+                return httpx.Response(200, json={"choices": [{"message": {"content": "01234"}}]})
+
+        async def scan():
+            recognizer.init_client()
+            monkeypatch.setattr(recognizer, "_http_client", httpx.AsyncClient(transport=DrainingTransport()))
+            tracemalloc.start()
+            try:
+                raw = await recognizer._recognize_with_vision(image, "gas", "high", 5, mode="cot", stream=False)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+                await recognizer._http_client.aclose()
+                await recognizer.close_client()
+            return raw, peak
+
+        raw, peak = asyncio.run(scan())
+        assert raw == "01234"
+        assert received > len(image) * 4 // 3
+        # Inline base64 + data URL + JSON would allocate ~4x the image; streaming stays at chunk size
+        assert peak < 1024 * 1024
+
+
+class TestCompletionErrors:
+    def _post(self, monkeypatch, handler):
+        calls = []
+
+        async def transport(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return handler(len(calls))
+
+        async def post():
+            client = recognizer.init_client()
+            monkeypatch.setattr(recognizer, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(transport)))
+            monkeypatch.setattr(recognizer.openai_compat, "retry_delay", lambda *args: 0)
+            request = recognizer._build_request(b"\xff\xd8image", "gas", "high", 5, "cot")
+            try:
+                return await recognizer._post_completion(request, b"\xff\xd8image", stream=False)
+            finally:
+                await recognizer._http_client.aclose()
+                await recognizer.close_client()
+
+        try:
+            return asyncio.run(post()), calls
+        except Exception as e:
+            return e, calls
+
+    def test_server_errors_are_retried(self, monkeypatch):
+        ok = httpx.Response(200, json={"choices": [{"message": {"content": "01234"}}]})
+        result, calls = self._post(monkeypatch, lambda n: httpx.Response(503) if n == 1 else ok)
+        assert result == ("01234", 0)
+        assert len(calls) == 2
+
+    def test_rate_limit_raises_sdk_error_after_retries(self, monkeypatch):
+        error, calls = self._post(monkeypatch, lambda n: httpx.Response(429, json={"error": {"message": "slow down"}}))
+        assert isinstance(error, openai.RateLimitError)
+        assert len(calls) == 3
+
+    def test_client_error_is_not_retried(self, monkeypatch):
+        error, calls = self._post(monkeypatch, lambda n: httpx.Response(400, json={"error": {"message": "bad"}}))
+        assert isinstance(error, openai.BadRequestError)
+        assert len(calls) == 1
+
+    def test_connection_error_maps_to_sdk_error(self, monkeypatch):
+        def refuse(n):
+            raise httpx.ConnectError("connection refused")
+
+        error, calls = self._post(monkeypatch, refuse)
+        assert isinstance(error, openai.APIConnectionError)
+        assert len(calls) == 3
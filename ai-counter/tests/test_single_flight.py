@@ -0,0 +1,84 @@
+import asyncio
+
+from app.single_flight import IdempotencyStore, SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"reading_id": "r1"}
+
+    async def run():
+        return await asyncio.gather(*(flight.run("scan", work) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(r == {"reading_id": "r1"} for r in results)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_join_reports_the_one_leader():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def run():
+        joined = [flight.join("scan", work) for _ in range(3)]
+        assert [led for _, led in joined] == [True, False, False]
+        assert len({task for task, _ in joined}) == 1
+        return await joined[0][0]
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_finished_flight_runs_again():
+    flight = SingleFlight()
+
+    async def work():
+        return 1
+
+    async def run():
+        await flight.run("scan", work)
+        await flight.run("scan", work)
+
+    asyncio.run(run())
+    assert flight.leaders == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        leader = asyncio.create_task(flight.run("scan", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.run("scan", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_idempotency_store_expires_entries():
+    store = IdempotencyStore(ttl=0)
+    store.put("k", (200, {}, None))
+    assert store.get("k") is None
+
+    store = IdempotencyStore(ttl=60, maxsize=1)
+    store.put("a", 1)
+    store.put("b", 2)
+    assert store.get("a") is None
+    assert store.get("b") == 2
+    # A lookup is not a replay until the caller serves it
+    assert store.replays == 0
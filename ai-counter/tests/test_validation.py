@@ -1,12 +1,16 @@
+import asyncio
 import struct
 
 import pytest
 
 from app.validation import (
+    MAX_FILE_SIZE,
+    ImageHeaderReader,
     ValidationError,
     _get_jpeg_dimensions,
     _get_png_dimensions,
     get_image_dimensions,
+    validate_stream,
 )
 
 
@@ -61,3 +65,66 @@ class TestGetImageDimensions:
     def test_unsupported_format_returns_none(self):
         result = get_image_dimensions(b"", "image/gif")
         assert result is None
+
+
+def _feed(data: bytes, chunk_size: int) -> ImageHeaderReader:
+    reader = ImageHeaderReader()
+    for i in range(0, len(data), chunk_size):
+        reader.feed(data[i : i + chunk_size])
+    return reader
+
+
+class TestImageHeaderReader:
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 64 * 1024])
+    def test_jpeg_after_large_app_segment(self, chunk_size):
+        app1 = b"\xFF\xE1" + struct.pack(">H", 40000) + b"\x00" * 39998
+        data = b"\xFF\xD8" + app1 + _make_minimal_jpeg(1024, 768)[2:]
+        reader = _feed(data, chunk_size)
+        assert reader.finish() == (1024, 768)
+
+    @pytest.mark.parametrize("chunk_size", [1, 5, 1024])
+    def test_png_in_small_chunks(self, chunk_size):
+        assert _feed(_make_minimal_png(1920, 1080), chunk_size).finish() == (1920, 1080)
+
+    def test_corrupt_jpeg_raises_validation_error(self):
+        with pytest.raises(ValidationError, match="Invalid JPEG"):
+            _feed(b"\xFF\xD8\x00\x00\x00\x00", 2)
+
+    def test_truncated_jpeg_raises_validation_error(self):
+        with pytest.raises(ValidationError, match="Could not determine JPEG"):
+            _feed(b"\xFF\xD8\xFF\xE1\x00\x10", 4).finish()
+
+    def test_unknown_format_has_no_dimensions(self):
+        assert _feed(b"GIF89a" + b"\x00" * 20, 4).finish() is None
+
+
+class TestValidateStream:
+    def _validate(self, chunks, content_type="image/jpeg", content_length=None):
+        consumed = []
+
+        async def source():
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+        data = asyncio.run(validate_stream(source(), content_type, content_length))
+        return data, consumed
+
+    def test_returns_whole_upload(self):
+        jpeg = _make_minimal_jpeg() + b"\x00" * 1000
+        data, _ = self._validate([jpeg[:10], jpeg[10:]])
+        assert data == jpeg
+        assert type(data) is bytes
+
+    def test_rejects_oversized_upload_before_reading_it_all(self):
+        chunks = [_make_minimal_jpeg()] + [b"\x00" * (1024 * 1024)] * 50
+        with pytest.raises(ValidationError, match="exceeds maximum"):
+            self._validate(chunks)
+
+    def test_rejects_declared_content_length_up_front(self):
+        with pytest.raises(ValidationError, match="exceeds maximum"):
+            self._validate([], content_length=MAX_FILE_SIZE + 1)
+
+    def test_rejects_small_resolution(self):
+        with pytest.raises(ValidationError, match="below minimum"):
+            self._validate([_make_minimal_jpeg(50, 50)])